@@ -1,12 +1,77 @@
-from .yf_download_day import download_day
-from .yf_download_minute import download_minute
-from .yf_download_info import download_info, download_details
-from .yf_download_symbols import get_symbols_download_url, download_symbols
+import importlib
+
+
+# public names -> submodule defining them, imported on first use
+# (import yf_tools itself loads no pandas / requests / selenium, e.g. download_info loads yf_download_info only)
+_LAZY = {'download_day': 'yf_download_day',
+         'iter_download_day': 'yf_download_day',
+         'download_minute': 'yf_download_minute',
+         'iter_download_minute': 'yf_download_minute',
+         'download_history': 'yf_download_history',
+         'iter_download_history': 'yf_download_history',
+         'download_day_async': 'yf_download_async',
+         'download_minute_async': 'yf_download_async',
+         'download_info': 'yf_download_info',
+         'download_details': 'yf_download_info',
+         'iter_download_details': 'yf_download_info',
+         'get_symbols_download_url': 'yf_download_symbols',
+         'download_symbols': 'yf_download_symbols',
+         'iter_download_symbols': 'yf_download_symbols',
+         'screener_query': 'yf_screener',
+         'get_screener_query': 'yf_screener',
+         'download_screener': 'yf_screener',
+         'iter_download_screener': 'yf_screener',
+         'Panel': 'yf_panel',
+         'resample': 'yf_resample',
+         'localize': '_compact',
+         'YFClient': 'yf_client',
+         'InfoPoller': 'yf_info_poller',
+         'set_rate_limit': '_rate_limit',
+         'Metrics': '_metrics',
+         'set_metrics': '_metrics',
+         'set_quote_cache': '_quote_cache',
+         }
 
 
 __all__ = ['download_day',
            'download_minute',
+           'download_history',
+           'download_day_async',
+           'download_minute_async',
            'download_info',
            'download_details',
+           'iter_download_day',
+           'iter_download_minute',
+           'iter_download_history',
+           'iter_download_details',
            'get_symbols_download_url',
-           'download_symbols']
+           'download_symbols',
+           'iter_download_symbols',
+           'screener_query',
+           'get_screener_query',
+           'download_screener',
+           'iter_download_screener',
+           'set_rate_limit',
+           'Metrics',
+           'set_metrics',
+           'set_quote_cache',
+           'Panel',
+           'resample',
+           'localize',
+           'YFClient',
+           'InfoPoller']
+
+
+
+def __getattr__(name):
+    '''import submodule of public name on first use (then kept as attribute of package)'''
+    if name not in _LAZY:
+        raise AttributeError('module {!r} has no attribute {!r}'.format(__name__, name))
+    value = getattr(importlib.import_module('.' + _LAZY[name], __name__), name)
+    globals()[name] = value
+    return value
+
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,152 @@
+# local on-disk storage of downloaded data (compressed parquet files)
+# requires a parquet engine for pandas (pyarrow or fastparquet)
+
+import os
+import json
+import uuid
+import pandas as pd
+
+
+
+#------------------------- Description -------------------------#
+if False:
+
+    ### daily cache: one file per symbol & column set ###
+    # <cache_dir>/day_actions1_adjclose1/AAPL.parquet
+    path = _day_cache_path(cache_dir, 'AAPL', show_actions=True, show_adjclose=True)
+    ohlcv = _read_parquet(path) # None if not cached yet
+    _write_parquet(path, ohlcv)
+
+
+    ### minute archive: one file per symbol & trading date (exchange local date) ###
+    # <archive_dir>/minute_prepost0/AAPL/2022-04-21.parquet
+    # <archive_dir>/minute_prepost0/AAPL/_meta.json (exchange timezone)
+    symbol_dir = _minute_archive_dir(archive_dir, 'AAPL', show_prepost=False)
+    dates = _archived_dates(symbol_dir) # {'2022-04-21', ...}
+    ohlcv = _read_minute_archive(symbol_dir, sorted(dates))
+
+    # <archive_dir>/_minute_lookback.json (how far back yf keeps minute data, found once per day)
+    lookback = _read_minute_lookback(archive_dir, '2022-05-20') # sec / None
+
+
+
+
+#------------------------- Definition -------------------------#
+def _check_parquet():
+    '''raise ImportError if pandas has no parquet engine'''
+    try:
+        import pyarrow
+    except ImportError:
+        try:
+            import fastparquet
+        except ImportError:
+            raise ImportError('local cache requires a parquet engine, please "pip install pyarrow"')
+
+
+
+def _day_cache_path(cache_dir, symbol, show_actions, show_adjclose):
+    '''file path of cached daily ohlcv (keyed by symbol & columns included)'''
+    key = 'day_actions{:d}_adjclose{:d}'.format(bool(show_actions), bool(show_adjclose))
+    return os.path.join(cache_dir, key, symbol + '.parquet')
+
+
+
+def _read_parquet(path):
+    '''read df from parquet file -> df / None if not existing'''
+    if not os.path.exists(path):
+        return None
+    return pd.read_parquet(path)
+
+
+
+def _write_parquet(path, df):
+    '''write df into parquet file (atomic replace, safe for concurrent readers)'''
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = '{}.{}.tmp'.format(path, uuid.uuid4().hex)
+    try:
+        df.to_parquet(tmp_path, compression='zstd')
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+
+def _write_json(path, obj):
+    '''write obj into json file (atomic replace, never left truncated by a crash)'''
+    tmp_path = '{}.{}.tmp'.format(path, uuid.uuid4().hex)
+    try:
+        with open(tmp_path, 'w') as f:
+            json.dump(obj, f)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+
+def _minute_archive_dir(archive_dir, symbol, show_prepost):
+    '''dir of archived minute ohlcv of symbol (keyed by pre & post market data included)'''
+    key = 'minute_prepost{:d}'.format(bool(show_prepost))
+    return os.path.join(archive_dir, key, symbol)
+
+
+
+def _read_archive_tz(symbol_dir):
+    '''exchange timezone of archived symbol -> str / None if not archived yet'''
+    path = os.path.join(symbol_dir, '_meta.json')
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)['tz']
+
+
+
+def _write_archive_tz(symbol_dir, tz):
+    '''keep exchange timezone of archived symbol'''
+    os.makedirs(symbol_dir, exist_ok=True)
+    _write_json(os.path.join(symbol_dir, '_meta.json'), {'tz': str(tz)})
+
+
+
+def _archived_dates(symbol_dir):
+    '''trading dates archived (incl. empty dates, e.g. holidays) -> set of 'YYYY-MM-DD' '''
+    if not os.path.isdir(symbol_dir):
+        return set()
+    return {name[:-len('.parquet')] for name in os.listdir(symbol_dir) if name.endswith('.parquet')}
+
+
+
+def _read_minute_archive(symbol_dir, dates):
+    '''read archived minute ohlcv of dates ('YYYY-MM-DD') -> df / None if nothing archived'''
+    chunks = [_read_parquet(os.path.join(symbol_dir, date + '.parquet')) for date in dates]
+    chunks = [chunk for chunk in chunks if (chunk is not None) and (not chunk.empty)]
+    if not chunks:
+        return None
+    return pd.concat(chunks, axis=0)
+
+
+
+def _write_minute_archive(symbol_dir, ohlcv, dates):
+    '''write minute ohlcv into one file per trading date (empty file if no data on that date)'''
+    local_dates = ohlcv.index.strftime('%Y-%m-%d')
+    for date in dates:
+        _write_parquet(os.path.join(symbol_dir, date + '.parquet'), ohlcv.loc[local_dates == date])
+
+
+
+def _read_minute_lookback(archive_dir, date):
+    '''lookback of yf minute data found on utc date ('YYYY-MM-DD') -> sec / None if not found that day'''
+    path = os.path.join(archive_dir, '_minute_lookback.json')
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        memo = json.load(f)
+    return memo['lookback'] if memo['date'] == date else None
+
+
+
+def _write_minute_lookback(archive_dir, date, lookback):
+    '''keep lookback (sec) of yf minute data found on utc date ('YYYY-MM-DD')'''
+    os.makedirs(archive_dir, exist_ok=True)
+    _write_json(os.path.join(archive_dir, '_minute_lookback.json'), {'date': date, 'lookback': lookback})
@@ -0,0 +1,149 @@
+# exchange trading calendars for planning minute downloads (only trading dates requested)
+# trading dates of an exchange = daily bars of a reference symbol on yf (e.g. ^GSPC for us stocks),
+# fetched once per exchange per day & memoized in-process
+
+import re
+import threading
+import requests
+import pandas as pd
+
+try:
+    from ._rate_limit import _wait_for_slot
+    from ._decode import _loads
+    from .yf_download_day import _day_request
+except ImportError:
+    from _rate_limit import _wait_for_slot
+    from _decode import _loads
+    from yf_download_day import _day_request
+
+
+
+#------------------------- Description -------------------------#
+if False:
+
+    ### _calendar_symbol(symbol) ###
+    _calendar_symbol('TSM') # '^GSPC' (us)
+    _calendar_symbol('0700.HK') # '^HSI'
+    _calendar_symbol('BTC-USD') # None (trades every day: no calendar)
+
+
+
+    ### _trading_calendar(calendar_symbol, sess, timeout) ###
+    calendar = _trading_calendar('^GSPC', sess)
+    calendar.tz # 'America/New_York'
+    calendar.is_open(pd.Timestamp('2021-12-25')) # False (local date)
+    calendar.is_open(pd.Timestamp.today().normalize()) # True on weekdays (after last known date: assumed open)
+
+
+
+
+#------------------------- Definition -------------------------#
+# exchange suffix of symbol -> reference symbol traded on all trading dates of the exchange
+_CALENDAR_SYMBOLS = {'': '^GSPC', # us
+                     '.HK': '^HSI',
+                     '.T': '^N225',
+                     '.L': '^FTSE',
+                     '.DE': '^GDAXI',
+                     '.PA': '^FCHI',
+                     '.TO': '^GSPTSE',
+                     '.AX': '^AXJO',
+                     '.SS': '000001.SS',
+                     '.SZ': '399001.SZ',
+                     '.TW': '^TWII',
+                     '.KS': '^KS11',
+                     '.SI': '^STI',
+                     '.NS': '^NSEI',
+                     '.BO': '^BSESN',
+                     }
+_CALENDAR_DAYS = 45 # days of calendar fetched (minute data kept by yf: ~30 days)
+
+
+
+def _calendar_symbol(symbol):
+    '''
+    symbol -> reference symbol of its exchange calendar
+    (None if unknown / not a stock, e.g. crypto 'BTC-USD', fx 'HKD=X', futures 'ES=F', indices '^HSI')
+    '''
+    symbol = symbol.upper()
+    if symbol.startswith('^') or ('=' in symbol) or re.search(r'-[A-Z]{3,}$', symbol):
+        return None
+    suffix = symbol[symbol.rfind('.'):] if '.' in symbol else ''
+    return _CALENDAR_SYMBOLS.get(suffix)
+
+
+
+class _TradingCalendar:
+    '''
+    trading dates of an exchange (local dates)
+
+    tz : exchange timezone (str)
+    dates : set of trading dates ('YYYY-MM-DD')
+    first : first date known ('YYYY-MM-DD')
+    last : last date known ('YYYY-MM-DD')
+           [weekdays outside (first, last) assumed open, e.g. today before the open]
+    '''
+
+    def __init__(self, tz, dates, first, last):
+        self.tz = tz
+        self.dates = frozenset(dates)
+        self.first = first
+        self.last = last
+
+
+    def is_open(self, date):
+        '''is local date (pd.Timestamp) a trading date ?'''
+        date_str = date.strftime('%Y-%m-%d')
+        if self.first <= date_str <= self.last:
+            return date_str in self.dates
+        return date.weekday() < 5
+
+
+
+_calendar_memo = {} # {(calendar symbol, utc date 'YYYY-MM-DD'): _TradingCalendar}
+_calendar_lock = threading.Lock()
+
+
+def _trading_calendar(calendar_symbol, sess=None, timeout=(3.05,5)):
+    '''
+    trading calendar of exchange of calendar_symbol (last ~45 days), fetched once per day & memoized
+
+    calendar_symbol : reference symbol of exchange (see _calendar_symbol)
+    sess : requests.Session for persisting download (None: new session)
+    timeout : sec to request timeout [specify sec / (sec: connect timeout, sec: response timeout)]
+
+    -> _TradingCalendar / None if unavailable (every date treated as open, not memoized)
+    '''
+    now = pd.Timestamp.today(tz='utc').tz_convert(None)
+    key = (calendar_symbol, now.strftime('%Y-%m-%d'))
+
+    # one fetch at a time (concurrent callers wait for its result)
+    with _calendar_lock:
+        if key not in _calendar_memo:
+            try:
+                if sess is None:
+                    with requests.Session() as sess:
+                        calendar = _fetch_calendar(calendar_symbol, now, sess, timeout)
+                else:
+                    calendar = _fetch_calendar(calendar_symbol, now, sess, timeout)
+            except Exception:
+                return None
+            _calendar_memo[key] = calendar
+
+    return _calendar_memo[key]
+
+
+
+def _fetch_calendar(calendar_symbol, now, sess, timeout):
+    '''download daily bars of calendar_symbol -> _TradingCalendar (local dates with a bar)'''
+    start = now.normalize() - pd.Timedelta(days=_CALENDAR_DAYS)
+    url, params, headers = _day_request(calendar_symbol, start.timestamp(), now.timestamp(), False)
+    _wait_for_slot(url)
+    resp = sess.get(url, params=params, headers=headers, timeout=timeout)
+    data = _loads(resp.content)['chart']['result'][0]
+
+    tz = data['meta']['exchangeTimezoneName']
+    stamps = pd.to_datetime(data.get('timestamp', []), unit='s', utc=True).tz_convert(tz)
+    dates = set(stamps.strftime('%Y-%m-%d'))
+    first = (start.tz_localize('utc').tz_convert(tz) + pd.Timedelta('1D')).strftime('%Y-%m-%d') # 1st full date
+    last = max(dates) if dates else first
+    return _TradingCalendar(tz, dates, first, last)
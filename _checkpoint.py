@@ -0,0 +1,121 @@
+# checkpoint journal of long downloads: finished jobs journaled & their results spilled on disk,
+# so a rerun with the same arguments resumes only the outstanding jobs (after a crash / Ctrl-C / restart)
+# (kept only for interrupted runs, removed once every job is done / failed after all retries)
+#
+# <checkpoint_dir>/<kind>_<hash of arguments (& utc date if run relative to today, e.g. end None)>/
+#     plan.pkl       planned download (e.g. start, end & windows), reused as is on resume
+#     journal.jsonl  one line per finished job: {"key": ..., "file": ...} (appended & flushed)
+#     results/       spilled result of each journaled job (pickle, exact dtypes & index)
+
+import os
+import json
+import uuid
+import shutil
+import hashlib
+import threading
+import pandas as pd
+
+
+
+#------------------------- Description -------------------------#
+if False:
+
+    ### _Journal(checkpoint_dir, kind, args) ###
+    journal = _Journal('yf_checkpoint', 'minute', [symbols, start, end, show_prepost], relative=(end is None))
+    plan = journal.plan(lambda: make_plan()) # planned once, same plan on resume
+
+    for key in journal.done: # keys journaled by previous runs
+        ohlcv = journal.load(key)
+
+    journal.save(['AAPL', 0], ohlcv) # result spilled, then key journaled
+    journal.close(remove=True) # run finished (failed jobs included): nothing left to resume
+
+
+
+
+#------------------------- Definition -------------------------#
+class _Journal:
+    '''
+    append-only journal of finished jobs of a download run (with their results spilled on disk)
+
+    checkpoint_dir : dir of checkpoints
+    kind : kind of download (e.g. 'minute')
+    args : arguments identifying the run (json-serializable, str() used otherwise)
+    relative : run relative to today (e.g. start / end None) ? [utc date in key: a rerun on another day
+               starts over instead of reusing a stale plan & results]
+    '''
+
+    def __init__(self, checkpoint_dir, kind, args, relative=False):
+        if relative:
+            args = [args, pd.Timestamp.today(tz='utc').strftime('%Y-%m-%d')]
+        digest = hashlib.sha1(json.dumps([kind, args], default=str).encode()).hexdigest()[:16]
+        self.dir = os.path.join(checkpoint_dir, '{}_{}'.format(kind, digest))
+        os.makedirs(os.path.join(self.dir, 'results'), exist_ok=True)
+        self._lock = threading.Lock()
+        self._files = self._read_journal() # {json of key: file name of result}
+        self._journal = open(os.path.join(self.dir, 'journal.jsonl'), 'a+')
+        self._journal.seek(0, os.SEEK_END)
+        if self._journal.tell() > 0: # partly written last line (crash): new lines start on their own
+            self._journal.seek(self._journal.tell() - 1)
+            if self._journal.read(1) != '\n':
+                self._journal.write('\n')
+
+
+    @property
+    def done(self):
+        '''keys of journaled jobs (json-decoded, e.g. lists for tuples)'''
+        return [json.loads(key) for key in self._files]
+
+
+    def plan(self, make_plan):
+        '''plan of run: saved one if any, else make_plan() saved for resume'''
+        path = os.path.join(self.dir, 'plan.pkl')
+        if os.path.exists(path):
+            return pd.read_pickle(path)
+
+        plan = make_plan()
+        tmp_path = '{}.{}.tmp'.format(path, uuid.uuid4().hex)
+        pd.to_pickle(plan, tmp_path)
+        os.replace(tmp_path, path)
+        return plan
+
+
+    def load(self, key):
+        '''spilled result of a journaled job'''
+        return pd.read_pickle(os.path.join(self.dir, 'results', self._files[json.dumps(key)]))
+
+
+    def save(self, key, result):
+        '''spill result of a finished job, then journal its key (a crash in between: job redone)'''
+        file_name = uuid.uuid4().hex + '.pkl'
+        pd.to_pickle(result, os.path.join(self.dir, 'results', file_name))
+        with self._lock:
+            self._files[json.dumps(key)] = file_name
+            self._journal.write(json.dumps({'key': key, 'file': file_name}) + '\n')
+            self._journal.flush()
+            os.fsync(self._journal.fileno())
+
+
+    def close(self, remove=False):
+        '''close journal (remove: delete checkpoint, e.g. run finished)'''
+        self._journal.close()
+        if remove:
+            shutil.rmtree(self.dir, ignore_errors=True)
+
+
+    def _read_journal(self):
+        '''{json of key: file name} of journaled jobs (partly written last line ignored)'''
+        files = {}
+        path = os.path.join(self.dir, 'journal.jsonl')
+        if not os.path.exists(path):
+            return files
+
+        with open(path) as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                if os.path.exists(os.path.join(self.dir, 'results', entry['file'])):
+                    files[json.dumps(entry['key'])] = entry['file']
+        return files
@@ -0,0 +1,69 @@
+# fast decoding of chart responses into numpy arrays
+# (orjson used if installed, else json from standard library)
+
+import json
+import numpy as np
+import pandas as pd
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+
+#------------------------- Description -------------------------#
+if False:
+
+    content = _loads(resp.content) # bytes -> dict
+
+    # list with None -> float64 array with nan
+    close = _float_array([1.0, None, 3.0], n=3) # array([1., nan, 3.])
+
+    # events {'1598880600': {'date': 1598880600, 'amount': 0.2}, ...} -> array aligned to datetime_idx
+    dividend = _event_array(events['dividends'], datetime_idx, normalize=True,
+                            value=lambda event: event['amount'])
+
+
+
+
+#------------------------- Definition -------------------------#
+def _loads(content):
+    '''decode json (bytes / str) -> dict'''
+    if orjson is not None:
+        return orjson.loads(content)
+    return json.loads(content)
+
+
+
+def _float_array(values, n):
+    '''list of numbers (None for missing) -> float64 array (nan for missing) / all nan if no list'''
+    if values is None:
+        return np.full(n, np.nan)
+    return np.array(values, dtype=np.float64)
+
+
+
+def _event_array(events, datetime_idx, normalize, value):
+    '''
+    align events (dividends / splits) to datetime_idx
+
+    events : dict of events (each with 'date' as utc timestamp)
+    datetime_idx : unique DatetimeIndex (utc, no tz)
+    normalize : match events by date only (daily data) ?
+    value : function(event) -> float
+
+    -> float64 array (nan if no event on that row)
+    '''
+    events = list(events.values())
+    dates = pd.to_datetime(np.array([event['date'] for event in events], dtype=np.int64), unit='s')
+    if normalize:
+        dates = dates.normalize()
+
+    # position of each event in datetime_idx (-1 if not found)
+    pos = datetime_idx.get_indexer(dates)
+    found = pos >= 0
+
+    array = np.full(len(datetime_idx), np.nan)
+    array[pos[found]] = np.array([value(event) for event in events], dtype=np.float64)[found]
+    return array
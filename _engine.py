@@ -0,0 +1,194 @@
+# multi-thread download engine shared by the downloaders
+# submit jobs (with speed control), yield results in completion order,
+# re-enqueue each failed job on its own (jittered exponential backoff, per-job attempt budget)
+
+import time
+import heapq
+import queue
+import random
+from concurrent.futures import Future
+
+try:
+    from ._progress import _progress_status, _progress_bar
+except ImportError:
+    from _progress import _progress_status, _progress_bar
+
+
+
+#------------------------- Description -------------------------#
+if False:
+
+    ### _iter_jobs(executor, keys, submit, retry, verbose, print) ###
+    # submit : function(key) -> future (speed control done inside)
+    # yields (key, result) as soon as each job is done,
+    # (key, None) if a job still fails after all retries
+    # (a failed job is resubmitted after its own backoff, other jobs keep running meanwhile)
+    for key, result in _iter_jobs(executor, symbols, submit, retry=1, verbose=False, print=print):
+        if result is not None:
+            ohlcvs[key] = result
+
+    # failed batch (tuple of symbols) bisected on retry, results yielded per sub-batch
+    bisect = lambda batch: [batch[:len(batch)//2], batch[len(batch)//2:]] if len(batch) > 1 else None
+    for batch, result in _iter_jobs(executor, batches, submit, retry=1, split=bisect):
+        ...
+
+
+
+    ### _then(job, executor, func) ###
+    # chain a 2nd stage onto a job, e.g. download in threads -> parse in processes
+    # (no thread kept waiting for the 2nd stage)
+    job = _then(thread_pool.submit(download, symbol), process_pool, parse)
+
+
+
+    ### _backoff(attempt, base, cap) ###
+    # sec to wait before retrying after the n-th failed attempt (0-indexed)
+    _backoff(0) # random in [0, 0.5)
+    _backoff(3) # random in [0, 4.0)
+
+
+
+
+#------------------------- Definition -------------------------#
+def _iter_jobs(executor, keys, submit, retry=0, verbose=False, print=print, format_failed=None,
+               backoff=0.5, split=None, metrics=None):
+    '''
+    run jobs in thread pool, yield results in completion order (while still submitting)
+    failed jobs re-enqueued one by one after a jittered exponential backoff
+
+    executor : ThreadPoolExecutor
+    keys : list of job keys (e.g. symbols)
+    submit : function(key) -> future [speed control done inside]
+    retry : num of download retry of each job if it fails
+    verbose : show progress status (else progress bar) ?
+    print : function to print msg
+    format_failed : function(list of failed keys) -> str to print
+    backoff : base sec of backoff before retrying a failed job
+    split : function(key) -> list of sub-keys retried instead of a failed key (None / []: retry key itself)
+            [e.g. bisect a batch, each split uses up an attempt as a retry would]
+    metrics : Metrics recording failed & finished jobs (None: not recorded)
+
+    -> generator of (key, result) / (key, None) if job failed after all retries
+    '''
+    format_failed = format_failed or (lambda keys: ' '.join(str(key) for key in keys))
+    keys = list(keys)
+    total = len(keys)
+    print('Total {} to download (up to {} attempts each)'.format(total, retry + 1))
+
+    done = queue.SimpleQueue() # (key, future) of finished jobs
+    retries = [] # heap of (time ready to resubmit, seq, key)
+    attempts = {} # {key: num of attempts failed}
+    failed_keys = [] # keys failed after all retries
+    n_running = 0
+    n_finished = 0
+    seq = 0
+
+    def _submit(key):
+        job = submit(key)
+        job.add_done_callback(lambda job, key=key: done.put((key, job)))
+
+    def _show_progress():
+        if verbose:
+            _progress_status(n_finished - 1, total, prepend='  Finished: ')
+        else:
+            _progress_bar(n_finished - 1, total)
+
+    keys.reverse() # pop from the end, in original order
+    while keys or retries or n_running:
+
+        # resubmit failed jobs whose backoff is over (ahead of new jobs)
+        if retries and (retries[0][0] <= time.perf_counter()):
+            _submit(heapq.heappop(retries)[2])
+            n_running += 1
+
+        # submit next new job
+        elif keys:
+            _submit(keys.pop())
+            n_running += 1
+
+        # nothing to submit: wait for a job to finish / the next backoff to be over
+        else:
+            wait = max(retries[0][0] - time.perf_counter(), 0.0) if retries else None
+            if n_running:
+                try:
+                    item = done.get(timeout=wait)
+                except queue.Empty:
+                    continue
+                done.put(item) # handled below with the others
+            else:
+                time.sleep(wait)
+                continue
+
+        # handle jobs already finished
+        while not done.empty():
+            key, job = done.get()
+            n_running -= 1
+            try:
+                result = job.result()
+
+            # if download failed: retry later / give up after all attempts
+            except Exception as e:
+
+                # split into sub-keys (as a retry: one attempt used up, bounded by retry)
+                n_failed = attempts.get(key, 0)
+                sub_keys = split(key) if (split is not None) and (n_failed < retry) else None
+                if metrics is not None:
+                    metrics.record_failure(key, e, final=(not sub_keys) and (n_failed >= retry))
+                if sub_keys:
+                    for sub_key in sub_keys:
+                        attempts[sub_key] = n_failed + 1
+                        heapq.heappush(retries, (time.perf_counter() + _backoff(n_failed, backoff),
+                                                 seq, sub_key))
+                        seq += 1
+                    total += len(sub_keys) - 1
+                    continue
+
+                attempts[key] = attempts.get(key, 0) + 1
+                if attempts[key] <= retry:
+                    heapq.heappush(retries, (time.perf_counter() + _backoff(attempts[key] - 1, backoff),
+                                             seq, key))
+                    seq += 1
+                    continue
+                failed_keys.append(key)
+                result = None
+
+            if metrics is not None:
+                metrics.record_job(key, attempts.get(key, 0) + (result is not None))
+            n_finished += 1
+            _show_progress()
+            yield key, result
+
+
+    # print keys of failed download
+    if failed_keys:
+        print('    Failed :', format_failed(failed_keys))
+
+
+
+def _backoff(attempt, base=0.5, cap=30.0):
+    '''sec to wait before retrying after the n-th failed attempt (0-indexed) [full jitter]'''
+    return random.uniform(0.0, min(cap, base * 2 ** attempt))
+
+
+
+def _then(job, executor, func):
+    '''future of func(result of job), submitted to executor as soon as job is done'''
+    chained = Future()
+
+    def _on_job_done(job):
+        try:
+            next_job = executor.submit(func, job.result())
+        except Exception as e:
+            chained.set_exception(e)
+            return
+        next_job.add_done_callback(_on_next_job_done)
+
+    def _on_next_job_done(next_job):
+        e = next_job.exception()
+        if e is not None:
+            chained.set_exception(e)
+        else:
+            chained.set_result(next_job.result())
+
+    job.add_done_callback(_on_job_done)
+    return chained
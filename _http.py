@@ -0,0 +1,124 @@
+# persistent http connections & worker threads shared by the downloads of a client
+# (connection pool sized to the worker threads, so no connection is discarded as "pool is full")
+# every request recorded to metrics of the connection (if any, else process-wide set_metrics)
+
+import os
+import time
+import contextlib
+import requests
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from ._metrics import _get_metrics
+except ImportError:
+    from _metrics import _get_metrics
+
+
+
+#------------------------- Description -------------------------#
+if False:
+
+    ### _Connection(max_workers, pool_maxsize, metrics) ###
+    with _Connection(max_workers=16) as conn:
+        conn.sess.get(url) # keep-alive, up to 16 connections per host kept open
+        conn.executor.submit(func, *args)
+
+    with _Connection(metrics=Metrics()) as conn:
+        conn.sess.get(url)
+        conn.metrics.summary()
+
+
+
+    ### _use_client(client) ###
+    # given client reused, else a temporary one closed at the end of the call
+    with _use_client(client) as client:
+        sess, executor = client.sess, client.executor
+
+
+
+
+#------------------------- Definition -------------------------#
+class _Connection:
+    '''
+    requests.Session (keep-alive connection pool sized to the workers) + thread pool
+
+    max_workers : num of download threads (None: default of ThreadPoolExecutor)
+    pool_maxsize : max num of connections kept open per host (None / less than max_workers: max_workers)
+    metrics : Metrics recording each request (None: process-wide one of set_metrics, if any)
+    '''
+
+    def __init__(self, max_workers=None, pool_maxsize=None, metrics=None):
+        self.max_workers = (int(max(max_workers, 1)) if max_workers
+                                else min(32, (os.cpu_count() or 1) + 4)) # [1, inf)
+        self.pool_maxsize = max(int(pool_maxsize or 0), self.max_workers) # [max_workers, inf)
+
+        adapter = HTTPAdapter(pool_connections=4, # hosts: query1, query2, finance.yahoo.com, ...
+                              pool_maxsize=self.pool_maxsize)
+        self.sess = _MeteredSession(metrics)
+        self.sess.mount('https://', adapter)
+        self.sess.mount('http://', adapter)
+        self.executor = ThreadPoolExecutor(self.max_workers)
+
+
+    @property
+    def metrics(self):
+        '''Metrics recording requests of connection (None: not recorded)'''
+        return self.sess.get_metrics()
+
+
+    def close(self):
+        '''wait for running jobs, then release worker threads & connections'''
+        self.executor.shutdown(wait=True)
+        self.sess.close()
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+
+class _MeteredSession(requests.Session):
+    '''requests.Session recording each request to metrics (own / process-wide one)'''
+
+    def __init__(self, metrics=None):
+        super().__init__()
+        self.metrics = metrics
+
+
+    def get_metrics(self):
+        '''own Metrics / process-wide one / None'''
+        return self.metrics if self.metrics is not None else _get_metrics()
+
+
+    def send(self, request, **kwargs):
+        metrics = self.get_metrics()
+        if metrics is None:
+            return super().send(request, **kwargs)
+
+        t_sent, t = time.time(), time.perf_counter()
+        try:
+            resp = super().send(request, **kwargs) # body read as well (unless stream=True)
+        except Exception as e:
+            metrics.record_request(request.url, None, 0, None, time.perf_counter() - t, type(e).__name__, t_sent)
+            raise
+        n_bytes = 0 if kwargs.get('stream') else len(resp.content)
+        metrics.record_request(request.url, resp.status_code, n_bytes, resp.elapsed.total_seconds(),
+                               time.perf_counter() - t, None, t_sent)
+        return resp
+
+
+
+@contextlib.contextmanager
+def _use_client(client):
+    '''yield client if given, else a temporary _Connection closed at the end'''
+    if client is not None:
+        yield client
+        return
+
+    with _Connection() as client:
+        yield client
@@ -0,0 +1,25 @@
+# process inputs shared by the downloaders
+
+import re
+
+
+
+def _process_symbols(symbols):
+    '''
+    symbols (str / list of str) -> (list of upper-case symbols, single symbol or None)
+    e.g. 'tsm, aapl' -> (['TSM', 'AAPL'], None) ; 'tsm' -> (['TSM'], 'TSM')
+    '''
+    single_symbol = None
+    if isinstance(symbols, str):
+        symbols = re.split(r'[\s,|;]+', symbols.strip('\n\t ,|;'))
+        if len(symbols) == 1:
+            single_symbol = symbols[0].upper()
+    return [symbol.upper() for symbol in symbols], single_symbol
+
+
+
+def _process_timeout(timeout):
+    '''sec to request timeout [specify: sec / (sec: connect timeout, sec: response timeout)]'''
+    return ( tuple( float(max(t, 0.0)) for t in timeout )
+                 if isinstance(timeout, tuple)
+                 else float(max(timeout, 0.0)) ) # [0.0, inf) # [sec to request timeout]
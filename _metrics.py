@@ -0,0 +1,303 @@
+# per-request metrics of the downloaders: endpoint, symbol, bytes, status, latency, retry, failure class
+# aggregated into histograms / counters, summarized as pd.DataFrame or exported as prometheus text
+# (process-wide default set by set_metrics, or per client: YFClient(metrics=Metrics()))
+
+import time
+import bisect
+import threading
+import collections
+import numpy as np
+import pandas as pd
+from urllib.parse import urlsplit, unquote
+
+
+
+#------------------------- Description -------------------------#
+if False:
+
+    ### Metrics(hooks, keep) ###
+    metrics = Metrics(hooks=[print]) # each request record also passed to hooks
+    with YFClient(metrics=metrics) as client:
+        ohlcvs = client.download_day(symbols)
+
+    metrics.summary() # df of requests, errors, retries, bytes, latency quantiles per endpoint
+    metrics.failures() # df of num of failures per (endpoint / job, failure class)
+    metrics.records # recent request records (list of dicts)
+    text = metrics.to_prometheus() # for a /metrics endpoint or a textfile collector
+
+
+
+    ### set_metrics(metrics) ###
+    # record every download of the process (incl. calls without client & async downloads)
+    set_metrics(Metrics())
+    set_metrics(None) # stop recording
+
+
+
+    ### request record ###
+    {'time': 1632700800.1, # unix time of request sent
+     'endpoint': 'chart', # chart / quote / quote_page / screener / screener_page / other
+     'symbol': 'TSM', # None if request is not of a single symbol
+     'status': 200, # None if no response (e.g. timeout)
+     'bytes': 95132, # size of response body
+     'ttfb': 0.084, # sec until response headers (incl. connecting)
+     'latency': 0.102, # sec until whole response body
+     'retry': 0, # num of failed requests of same url right before this one
+     'error': None} # failure class, e.g. 'ReadTimeout' / 'HTTP 429'
+
+
+
+
+#------------------------- Definition -------------------------#
+_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0) # [sec]
+_ATTEMPT_BUCKETS = (1, 2, 3, 5, 10) # [num of attempts per job]
+_MAX_FAILING = 10000 # num of failing urls tracked for retry counts (oldest dropped, e.g. urls never retried)
+
+
+
+class Metrics:
+    '''
+    thread-safe recorder of per-request & per-job metrics of downloads
+
+    hooks : functions(request record (dict)) called on each request (in download threads)
+            [exceptions of hooks ignored: never fail a download]
+    keep : num of recent request records kept in metrics.records
+    '''
+
+    def __init__(self, hooks=(), keep=10000):
+        self.hooks = list(hooks)
+        self._lock = threading.Lock()
+        self._keep = int(max(keep, 0))
+        self.reset()
+
+
+    def reset(self):
+        '''clear all records & aggregates'''
+        with self._lock:
+            self._records = collections.deque(maxlen=self._keep)
+            self._requests = collections.Counter() # {(endpoint, status): num}
+            self._errors = collections.Counter() # {(endpoint, class): num}
+            self._retries = collections.Counter() # {endpoint: num}
+            self._bytes = collections.Counter() # {endpoint: num of bytes}
+            self._latency = {} # {endpoint: _Histogram} of whole response
+            self._ttfb = {} # {endpoint: _Histogram} of response headers
+            self._job_failures = collections.Counter() # {(class, final): num}
+            self._attempts = _Histogram(_ATTEMPT_BUCKETS) # attempts per finished job
+            self._failing = {} # {url: num of consecutive failed requests}
+
+
+    @property
+    def records(self):
+        '''recent request records (list of dicts)'''
+        with self._lock:
+            return list(self._records)
+
+
+    def record_request(self, url, status, n_bytes, ttfb, latency, error=None, t=None):
+        '''record a request (status None & error class if no response)'''
+        endpoint, symbol = _endpoint(url)
+        if (error is None) and (status is not None) and (status >= 400):
+            error = 'HTTP {}'.format(status)
+
+        with self._lock:
+            retry = self._failing.pop(url, 0)
+            if error is not None:
+                self._failing[url] = retry + 1
+                if len(self._failing) > _MAX_FAILING:
+                    del self._failing[next(iter(self._failing))] # oldest failing url
+                self._errors[endpoint, error] += 1
+            if retry:
+                self._retries[endpoint] += 1
+            self._requests[endpoint, 'error' if status is None else str(status)] += 1
+            self._bytes[endpoint] += n_bytes
+            self._latency.setdefault(endpoint, _Histogram(_LATENCY_BUCKETS)).observe(latency)
+            if ttfb is not None:
+                self._ttfb.setdefault(endpoint, _Histogram(_LATENCY_BUCKETS)).observe(ttfb)
+
+            record = {'time': time.time() - latency if t is None else t, 'endpoint': endpoint, 'symbol': symbol,
+                      'status': status, 'bytes': n_bytes, 'ttfb': ttfb, 'latency': latency, 'retry': retry,
+                      'error': error}
+            self._records.append(record)
+
+        for hook in self.hooks:
+            try:
+                hook(record)
+            except Exception:
+                pass
+
+
+    def record_failure(self, key, error, final):
+        '''record a failed job (e.g. a symbol) [final: given up, else retried]'''
+        with self._lock:
+            self._job_failures[type(error).__name__, bool(final)] += 1
+
+
+    def record_job(self, key, attempts):
+        '''record a finished job (succeeded / given up) with its num of attempts'''
+        with self._lock:
+            self._attempts.observe(attempts)
+
+
+    def summary(self):
+        '''-> df of requests, errors, retries, bytes & latency (sec) quantiles per endpoint'''
+        with self._lock:
+            rows = {}
+            for endpoint, hist in self._latency.items():
+                rows[endpoint] = {
+                    'requests': sum(n for (e, _), n in self._requests.items() if e == endpoint),
+                    'errors': sum(n for (e, _), n in self._errors.items() if e == endpoint),
+                    'retries': self._retries[endpoint],
+                    'bytes': self._bytes[endpoint],
+                    'latency_mean': hist.sum / hist.count,
+                    'latency_p50': hist.quantile(0.50),
+                    'latency_p99': hist.quantile(0.99),
+                    'ttfb_p50': self._ttfb[endpoint].quantile(0.50) if endpoint in self._ttfb else np.nan,
+                    }
+        return pd.DataFrame.from_dict(rows, orient='index').rename_axis('endpoint')
+
+
+    def failures(self):
+        '''-> df of num of failures per (source, failure class) [source: endpoint / 'job' / 'job (final)']'''
+        with self._lock:
+            counts = dict(self._errors)
+            for (error, final), n in self._job_failures.items():
+                counts['job (final)' if final else 'job', error] = n
+        index = pd.MultiIndex.from_tuples(list(counts), names=['source', 'class'])
+        return pd.DataFrame({'failures': np.array(list(counts.values()), dtype='int64')},
+                            index=index).sort_index()
+
+
+    def to_prometheus(self, prefix='yf'):
+        '''-> metrics in prometheus text exposition format'''
+        lines = []
+
+        def family(name, kind, help):
+            lines.append('# HELP {}_{} {}'.format(prefix, name, help))
+            lines.append('# TYPE {}_{} {}'.format(prefix, name, kind))
+
+        def sample(name, labels, value):
+            label_str = ','.join('{}="{}"'.format(k, _escape(v)) for k, v in labels.items())
+            lines.append('{}_{}{} {}'.format(prefix, name, '{' + label_str + '}' if label_str else '',
+                                             _number(value)))
+
+        def histogram(name, labels, hist):
+            for bound, n in zip(hist.bounds + (float('inf'),), np.cumsum(hist.counts)):
+                sample(name + '_bucket', dict(labels, le=_number(bound)), n)
+            sample(name + '_sum', labels, hist.sum)
+            sample(name + '_count', labels, hist.count)
+
+        with self._lock:
+            family('requests_total', 'counter', 'Requests sent to yf.')
+            for (endpoint, status), n in sorted(self._requests.items()):
+                sample('requests_total', {'endpoint': endpoint, 'status': status}, n)
+
+            family('request_errors_total', 'counter', 'Failed requests by failure class.')
+            for (endpoint, error), n in sorted(self._errors.items()):
+                sample('request_errors_total', {'endpoint': endpoint, 'class': error}, n)
+
+            family('request_retries_total', 'counter', 'Requests repeating a failed request of the same url.')
+            for endpoint, n in sorted(self._retries.items()):
+                sample('request_retries_total', {'endpoint': endpoint}, n)
+
+            family('response_bytes_total', 'counter', 'Bytes of response bodies.')
+            for endpoint, n in sorted(self._bytes.items()):
+                sample('response_bytes_total', {'endpoint': endpoint}, n)
+
+            family('request_duration_seconds', 'histogram', 'Seconds until whole response body.')
+            for endpoint, hist in sorted(self._latency.items()):
+                histogram('request_duration_seconds', {'endpoint': endpoint}, hist)
+
+            family('request_ttfb_seconds', 'histogram', 'Seconds until response headers (incl. connecting).')
+            for endpoint, hist in sorted(self._ttfb.items()):
+                histogram('request_ttfb_seconds', {'endpoint': endpoint}, hist)
+
+            family('job_failures_total', 'counter', 'Failed download jobs by failure class.')
+            for (error, final), n in sorted(self._job_failures.items()):
+                sample('job_failures_total', {'class': error, 'final': str(final).lower()}, n)
+
+            family('job_attempts', 'histogram', 'Attempts per finished download job.')
+            histogram('job_attempts', {}, self._attempts)
+
+        return '\n'.join(lines) + '\n'
+
+
+
+class _Histogram:
+    '''counts of observations in buckets (upper bounds, +inf appended)'''
+
+    def __init__(self, bounds):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+    def quantile(self, q):
+        '''estimated quantile, interpolated inside its bucket (as prometheus histogram_quantile)'''
+        if not self.count:
+            return np.nan
+        rank = q * self.count
+        cum = np.cumsum(self.counts)
+        i = int(np.searchsorted(cum, rank))
+        if i >= len(self.bounds):
+            return self.bounds[-1] # in +inf bucket
+        low = self.bounds[i-1] if i > 0 else 0.0
+        below = cum[i-1] if i > 0 else 0
+        return low + (self.bounds[i] - low) * (rank - below) / max(self.counts[i], 1)
+
+
+
+def _endpoint(url):
+    '''url -> (endpoint, symbol / None)'''
+    path = urlsplit(url).path
+    if path.startswith('/v8/finance/chart/'):
+        return 'chart', unquote(path.rsplit('/', 1)[-1])
+    if path.startswith('/v7/finance/quote'):
+        return 'quote', None
+    if path.startswith('/quote/'):
+        return 'quote_page', unquote(path.rstrip('/').rsplit('/', 1)[-1])
+    if path.startswith('/v1/finance/screener'):
+        return 'screener', None
+    if path.startswith('/screener/'):
+        return 'screener_page', None
+    return 'other', None
+
+
+
+def _escape(value):
+    '''escape label value of prometheus text format'''
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+
+def _number(value):
+    '''number of prometheus text format'''
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(int(value))
+
+
+
+_default_metrics = None # Metrics of connections created without one (None: no recording)
+
+
+def set_metrics(metrics):
+    '''
+    set process-wide Metrics recording downloads without own metrics (incl. calls without client, async)
+
+    metrics : Metrics (None: stop recording)
+    '''
+    global _default_metrics
+    _default_metrics = metrics
+
+
+
+def _get_metrics():
+    '''process-wide Metrics / None'''
+    return _default_metrics
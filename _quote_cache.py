@@ -0,0 +1,123 @@
+# process-wide short-ttl cache of quote info (download_info), shared by every caller & thread
+# concurrent callers asking for the same symbols share one in-flight request (single flight),
+# only symbols missing / stale in cache are requested again
+
+import time
+import threading
+from concurrent.futures import Future
+
+
+
+#------------------------- Description -------------------------#
+if False:
+
+    ### set_quote_cache(ttl) ###
+    # quote info of a symbol reused for 1 sec by any download_info call of the process
+    set_quote_cache(1.0)
+    info_df = download_info(symbols) # thread 1
+    info_df = download_info(symbols[:100]) # thread 2, same sec: no request (waits for thread 1 if needed)
+
+    # remove the cache again
+    set_quote_cache(None)
+
+
+
+    ### _QuoteCache(ttl) ###
+    cache = _QuoteCache(ttl=0.5)
+    fresh, waiting, claimed = cache.claim(['TSM', 'TSLA']) # claimed: to be requested by this caller
+    cache.put(['TSM', 'TSLA'], list_of_dicts) # waiting callers of other threads get them at once
+    cache.release(claimed) # claimed symbols not put (e.g. failed): waiting callers get None
+
+
+
+
+#------------------------- Definition -------------------------#
+class _QuoteCache:
+    '''
+    thread-safe cache of quote info per symbol with single-flight requests
+
+    ttl : sec of info kept fresh after downloaded
+    '''
+
+    def __init__(self, ttl):
+        self.ttl = float(ttl)
+        self._lock = threading.Lock()
+        self._entries = {} # {symbol: (expiry time, dict of info / None if no data)}
+        self._in_flight = {} # {symbol: Future of dict of info / None} being requested by a caller
+        self._max_entries = 10000 # num of entries before stale ones dropped
+
+
+    def claim(self, symbols):
+        '''
+        split symbols by cache state, claim the ones to be requested by this caller
+
+        symbols : list of symbols (duplicates in any case, e.g. 'tsm' & 'TSM', kept once)
+
+        -> ({symbol: info} fresh in cache, {symbol: Future} requested by another caller,
+            {symbol: Future} claimed by this caller)
+        '''
+        fresh, waiting, claimed = {}, {}, {}
+        now = time.monotonic()
+        with self._lock:
+            keys = set()
+            for sym in symbols:
+                key = sym.upper()
+                if key in keys: # same symbol in another case: claimed / waited for once
+                    continue
+                keys.add(key)
+                entry = self._entries.get(key)
+                if (entry is not None) and (entry[0] > now):
+                    fresh[sym] = entry[1]
+                elif key in self._in_flight:
+                    waiting[sym] = self._in_flight[key]
+                else:
+                    claimed[sym] = self._in_flight[key] = Future()
+        return fresh, waiting, claimed
+
+
+    def put(self, sym_grp, list_of_dicts):
+        '''cache info of a downloaded symbol group (symbols without info cached as no data)'''
+        infos = {info['symbol'].upper(): info for info in list_of_dicts if 'symbol' in info}
+        expiry = time.monotonic() + self.ttl
+        with self._lock:
+            for sym in sym_grp:
+                key = sym.upper()
+                self._entries[key] = (expiry, infos.get(key))
+                future = self._in_flight.pop(key, None)
+                if future is not None:
+                    future.set_result(infos.get(key))
+
+            # drop stale entries once cache doubled in size (amortized O(1) per symbol)
+            if len(self._entries) > self._max_entries:
+                now = time.monotonic()
+                self._entries = {key: entry for key, entry in self._entries.items() if entry[0] > now}
+                self._max_entries = max(10000, 2 * len(self._entries))
+
+
+    def release(self, claimed):
+        '''give up claimed symbols not put (failed): waiting callers get None, nothing cached'''
+        with self._lock:
+            for sym, future in claimed.items():
+                if self._in_flight.get(sym.upper()) is future:
+                    del self._in_flight[sym.upper()]
+                    future.set_result(None)
+
+
+
+_quote_cache = None # _QuoteCache of download_info (None: no cache)
+
+
+def set_quote_cache(ttl):
+    '''
+    set process-wide cache of quote info of download_info, shared by all calls & threads
+
+    ttl : sec of quote info reused after downloaded (e.g. 0.5) (None / 0: no cache)
+    '''
+    global _quote_cache
+    _quote_cache = _QuoteCache(ttl) if ttl else None
+
+
+
+def _get_quote_cache():
+    '''process-wide _QuoteCache / None'''
+    return _quote_cache
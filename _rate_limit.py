@@ -0,0 +1,123 @@
+# process-wide token-bucket rate limiter shared by every downloader
+# (one bucket per host, so concurrent calls share the same request budget)
+# yf download rate limit: 2000 requests / hour (or 48,000 requests / day)
+
+import time
+import asyncio
+import threading
+from urllib.parse import urlsplit
+
+
+
+#------------------------- Description -------------------------#
+if False:
+
+    ### set_rate_limit(rate, burst, host) ###
+    # at most 2000 requests / hour to the chart & quote API, bursts of 5 allowed
+    set_rate_limit(2000/3600, burst=5, host='query1.finance.yahoo.com')
+
+    # remove the limit again
+    set_rate_limit(None, host='query1.finance.yahoo.com')
+
+
+
+    ### _TokenBucket(rate, burst) ###
+    bucket = _TokenBucket(rate=2.0, burst=1) # 2 requests / sec
+    for i in range(5):
+        bucket.acquire() # blocks only when no token is available
+        print(i, time.perf_counter())
+
+
+
+
+#------------------------- Definition -------------------------#
+class _TokenBucket:
+    '''
+    thread-safe token bucket
+
+    rate : tokens refilled per sec (None: unlimited)
+    burst : max num of tokens kept in bucket
+    '''
+
+    def __init__(self, rate=None, burst=1):
+        self._lock = threading.Lock()
+        self.configure(rate, burst)
+
+
+    def configure(self, rate=None, burst=1):
+        '''reset refill rate & burst size (bucket starts full)'''
+        with self._lock:
+            self.rate = float(rate) if rate else None
+            self.burst = float(max(burst, 1))
+            self._tokens = self.burst
+            self._t_last = time.perf_counter()
+
+
+    def reserve(self, tokens=1):
+        '''take tokens (allowed to go into debt) -> sec to wait before using them'''
+        with self._lock:
+            if self.rate is None:
+                return 0.0
+
+            # refill since last call
+            now = time.perf_counter()
+            self._tokens = min(self.burst, self._tokens + (now - self._t_last) * self.rate)
+            self._t_last = now
+
+            # take tokens, wait for the deficit (if any) to be refilled
+            self._tokens -= tokens
+            return max(0.0, -self._tokens / self.rate)
+
+
+    def acquire(self, tokens=1):
+        '''block until tokens are available'''
+        wait = self.reserve(tokens)
+        if wait > 0.0:
+            time.sleep(wait)
+
+
+
+_limiters = {} # {host: _TokenBucket}
+_limiters_lock = threading.Lock()
+
+
+def _get_limiter(host):
+    '''shared bucket of host (unlimited until set_rate_limit is called)'''
+    with _limiters_lock:
+        if host not in _limiters:
+            _limiters[host] = _TokenBucket()
+        return _limiters[host]
+
+
+
+def set_rate_limit(rate, burst=1, host='query1.finance.yahoo.com'):
+    '''
+    set process-wide request rate limit of a host (shared by all downloads)
+
+    rate : requests per sec (None: unlimited) [e.g. 2000/3600]
+    burst : max num of requests sent back-to-back after idling
+    host : e.g. 'query1.finance.yahoo.com' (chart & quote) / 'finance.yahoo.com' (quote page & screener)
+    '''
+    _get_limiter(host).configure(rate, burst)
+
+
+
+def _make_pacer(speed):
+    '''per-call pacing bucket from speed (sec per request)'''
+    return _TokenBucket(rate=1.0/speed, burst=1) if speed > 0 else None
+
+
+
+def _wait_for_slot(url, pacer=None):
+    '''block until both the per-call pacer & the shared host limiter allow a request'''
+    if pacer is not None:
+        pacer.acquire()
+    _get_limiter(urlsplit(url).hostname).acquire()
+
+
+
+async def _wait_for_slot_async(url, pacer=None):
+    '''same as _wait_for_slot, but sleeps without blocking the event loop'''
+    if pacer is not None:
+        await asyncio.sleep(pacer.reserve())
+    await asyncio.sleep(_get_limiter(urlsplit(url).hostname).reserve())
@@ -0,0 +1,190 @@
+# end-to-end throughput benchmark of the downloaders against a local stand-in of yf (mock_yf.py)
+# each (entry point, universe size) runs in its own process, so cpu time & peak rss are its own
+#
+#   python benchmarks/bench_download.py
+#   python benchmarks/bench_download.py --entries day info --sizes 100 1000 --latency 0.05 --rate-429 0.01
+#   python benchmarks/bench_download.py --json before.json   (compare runs before / after a change)
+
+import os
+import sys
+import json
+import time
+import argparse
+import resource
+import contextlib
+import subprocess
+import numpy as np
+
+_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, _DIR)
+sys.path.insert(0, os.path.dirname(_DIR)) # modules of yf_tools, imported as in example.py
+
+from mock_yf import MockYF, redirect, _symbols
+
+
+
+#------------------------- Entry points -------------------------#
+def _day(symbols, conn, args):
+    from yf_download_day import download_day
+    return download_day(symbols, retry=args.retry, client=conn, compact=args.compact)
+
+
+def _minute(symbols, conn, args):
+    from yf_download_minute import download_minute
+    return download_minute(symbols, retry=args.retry, client=conn, compact=args.compact)
+
+
+def _history(symbols, conn, args):
+    from yf_download_history import download_history
+    return download_history(symbols, interval='5m', retry=args.retry, client=conn, compact=args.compact)
+
+
+def _info(symbols, conn, args):
+    from yf_download_info import download_info
+    return download_info(symbols, retry=args.retry, client=conn)
+
+
+def _details(symbols, conn, args):
+    from yf_download_info import download_details
+    return download_details(symbols, speed=0, retry=args.retry, client=conn)
+
+
+def _symbols_pages(symbols, conn, args):
+    from yf_download_symbols import download_symbols
+    url = 'https://finance.yahoo.com/screener/unsaved/mock'
+    return download_symbols(url, speed=0, retry=args.retry, client=conn)
+
+
+def _screener(symbols, conn, args):
+    from yf_screener import download_screener, screener_query
+    return download_screener(screener_query(region='us'), retry=args.retry, client=conn)
+
+
+def _warm_minute(conn, args):
+    '''find minute lookback & trading calendar once (memoized per day), as a long-running user would have'''
+    from yf_download_minute import _earliest_minute, _minute_calendars
+    _earliest_minute(conn.sess)
+    _minute_calendars(_symbols(0, 1), conn.sess)
+
+
+# {entry: (function(symbols, conn, args) -> output, function(conn, args) run before timing / None)}
+_ENTRIES = {'day': (_day, None),
+            'minute': (_minute, _warm_minute),
+            'history': (_history, _warm_minute),
+            'info': (_info, None),
+            'details': (_details, None),
+            'symbols': (_symbols_pages, None),
+            'screener': (_screener, None),
+            }
+
+
+
+#------------------------- Run -------------------------#
+def _run_case(entry, size, args):
+    '''run one entry point on size symbols (in this process) -> dict of measures'''
+    from _http import _Connection
+
+    run, warm = _ENTRIES[entry]
+    symbols = _symbols(0, size)
+    with _Connection(max_workers=args.workers) as conn:
+        adapter = redirect(conn.sess, args.server)
+        if warm is not None:
+            warm(conn, args)
+        del adapter.latencies[:]
+
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull): # no progress bars
+            usage_0 = _cpu_time()
+            t = time.perf_counter()
+            output = run(symbols, conn, args)
+            wall = time.perf_counter() - t
+
+    cpu = _cpu_time() - usage_0 # incl. child processes (e.g. parse pool of details, if any)
+    latencies = np.array(adapter.latencies) * 1000 if adapter.latencies else np.zeros(1)
+    return {'entry': entry, 'size': size, 'output': len(output), 'requests': len(adapter.latencies),
+            'wall': wall, 'req_per_sec': len(adapter.latencies) / wall if wall > 0 else 0.0,
+            'p50_ms': float(np.percentile(latencies, 50)), 'p99_ms': float(np.percentile(latencies, 99)),
+            'cpu': cpu, 'peak_rss_mb': _peak_rss_mb()}
+
+
+
+def _cpu_time():
+    '''user + system cpu sec of this process & its waited-for children'''
+    return sum(usage.ru_utime + usage.ru_stime for usage in (resource.getrusage(resource.RUSAGE_SELF),
+                                                              resource.getrusage(resource.RUSAGE_CHILDREN)))
+
+
+
+def _peak_rss_mb():
+    '''peak resident set size (MB) of this process / its largest child'''
+    peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+               resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    return peak / (1024 ** 2 if sys.platform == 'darwin' else 1024) # bytes on macOS, kB on linux
+
+
+
+def _spawn_case(entry, size, args, server):
+    '''run one case in a fresh process -> dict of measures (None if it crashed)'''
+    server.universe = size
+    cmd = [sys.executable, os.path.abspath(__file__), '--case', entry, str(size), '--server', server.url,
+           '--workers', str(args.workers), '--retry', str(args.retry)] + (['--compact'] if args.compact else [])
+    proc = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    if proc.returncode != 0:
+        print(proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else 'exit code {}'.format(proc.returncode),
+              file=sys.stderr)
+        return None
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+
+def _print_row(result):
+    print('{entry:<9}{size:>7}{output:>8}{requests:>9}{wall:>9.2f}{req_per_sec:>9.1f}{p50_ms:>9.1f}'
+          '{p99_ms:>9.1f}{cpu:>8.2f}{peak_rss_mb:>9.1f}'.format(**result), flush=True)
+
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='throughput of the downloaders against a local stand-in of yf')
+    parser.add_argument('--entries', nargs='+', default=list(_ENTRIES), choices=list(_ENTRIES))
+    parser.add_argument('--sizes', nargs='+', type=int, default=[10, 100, 1000], help='num of symbols')
+    parser.add_argument('--latency', type=float, default=0.02, help='sec before each response')
+    parser.add_argument('--jitter', type=float, default=0.0, help='max sec added to latency at random')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of responses with 500')
+    parser.add_argument('--rate-429', type=float, default=0.0, help='fraction of responses with 429')
+    parser.add_argument('--page-kb', type=int, default=500, help='size of a quote page (kB)')
+    parser.add_argument('--workers', type=int, default=16, help='num of download threads')
+    parser.add_argument('--retry', type=int, default=2, help='num of download retry')
+    parser.add_argument('--compact', action='store_true', help='compact memory of day & minute frames')
+    parser.add_argument('--json', help='also write results to this file')
+    parser.add_argument('--case', nargs=2, metavar=('ENTRY', 'SIZE'), help=argparse.SUPPRESS)
+    parser.add_argument('--server', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    # child: one case, measures as last line of stdout
+    if args.case:
+        print(json.dumps(_run_case(args.case[0], int(args.case[1]), args)))
+        return
+
+    results = []
+    with MockYF(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate, rate_429=args.rate_429,
+                page_kb=args.page_kb) as server:
+        print('latency {} s (+{} s jitter), error rate {}, 429 rate {}, {} workers, {} retry{}'.format(
+              args.latency, args.jitter, args.error_rate, args.rate_429, args.workers, args.retry,
+              ', compact' if args.compact else ''))
+        print('{:<9}{:>7}{:>8}{:>9}{:>9}{:>9}{:>9}{:>9}{:>8}{:>9}'.format(
+              'entry', 'size', 'output', 'requests', 'wall s', 'req/s', 'p50 ms', 'p99 ms', 'cpu s', 'rss MB'))
+        for entry in args.entries:
+            for size in args.sizes:
+                result = _spawn_case(entry, size, args, server)
+                if result is not None:
+                    _print_row(result)
+                    results.append(result)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'config': {k: v for k, v in vars(args).items() if k not in ('case', 'server', 'json')},
+                       'results': results}, f, indent=1)
+
+
+
+if __name__ == '__main__':
+    main()
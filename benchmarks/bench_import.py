@@ -0,0 +1,114 @@
+# cold-start import time of the package & its entry points (each import in a fresh interpreter)
+# guards against heavy / optional dependencies (pandas, selenium, ...) loaded before they are needed
+#
+#   python benchmarks/bench_import.py
+#   python benchmarks/bench_import.py --repeat 20 --max-ms 50   (exit code 1 if package import is slower)
+#   python benchmarks/bench_import.py --json before.json   (compare runs before / after a change)
+
+import os
+import sys
+import json
+import argparse
+import subprocess
+import numpy as np
+
+_DIR = os.path.dirname(os.path.abspath(__file__))
+_ROOT = os.path.dirname(_DIR) # package dir (imported by its dir name, e.g. yf_tools)
+_PACKAGE = os.path.basename(_ROOT)
+
+# modules reported as loaded / not loaded by each import
+_HEAVY = ('numpy', 'pandas', 'requests', 'aiohttp', 'selenium')
+
+
+
+#------------------------- Cases -------------------------#
+# {case: statement timed in a fresh interpreter ({pkg}: package name)}
+_CASES = {'package': 'import {pkg}',
+          'download_info': 'from {pkg} import download_info',
+          'download_day': 'from {pkg} import download_day',
+          'download_screener': 'from {pkg} import download_screener',
+          'YFClient': 'from {pkg} import YFClient',
+          'all': 'from {pkg} import *',
+          }
+
+# run in child: sec of statement & heavy modules loaded, as json
+_CHILD = '''
+import sys, time, json
+t = time.perf_counter()
+{stmt}
+sec = time.perf_counter() - t
+print(json.dumps({{'sec': sec, 'loaded': [name for name in {heavy!r} if name in sys.modules]}}))
+'''
+
+
+
+#------------------------- Run -------------------------#
+def _time_case(case, repeat):
+    '''time one case in repeat fresh interpreters -> dict of measures (None if import failed)'''
+    code = _CHILD.format(stmt=_CASES[case].format(pkg=_PACKAGE), heavy=_HEAVY)
+    paths = [os.path.dirname(_ROOT)] + ([os.environ['PYTHONPATH']] if os.environ.get('PYTHONPATH') else [])
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(paths))
+    secs = []
+    for i in range(repeat):
+        proc = subprocess.run([sys.executable, '-c', code], stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                              text=True, env=env, cwd=os.path.dirname(_ROOT))
+        if proc.returncode != 0:
+            print('{}: {}'.format(case, proc.stderr.strip().splitlines()[-1]), file=sys.stderr)
+            return None
+        result = json.loads(proc.stdout.strip().splitlines()[-1])
+        secs.append(result['sec'])
+
+    secs = np.array(secs) * 1000
+    return {'case': case, 'min_ms': float(secs.min()), 'median_ms': float(np.median(secs)),
+            'max_ms': float(secs.max()), 'loaded': result['loaded']}
+
+
+
+def _print_row(result):
+    print('{case:<19}{min_ms:>9.1f}{median_ms:>11.1f}{max_ms:>9.1f}   {loaded}'.format(
+          **dict(result, loaded=', '.join(result['loaded']) or '-')), flush=True)
+
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='cold-start import time of the package & its entry points')
+    parser.add_argument('--cases', nargs='+', default=list(_CASES), choices=list(_CASES))
+    parser.add_argument('--repeat', type=int, default=10, help='num of fresh interpreters per case')
+    parser.add_argument('--max-ms', type=float, help='fail if median import of package is slower (ms)')
+    parser.add_argument('--json', help='also write results to this file')
+    args = parser.parse_args(argv)
+
+    print('import {} ({} fresh interpreters per case)'.format(_PACKAGE, args.repeat))
+    print('{:<19}{:>9}{:>11}{:>9}   {}'.format('case', 'min ms', 'median ms', 'max ms', 'loaded'))
+    results = []
+    for case in args.cases:
+        result = _time_case(case, max(args.repeat, 1))
+        if result is not None:
+            _print_row(result)
+            results.append(result)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'config': {k: v for k, v in vars(args).items() if k != 'json'}, 'results': results},
+                      f, indent=1)
+
+    # guard: bare package import stays cheap (no heavy / optional dependency loaded)
+    failed = len(results) < len(args.cases)
+    for result in results:
+        if result['case'] == 'package':
+            if result['loaded']:
+                print('package import loads {}'.format(', '.join(result['loaded'])), file=sys.stderr)
+                failed = True
+            if (args.max_ms is not None) and (result['median_ms'] > args.max_ms):
+                print('package import {:.1f} ms > {} ms'.format(result['median_ms'], args.max_ms),
+                      file=sys.stderr)
+                failed = True
+    if 'selenium' in sum((result['loaded'] for result in results), []):
+        print('selenium loaded on import (only needed by get_symbols_download_url)', file=sys.stderr)
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,361 @@
+# local stand-in of yf for benchmarks: chart, quote, quote page & screener payloads
+# (shaped like recorded yf responses), with configurable latency, error rate & 429 injection
+# a session is pointed at it by redirect(sess, server), no code of the downloaders changed
+
+import json
+import time
+import random
+import threading
+from urllib.parse import urlsplit, parse_qs
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from requests.adapters import HTTPAdapter
+
+
+
+#------------------------- Description -------------------------#
+if False:
+
+    ### MockYF(latency, jitter, error_rate, rate_429, universe, page_kb) ###
+    with MockYF(latency=0.05, error_rate=0.01, rate_429=0.01) as server:
+        conn = _Connection(max_workers=16)
+        redirect(conn.sess, server) # https://*.yahoo.com -> http://127.0.0.1:port
+        ohlcvs = download_day(symbols, client=conn)
+
+        server.universe = 3000 # num of symbols found by the screener
+        server.n_requests # num of requests served (incl. injected errors)
+
+
+
+    ### redirect(sess, server) ###
+    # also records latency of each request sent through sess
+    adapter = redirect(conn.sess, server)
+    adapter.latencies # list of sec per request
+
+
+
+
+#------------------------- Definition -------------------------#
+_T_NOW = int(time.time()) // 86400 * 86400 # "now" of payloads: 00:00 UTC today, same data all day
+_INTRADAY_DAYS = {'1m': 30, '60m': 730, '1h': 730} # days of intraday data kept by yf (others: 60)
+
+
+
+class MockYF:
+    '''
+    local http server standing in for query1.finance.yahoo.com & finance.yahoo.com
+
+    latency : sec before each response
+    jitter : max sec added to latency at random
+    error_rate : fraction of requests answered with 500
+    rate_429 : fraction of requests answered with 429 (too many requests)
+    universe : num of symbols found by the screener (pages & json api)
+    page_kb : approx size of a quote page (kB) [yf quote pages are ~0.5 ~ 1 MB]
+    port : port to listen on (0: any free port)
+    '''
+
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, rate_429=0.0, universe=1000, page_kb=500,
+                 port=0):
+        self.latency = float(max(latency, 0.0))
+        self.jitter = float(max(jitter, 0.0))
+        self.error_rate = float(max(error_rate, 0.0))
+        self.rate_429 = float(max(rate_429, 0.0))
+        self.universe = int(max(universe, 0))
+        self.page_kb = int(max(page_kb, 0))
+        self.n_requests = 0
+
+        self._lock = threading.Lock()
+        self._cache = {} # {payload key: bytes} (symbol left as placeholder)
+        self._httpd = ThreadingHTTPServer(('127.0.0.1', port), _make_handler(self))
+        self._httpd.daemon_threads = True
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+
+
+    @property
+    def url(self):
+        '''base url of server, e.g. http://127.0.0.1:54321'''
+        return 'http://127.0.0.1:{}'.format(self._httpd.server_address[1])
+
+
+    def close(self):
+        '''stop serving'''
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+    def respond(self, method, path, body=None):
+        '''-> (status, headers, payload bytes) of a request'''
+        with self._lock:
+            self.n_requests += 1
+        time.sleep(self.latency + random.uniform(0.0, self.jitter))
+
+        # injected failures
+        p = random.random()
+        if p < self.rate_429:
+            return 429, {'Retry-After': '1'}, b'Too Many Requests'
+        if p < self.rate_429 + self.error_rate:
+            return 500, {}, b'Internal Server Error'
+
+        url = urlsplit(path)
+        params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        if url.path.startswith('/v8/finance/chart/'):
+            return 200, _JSON, self._chart(url.path.rsplit('/', 1)[-1], params)
+        if url.path.startswith('/v7/finance/quote'):
+            return 200, _JSON, _quote(params.get('symbols', '').split(','))
+        if url.path.startswith('/v1/finance/screener') and (method == 'POST'):
+            return 200, _JSON, self._screener_json(json.loads(body or b'{}'))
+        if url.path.startswith('/quote/'):
+            return 200, _HTML, self._quote_page(url.path.rsplit('/', 1)[-1])
+        if url.path.startswith('/screener/'):
+            return 200, _HTML, self._screener_page(params)
+        return 404, {}, b'Not Found'
+
+
+    def _cached(self, key, build):
+        '''payload of key, built once'''
+        payload = self._cache.get(key)
+        if payload is None:
+            payload = self._cache[key] = build()
+        return payload
+
+
+    def _chart(self, symbol, params):
+        '''chart api: bars of interval in [period1, period2) (intraday data: only last 30 / 60 / 730 days)'''
+        interval = params.get('interval', '1d')
+        step = _INTERVAL_SEC.get(interval, 86400)
+        period1 = int(float(params.get('period1', 0)))
+        period2 = int(float(params.get('period2', _T_NOW)))
+        if (step < 86400) and (period1 < _T_NOW - _INTRADAY_DAYS.get(interval, 60) * 86400):
+            return json.dumps({'chart': {'result': None, 'error': {
+                'code': 'Unprocessable Entity',
+                'description': '{} data not available for startTime={} and endTime={}. '
+                               'The requested range must be within the last {} days.'
+                               .format(interval, period1, period2, _INTRADAY_DAYS.get(interval, 60))}}}).encode()
+
+        payload = self._cached(('chart', step, period1, period2, params.get('events', '')),
+                               lambda: _chart(step, period1, period2, params.get('events', '')))
+        return payload.replace(_SYMBOL, symbol.encode())
+
+
+    def _quote_page(self, symbol):
+        '''quote page: html with data store in "root.App.main = {...};"'''
+        payload = self._cached(('quote_page', self.page_kb), lambda: _quote_page(self.page_kb))
+        return payload.replace(_SYMBOL, symbol.encode())
+
+
+    def _screener_page(self, params):
+        '''screener page (html table of symbols) of offset & count'''
+        offset, count = int(params.get('offset', 0)), int(params.get('count', 25))
+        symbols = _symbols(offset, min(offset + count, self.universe))
+        rows = ''.join('<tr><td><a href="/quote/{0}?p={0}">{0}</a><div class="x"></div></td></tr>'
+                           .format(symbol) for symbol in symbols)
+        html = ('<html><body><span>{}-{} of {} results</span><table>{}</table></body></html>'
+                    .format(offset + 1, offset + len(symbols), self.universe, rows))
+        return html.encode()
+
+
+    def _screener_json(self, body):
+        '''screener json api: page of offset & size'''
+        offset, size = int(body.get('offset', 0)), int(body.get('size', 25))
+        symbols = _symbols(offset, min(offset + size, self.universe))
+        result = {'start': offset, 'count': len(symbols), 'total': self.universe,
+                  'quotes': [{'symbol': symbol, 'quoteType': body.get('quoteType', 'EQUITY')} for symbol in symbols]}
+        return json.dumps({'finance': {'result': [result], 'error': None}}).encode()
+
+
+
+def redirect(sess, server):
+    '''
+    send requests of sess to server instead of yf (same pool size as mounted adapter)
+
+    sess : requests.Session
+    server : MockYF / base url (str) of a running one
+
+    -> adapter (with list of sec per request: adapter.latencies)
+    '''
+    base = server.url if isinstance(server, MockYF) else str(server).rstrip('/')
+    pool_maxsize = sess.get_adapter('https://').poolmanager.connection_pool_kw.get('maxsize', 10)
+    adapter = _RedirectAdapter(base, pool_connections=4, pool_maxsize=pool_maxsize)
+    sess.mount('https://', adapter)
+    sess.mount('http://', adapter)
+    return adapter
+
+
+
+class _RedirectAdapter(HTTPAdapter):
+    '''HTTPAdapter rewriting scheme & host of every request to base url, timing each request'''
+
+    def __init__(self, base, **kwargs):
+        super().__init__(**kwargs)
+        self.base = base
+        self.latencies = [] # sec per request (list.append is thread-safe)
+
+
+    def send(self, request, **kwargs):
+        url = urlsplit(request.url)
+        request.url = self.base + url.path + ('?' + url.query if url.query else '')
+        t = time.perf_counter()
+        try:
+            return super().send(request, **kwargs)
+        finally:
+            self.latencies.append(time.perf_counter() - t)
+
+
+
+def _make_handler(server):
+    '''request handler class answering with server.respond'''
+
+    class _Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1' # keep-alive, as yf
+
+        def do_GET(self):
+            self._reply(*server.respond('GET', self.path))
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+            self._reply(*server.respond('POST', self.path, body))
+
+        def _reply(self, status, headers, payload):
+            self.send_response(status)
+            for k, v in headers.items():
+                self.send_header(k, v)
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, *args):
+            pass
+
+    return _Handler
+
+
+
+#------------------------- Payloads -------------------------#
+_SYMBOL = b'__SYMBOL__' # placeholder of symbol in cached payloads
+_JSON = {'Content-Type': 'application/json;charset=utf-8'}
+_HTML = {'Content-Type': 'text/html;charset=utf-8'}
+_INTERVAL_SEC = {'1m': 60, '2m': 120, '5m': 300, '15m': 900, '30m': 1800, '60m': 3600, '90m': 5400,
+                 '1h': 3600, '1d': 86400, '5d': 5 * 86400, '1wk': 7 * 86400, '1mo': 30 * 86400,
+                 '3mo': 90 * 86400}
+
+
+
+def _symbols(start, end):
+    '''symbols of screener results [start, end)'''
+    return ['S{:05d}'.format(i) for i in range(start, end)]
+
+
+
+def _chart(step, period1, period2, events):
+    '''chart json (symbol as placeholder): weekday bars, 09:30 ~ 16:00 New York for intraday'''
+    period1 = max(period1, _T_NOW - 40 * 365 * 86400) # listed 40 years ago
+    period2 = min(period2, _T_NOW)
+
+    # timestamps of bars (New York: UTC-4, as summer time, good enough for a stand-in)
+    if step >= 86400:
+        days = range(-(-period1 // 86400), -(-period2 // 86400))
+        stamps = [day * 86400 + 13 * 3600 + 30 * 60 for day in days if (day + 3) % 7 < 5]
+    else:
+        open_, close = 13 * 3600 + 30 * 60, 20 * 3600
+        t0 = -(-period1 // step) * step
+        stamps = [t for t in range(t0, period2, step)
+                      if ((t // 86400 + 3) % 7 < 5) and (open_ <= t % 86400 < close)]
+
+    # prices: smooth walk, a few missing bars as yf
+    closes = [round(100 + 10 * ((t // step) % 97) / 97, 4) for t in stamps]
+    quote = {'open': [round(c - 0.1, 4) for c in closes],
+             'high': [round(c + 0.5, 4) for c in closes],
+             'low': [round(c - 0.5, 4) for c in closes],
+             'close': closes,
+             'volume': [1000 + (t // step) % 1000 for t in stamps]}
+    for i in range(5, len(stamps), 211):
+        for field in quote:
+            quote[field][i] = None
+
+    result = {'meta': {'currency': 'USD', 'symbol': _SYMBOL.decode(), 'exchangeName': 'NMS',
+                       'instrumentType': 'EQUITY', 'firstTradeDate': _T_NOW - 40 * 365 * 86400,
+                       'gmtoffset': -14400, 'timezone': 'EDT', 'exchangeTimezoneName': 'America/New_York',
+                       'dataGranularity': '1d' if step >= 86400 else '1m'},
+              'timestamp': stamps,
+              'indicators': {'quote': [quote]}}
+    if step >= 86400:
+        result['indicators']['adjclose'] = [{'adjclose': [None if c is None else round(c * 0.98, 4)
+                                                              for c in quote['close']]}]
+    if not stamps:
+        result.pop('timestamp')
+        result['indicators'] = {'quote': [{}]}
+
+    # events: dividend every ~quarter, rare splits
+    if 'div' in events:
+        result.setdefault('events', {})['dividends'] = {
+            str(t): {'amount': 0.25, 'date': t} for t in stamps[::63] if step >= 86400}
+    if 'split' in events:
+        result.setdefault('events', {})['splits'] = {
+            str(t): {'date': t, 'numerator': 2, 'denominator': 1, 'splitRatio': '2:1'}
+                for t in stamps[1000::2500] if step >= 86400}
+
+    return json.dumps({'chart': {'result': [result], 'error': None}}).encode()
+
+
+
+def _quote(symbols):
+    '''quote json of symbols (~80 fields each, as yf)'''
+    results = []
+    for i, symbol in enumerate(symbols):
+        if not symbol:
+            continue
+        info = {'language': 'en-US', 'region': 'US', 'quoteType': 'EQUITY', 'currency': 'USD',
+                'exchange': 'NMS', 'exchangeTimezoneName': 'America/New_York', 'exchangeTimezoneShortName': 'EDT',
+                'marketState': 'REGULAR', 'market': 'us_market', 'shortName': symbol + ' Inc.',
+                'longName': symbol + ' Incorporated', 'symbol': symbol, 'tradeable': False, 'triggerable': True,
+                'regularMarketTime': _T_NOW - i % 60, 'regularMarketPrice': 100.0 + i % 100,
+                'regularMarketChange': 0.5, 'regularMarketChangePercent': 0.5, 'regularMarketVolume': 10000 + i,
+                'regularMarketDayHigh': 101.0, 'regularMarketDayLow': 99.0, 'regularMarketOpen': 100.0,
+                'regularMarketPreviousClose': 99.5, 'bid': 100.0, 'ask': 100.1, 'bidSize': 10, 'askSize': 12,
+                'fullExchangeName': 'NasdaqGS', 'financialCurrency': 'USD', 'averageDailyVolume3Month': 20000,
+                'averageDailyVolume10Day': 18000, 'fiftyTwoWeekLow': 80.0, 'fiftyTwoWeekHigh': 120.0,
+                'fiftyTwoWeekRange': '80.0 - 120.0', 'fiftyDayAverage': 101.0, 'twoHundredDayAverage': 98.0,
+                'marketCap': 1000000000 + i, 'sharesOutstanding': 10000000, 'trailingPE': 20.5,
+                'epsTrailingTwelveMonths': 4.9, 'epsForward': 5.3, 'priceToBook': 3.1, 'sourceInterval': 15,
+                'exchangeDataDelayedBy': 0, 'gmtOffSetMilliseconds': -14400000, 'esgPopulated': False,
+                'firstTradeDateMilliseconds': 1000000000000, 'priceHint': 2}
+        info.update({'field{}'.format(k): k * 1.5 for k in range(30)}) # rest of the ~80 fields
+        results.append(info)
+    return json.dumps({'quoteResponse': {'result': results, 'error': None}}).encode()
+
+
+
+def _quote_page(page_kb):
+    '''quote page html of page_kb (symbol as placeholder): scripts & markup around the data store'''
+    modules = {'price': {'symbol': _SYMBOL.decode(), 'regularMarketPrice': {'raw': 100.0, 'fmt': '100.00'},
+                         'currency': 'USD', 'exchangeName': 'NasdaqGS', 'longName': 'Mock Inc.'},
+               'summaryDetail': {'beta': {'raw': 1.1, 'fmt': '1.10'}, 'trailingPE': {'raw': 20.5, 'fmt': '20.50'},
+                                 'marketCap': {'raw': 1000000000, 'fmt': '1B', 'longFmt': '1,000,000,000'},
+                                 'dividendYield': {}, 'maxAge': 1},
+               'assetProfile': {'sector': 'Technology', 'industry': 'Software', 'fullTimeEmployees': 1000,
+                                'companyOfficers': [{'name': 'Someone', 'age': 50}] * 5,
+                                'longBusinessSummary': 'Mock business. ' * 50},
+               'defaultKeyStatistics': {'field{}'.format(k): {'raw': k * 1.5, 'fmt': str(k * 1.5)}
+                                            for k in range(60)},
+               'financialData': {'field{}'.format(k): {'raw': k, 'fmt': str(k)} for k in range(60, 100)}}
+
+    # other stores of the page (most of the data store)
+    filler = {'store{}'.format(k): {'items': [{'id': j, 'text': 'x' * 40} for j in range(50)]}
+                  for k in range(max(page_kb // 8, 1))}
+    stores = dict(filler, QuoteSummaryStore=modules)
+    store = json.dumps({'context': {'dispatcher': {'stores': stores}}})
+
+    markup = '<div class="row">' + '<span>mock</span>' * 10 + '</div>\n'
+    html = ('<!DOCTYPE html><html><head><title>Mock</title></head><body>\n'
+            + markup * max(page_kb * 1024 // 2 // len(markup), 1)
+            + '<script>(function (root) {\nroot.App || (root.App = {});\nroot.App.now = 1;\n'
+            + 'root.App.main = ' + store + ';\n}(this));\n</script></body></html>')
+    return html.encode()
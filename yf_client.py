@@ -0,0 +1,133 @@
+try:
+    from ._http import _Connection
+    from .yf_download_day import download_day, iter_download_day
+    from .yf_download_minute import download_minute, iter_download_minute
+    from .yf_download_history import download_history, iter_download_history
+    from .yf_download_info import download_info, download_details, iter_download_details
+    from .yf_download_symbols import download_symbols, iter_download_symbols
+    from .yf_screener import download_screener, iter_download_screener
+except ImportError:
+    from _http import _Connection
+    from yf_download_day import download_day, iter_download_day
+    from yf_download_minute import download_minute, iter_download_minute
+    from yf_download_history import download_history, iter_download_history
+    from yf_download_info import download_info, download_details, iter_download_details
+    from yf_download_symbols import download_symbols, iter_download_symbols
+    from yf_screener import download_screener, iter_download_screener
+
+
+
+
+
+#-------------------------Description-------------------------#
+# long-lived client: warm keep-alive connections & worker threads reused across calls
+# (each top-level download_* call without client opens & closes its own)
+
+if False:
+    import yf_tools as yf
+
+    with yf.YFClient(max_workers=16) as client:
+        for i in range(100):
+            info_df = client.download_info(symbols) # no new TLS handshakes after 1st call
+            time.sleep(5)
+
+        ohlcvs = client.download_day(symbols, start='2020-08-01')
+        ohlcvs = client.download_minute(symbols)
+        ohlcvs = client.download_history(symbols, interval='5m')
+
+    # same as passing client to top-level functions
+    client = yf.YFClient()
+    ohlcvs = yf.download_day(symbols, client=client)
+    client.close()
+
+    # Inputs
+    # max_workers : num of download threads (None: default of ThreadPoolExecutor)
+    # pool_maxsize : max num of connections kept open per host (at least max_workers)
+    # metrics : Metrics recording each request & job (None: process-wide one of set_metrics, if any)
+
+    # where throughput is lost: requests, errors, retries, latency per endpoint
+    with yf.YFClient(metrics=yf.Metrics()) as client:
+        ohlcvs = client.download_day(symbols)
+        client.metrics.summary()
+        client.metrics.failures()
+
+    # (rate limits set by set_rate_limit are process-wide, shared by all clients)
+
+
+
+
+
+#-------------------------Definition-------------------------#
+
+class YFClient(_Connection):
+    '''
+    long-lived client owning a keep-alive connection pool (sized to the workers) & worker threads
+
+    max_workers : num of download threads (None: default of ThreadPoolExecutor)
+    pool_maxsize : max num of connections kept open per host (None / less than max_workers: max_workers)
+    metrics : Metrics recording each request & job (None: process-wide one of set_metrics, if any)
+    '''
+
+    def download_day(self, symbols, *args, **kwargs):
+        '''download_day with connections & threads of client'''
+        return download_day(symbols, *args, client=self, **kwargs)
+
+
+    def iter_download_day(self, symbols, *args, **kwargs):
+        '''iter_download_day with connections & threads of client'''
+        return iter_download_day(symbols, *args, client=self, **kwargs)
+
+
+    def download_minute(self, symbols, *args, **kwargs):
+        '''download_minute with connections & threads of client'''
+        return download_minute(symbols, *args, client=self, **kwargs)
+
+
+    def iter_download_minute(self, symbols, *args, **kwargs):
+        '''iter_download_minute with connections & threads of client'''
+        return iter_download_minute(symbols, *args, client=self, **kwargs)
+
+
+    def download_history(self, symbols, *args, **kwargs):
+        '''download_history with connections & threads of client'''
+        return download_history(symbols, *args, client=self, **kwargs)
+
+
+    def iter_download_history(self, symbols, *args, **kwargs):
+        '''iter_download_history with connections & threads of client'''
+        return iter_download_history(symbols, *args, client=self, **kwargs)
+
+
+    def download_info(self, symbols, *args, **kwargs):
+        '''download_info with connections & threads of client'''
+        return download_info(symbols, *args, client=self, **kwargs)
+
+
+    def download_details(self, symbols, *args, **kwargs):
+        '''download_details with connections & threads of client'''
+        return download_details(symbols, *args, client=self, **kwargs)
+
+
+    def iter_download_details(self, symbols, *args, **kwargs):
+        '''iter_download_details with connections & threads of client'''
+        return iter_download_details(symbols, *args, client=self, **kwargs)
+
+
+    def download_symbols(self, url, *args, **kwargs):
+        '''download_symbols with connections & threads of client'''
+        return download_symbols(url, *args, client=self, **kwargs)
+
+
+    def iter_download_symbols(self, url, *args, **kwargs):
+        '''iter_download_symbols with connections & threads of client'''
+        return iter_download_symbols(url, *args, client=self, **kwargs)
+
+
+    def download_screener(self, query, *args, **kwargs):
+        '''download_screener with connections & threads of client'''
+        return download_screener(query, *args, client=self, **kwargs)
+
+
+    def iter_download_screener(self, query, *args, **kwargs):
+        '''iter_download_screener with connections & threads of client'''
+        return iter_download_screener(query, *args, client=self, **kwargs)
@@ -0,0 +1,295 @@
+import time
+import pandas as pd
+import asyncio
+import builtins
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+try:
+    from ._rate_limit import _make_pacer, _wait_for_slot_async
+    from .yf_download_day import _day_bounds, _day_request, _parse_day
+    from .yf_download_minute import (_earliest_minute, _minute_bounds, _minute_calendars, _trading_windows,
+                                     _concat_windows, _minute_request, _parse_minute)
+    from ._inputs import _process_symbols, _process_timeout
+    from ._decode import _loads
+    from ._engine import _backoff
+    from ._metrics import _get_metrics
+except ImportError:
+    from _rate_limit import _make_pacer, _wait_for_slot_async
+    from yf_download_day import _day_bounds, _day_request, _parse_day
+    from yf_download_minute import (_earliest_minute, _minute_bounds, _minute_calendars, _trading_windows,
+                                    _concat_windows, _minute_request, _parse_minute)
+    from _inputs import _process_symbols, _process_timeout
+    from _decode import _loads
+    from _engine import _backoff
+    from _metrics import _get_metrics
+
+
+
+
+
+#-------------------------Description-------------------------#
+# asyncio versions of download_day & download_minute (requires aiohttp)
+# all requests are multiplexed on one event loop (no thread pool), at most
+# 'max_concurrency' requests in flight, same parsing as the sync versions
+
+if False:
+    import asyncio
+    from yf_download_async import *
+
+    symbols = ['AAPL', 'LMFA', 'XXXXX', 'MARA']
+
+    # inside a coroutine
+    async def main():
+        ohlcvs = await download_day_async(symbols, start='2020-08-01', speed=0.1, retry=1)
+        ohlcvs = await download_minute_async(symbols, show_prepost=True, max_concurrency=20)
+
+    # from sync code
+    ohlcvs = asyncio.run(download_day_async(symbols))
+
+    # Inputs (on top of the sync versions)
+    # max_concurrency : max num of requests in flight
+
+    # Output
+    # dict of ohlcvs (df) [same as the sync versions]
+
+
+
+
+
+#-------------------------Definition-------------------------#
+
+async def download_day_async(symbols, start=None, end=None, show_actions=False, show_adjclose=True,
+                             speed=0, retry=0, timeout=(3.05,5), max_concurrency=50, verbose=False,
+                             compact=False):
+    '''
+    async version of download_day (download daily data for many symbols, adjusted for split)
+
+    symbols : list of symbols (list of str)
+    start : start utc date (str) / utc timestamp (int)
+    end : end utc date (str) / utc timestamp (int)
+    show_actions : show stock splits & dividends ?
+    show_adjclose : show adjusted closing price ?
+    speed : sec per requested download (on top of the shared limit set by set_rate_limit)
+    retry : num of download retry if download fails
+    timeout : sec to request timeout [specify: sec / (sec: connect timeout, sec: response timeout)]
+    max_concurrency : max num of requests in flight
+    verbose : show detailed download info ?
+    compact : compact memory ? (same as download_day)
+
+    -> dict of ohlcvs (df)
+    '''
+
+    # process inputs
+    symbols, single_symbol = _process_symbols(symbols)
+    start, end = _day_bounds(start, end)
+    print = builtins.print if verbose else _no_print
+
+    print('Download start at : {} (in UTC time)'.format(str(start)))
+    print('Download end at : {} (in UTC time)'.format(str(end)))
+    print('Download speed : {:.3f} sec/request '.format(round(max(speed, 0.0), 2)))
+    print()
+
+    # one job per symbol
+    jobs = {symbol: _day_request(symbol, start.timestamp(), end.timestamp(), show_actions)
+                for symbol in symbols}
+    parse = lambda content: _parse_day(content, show_actions, show_adjclose, compact)
+
+    async with _AsyncDownloader(speed, retry, timeout, max_concurrency) as downloader:
+        ohlcvs = await downloader.run(jobs, parse, print)
+
+    print('Total {} datasets have been downloaded'.format(len(ohlcvs)))
+
+    if single_symbol:
+        return ohlcvs[single_symbol]
+
+    return ohlcvs # dict of df
+
+
+
+async def download_minute_async(symbols, start=None, end=None, show_prepost=False, show_split=False,
+                                speed=0, retry=0, timeout=(3.05,5), max_concurrency=50, verbose=False,
+                                compact=False):
+    '''
+    async version of download_minute (download minute data for many symbols, not adjusted for split)
+
+    symbols : list of symbols (list of str)
+    start : start date (str) / starting utc timestamp (int)
+    end : end date (str) / ending utc timestamp (int)
+    show_prepost : show pre & post market data ?
+    show_split : show stock splits ?
+    speed : sec per requested download (on top of the shared limit set by set_rate_limit)
+    retry : num of download retry if download fails
+    timeout : sec to request timeout [specify: sec / (sec: connect timeout, sec: response timeout)]
+    max_concurrency : max num of requests in flight
+    verbose : show detailed download info ?
+    compact : compact memory ? (same as download_minute)
+
+    -> dict of ohlcvs (df)
+    '''
+
+    # process inputs
+    symbols, single_symbol = _process_symbols(symbols)
+    start, end = _minute_bounds(start, end)
+    print = builtins.print if verbose else _no_print
+
+    async with _AsyncDownloader(speed, retry, timeout, max_concurrency) as downloader:
+
+        # earliest start time with minute data on yf (lookback found once per day & memoized)
+        start = max(start, await asyncio.to_thread(_earliest_minute, None, _process_timeout(timeout)))
+
+        # windows of each symbol: trading dates of its exchange only (calendar fetched once per day)
+        calendars = await asyncio.to_thread(_minute_calendars, symbols, None, _process_timeout(timeout))
+        windows = {symbol: _trading_windows(start, end, calendars[symbol]) for symbol in symbols}
+
+        print('Download start at : {} (in UTC time)'.format(str(start)))
+        print('Download end at : {} (in UTC time)'.format(str(end)))
+        print('Divided into {} parts (trading dates only)'.format(sum(len(w) for w in windows.values())))
+        print('Download speed : {:.3f} sec/request'.format(round(max(speed, 0.0), 2)))
+        print()
+
+        # one job per (symbol, window)
+        jobs = {(symbol, j): _minute_request(symbol, start_j.timestamp(), end_j.timestamp(), show_prepost)
+                    for symbol in symbols
+                    for j, (start_j, end_j) in enumerate(windows[symbol])}
+        parse = lambda content: _parse_minute(content, show_split, compact)
+        results = await downloader.run(jobs, parse, print)
+
+    # concatenate list of dfs (in window order)
+    ohlcv_lists = {}
+    for (symbol, j) in sorted(results, key=lambda key: key[1]):
+        ohlcv_lists.setdefault(symbol, []).append(results[(symbol, j)])
+    ohlcvs = {symbol: _concat_windows(ohlcv_lists[symbol])
+                  for symbol in symbols
+                  if symbol in ohlcv_lists}
+    print('Total {} datasets have been downloaded'.format(len(ohlcvs)))
+
+    if single_symbol:
+        return ohlcvs[single_symbol]
+
+    return ohlcvs # dict of df
+
+
+
+
+
+class _AsyncDownloader:
+    '''
+    aiohttp session + concurrency semaphore + pacing shared by the jobs of one call
+
+    speed : sec per requested download
+    retry : num of download retry if download fails
+    timeout : sec to request timeout [specify: sec / (sec: connect timeout, sec: response timeout)]
+    max_concurrency : max num of requests in flight
+    '''
+
+    def __init__(self, speed, retry, timeout, max_concurrency):
+        if aiohttp is None:
+            raise ImportError('aiohttp is required for async downloads, please "pip install aiohttp"')
+
+        self.retry = int(max(retry, 0)) # [0, inf) # [num of retry]
+        self.pacer = _make_pacer(float(max(speed, 0.0)))
+        self.max_concurrency = int(max(max_concurrency, 1)) # [1, inf)
+        self.semaphore = asyncio.Semaphore(self.max_concurrency)
+        self.timeout = _client_timeout(timeout)
+        self.metrics = _get_metrics() # process-wide Metrics of set_metrics / None
+        self.sess = None
+
+
+    async def __aenter__(self):
+        connector = aiohttp.TCPConnector(limit=self.max_concurrency)
+        self.sess = aiohttp.ClientSession(connector=connector, timeout=self.timeout)
+        return self
+
+
+    async def __aexit__(self, *exc_info):
+        await self.sess.close()
+
+
+    async def fetch(self, url, params, headers, parse):
+        '''download one request & parse the decoded json'''
+        params = {k: str(v) for k, v in params.items()} # aiohttp only accepts str params
+        await _wait_for_slot_async(url, self.pacer)
+        async with self.semaphore:
+            if self.metrics is None:
+                async with self.sess.get(url, params=params, headers=headers) as resp:
+                    content = _loads(await resp.read())
+                return parse(content)
+
+            # same records as requests of a sync download
+            t_sent, t = time.time(), time.perf_counter()
+            status, ttfb, body = None, None, b''
+            try:
+                async with self.sess.get(url, params=params, headers=headers) as resp:
+                    status, ttfb = resp.status, time.perf_counter() - t
+                    body = await resp.read()
+            except Exception as e:
+                self.metrics.record_request(url, status, 0, ttfb, time.perf_counter() - t, type(e).__name__,
+                                            t_sent)
+                raise
+            self.metrics.record_request(url, status, len(body), ttfb, time.perf_counter() - t, None, t_sent)
+        return parse(_loads(body))
+
+
+    async def run(self, jobs, parse, print=None):
+        '''
+        download all jobs concurrently, retry each failed job on its own
+        (after a jittered exponential backoff, other jobs keep running meanwhile)
+
+        jobs : dict of {key: (url, params, headers)}
+        parse : function of decoded json -> df
+
+        -> dict of {key: df} (failed jobs excluded)
+        '''
+        print = print or _no_print
+        print('Total {} to download (up to {} attempts each)'.format(len(jobs), self.retry + 1))
+
+        async def attempt(key):
+            for i_attempt in range(self.retry + 1):
+                try:
+                    result = await self.fetch(*jobs[key], parse)
+                except Exception as e:
+                    if self.metrics is not None:
+                        self.metrics.record_failure(key, e, final=(i_attempt == self.retry))
+                    if i_attempt == self.retry:
+                        if self.metrics is not None:
+                            self.metrics.record_job(key, i_attempt + 1)
+                        return e
+                    await asyncio.sleep(_backoff(i_attempt))
+                    continue
+                if self.metrics is not None:
+                    self.metrics.record_job(key, i_attempt + 1)
+                return result
+
+        keys = list(jobs)
+        outcomes = await asyncio.gather(*[attempt(key) for key in keys])
+
+        results = {}
+        failed_keys = []
+        for key, outcome in zip(keys, outcomes):
+            if isinstance(outcome, Exception):
+                failed_keys.append(key)
+            else:
+                results[key] = outcome
+
+        if failed_keys:
+            print('    Failed :', ' '.join(map(str, failed_keys)))
+
+        return results
+
+
+
+def _client_timeout(timeout):
+    '''requests-style timeout -> aiohttp.ClientTimeout'''
+    if isinstance(timeout, tuple):
+        connect, read = (float(max(t, 0.0)) for t in timeout)
+        return aiohttp.ClientTimeout(sock_connect=connect, sock_read=read)
+    return aiohttp.ClientTimeout(total=float(max(timeout, 0.0)))
+
+
+
+def _no_print(*args, **kwargs):
+    pass
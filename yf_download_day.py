@@ -4,13 +4,30 @@ import pandas as pd
 import time
 import re
 import os
-from concurrent.futures import ThreadPoolExecutor
 import builtins
 
 try:
     from ._progress import _progress_status, _progress_bar
+    from ._rate_limit import _make_pacer, _wait_for_slot
+    from ._http import _use_client
+    from ._cache import _check_parquet, _day_cache_path, _read_parquet, _write_parquet
+    from ._engine import _iter_jobs
+    from ._inputs import _process_symbols, _process_timeout
+    from ._decode import _loads, _float_array, _event_array
+    from ._compact import _compact_ohlcv
+    from ._checkpoint import _Journal
+    from .yf_panel import _build_panel
 except ImportError:
     from _progress import _progress_status, _progress_bar
+    from _rate_limit import _make_pacer, _wait_for_slot
+    from _http import _use_client
+    from _cache import _check_parquet, _day_cache_path, _read_parquet, _write_parquet
+    from _engine import _iter_jobs
+    from _inputs import _process_symbols, _process_timeout
+    from _decode import _loads, _float_array, _event_array
+    from _compact import _compact_ohlcv
+    from _checkpoint import _Journal
+    from yf_panel import _build_panel
 
 
 
@@ -38,6 +55,7 @@ if False:
                            retry=1,
                            timeout=(3.05,5),
                            verbose=True,
+                           cache_dir=None, # e.g. 'yf_cache' to keep history on disk
                            )
 
     # Inputs
@@ -49,6 +67,7 @@ if False:
     # speed : sec per requested download
     # retry : num of download retry (to maximize downloaded content)
     # timeout : sec to request timeout [specify sec / specify (sec: connect timeout, sec: response timeout)]
+    # cache_dir : dir of local cache (only new bars since last cached date are downloaded)
 
     # Output
     # dict of ohlcvs (df)
@@ -57,6 +76,21 @@ if False:
     # combine into a single df
     ohlcvs_df = pd.concat(ohlcvs, axis=1)
 
+    # or get aligned panel directly (time x symbol x field), e.g. all closes
+    panel = download_day(symbols, output='panel')
+    closes = panel['close']
+
+    # compact memory: float32 prices, integer volume, sparse dividend & split
+    ohlcvs = download_day(symbols, show_actions=True, compact=True)
+
+    # checkpoint: rerun with same arguments after a crash / Ctrl-C to download only symbols left
+    ohlcvs = download_day(symbols, checkpoint_dir='yf_checkpoint')
+
+
+    # yield each symbol as soon as downloaded (in completion order, same inputs as above)
+    for symbol, ohlcv in iter_download_day(symbols, speed=0.1, retry=1):
+        ohlcv.to_csv(symbol + '.csv')
+
 
 
     
@@ -84,7 +118,8 @@ timeout=(3.05,5)
 '''
 
 def download_day(symbols, start=None, end=None, show_actions=False, show_adjclose=True,
-                 speed=0, retry=0, timeout=(3.05,5), verbose=False):
+                 speed=0, retry=0, timeout=(3.05,5), verbose=False, cache_dir=None, output='dict',
+                 client=None, compact=False, checkpoint_dir=None):
     '''
     download daily data for many symbols (adjusted for split)
     download speed control by seconds / request
@@ -94,49 +129,73 @@ def download_day(symbols, start=None, end=None, show_actions=False, show_adjclos
     end : end utc date (str) / utc timestamp (int)
     show_actions : show stock splits & dividends ?
     show_adjclose : show adjusted closing price ?
-    speed : sec per requested download
+    speed : sec per requested download (on top of the shared limit set by set_rate_limit)
     retry : num of download retry if download fails
     timeout : sec to request timeout [specify: sec / (sec: connect timeout, sec: response timeout)]
-
-    -> dict of ohlcvs (df)
+    cache_dir : dir of local cache (None: no cache) [full history cached, only new bars downloaded]
+    output : 'dict' (dict of df) / 'panel' (Panel, aligned 3D array of time x symbol x field)
+    client : YFClient to reuse its connections & worker threads (None: new ones for this call only)
+    compact : compact memory ? [float32 prices, integer volume (0 if missing), sparse dividend & split]
+              (panel: float32)
+    checkpoint_dir : dir of checkpoint journal (None: no checkpoint) [rerun with same arguments after
+                     a crash resumes the symbols left, checkpoint removed once the run finishes]
+
+    -> dict of ohlcvs (df) / Panel
     '''
 
-    # process inputs
+    symbols, single_symbol = _process_symbols(symbols)
 
-    # symbol list
-    single_symbol = False
-    if isinstance(symbols, str): 
-        symbols = re.split(r'[\s,|;]+', symbols.strip('\n\t ,|;'))
-        if len(symbols) == 1:
-            single_symbol = symbols[0]
-    symbols = [symbol.upper() for symbol in symbols]
+    # aligned panel, built from arrays as results arrive
+    if output == 'panel':
+        return _build_panel(iter_download_day(symbols, start, end, show_actions, show_adjclose,
+                                              speed, retry, timeout, verbose, cache_dir, client, compact,
+                                              checkpoint_dir),
+                            symbols, np.float32 if compact else np.float64)
 
-        
-    # start time
-    if start is None: 
-        start = pd.Timestamp('1900-01-01')
-    elif isinstance(start, str):
-        start = pd.Timestamp(start)
-    else: # int / float / pd.Timestamp
-        start = pd.Timestamp(start, unit='s')
+    # collect all results (same order as symbols)
+    ohlcvs = dict(iter_download_day(symbols, start, end, show_actions, show_adjclose,
+                                    speed, retry, timeout, verbose, cache_dir, client, compact,
+                                    checkpoint_dir))
+    ohlcvs = {symbol: ohlcvs[symbol] for symbol in symbols if symbol in ohlcvs}
 
+    if single_symbol:
+        return ohlcvs[single_symbol]
+    
+    return ohlcvs # dict of df
 
-    # end time
-    if end is None: 
-        end = pd.Timestamp.now(tz='utc').tz_convert(None) + pd.Timedelta('1d')
-        end = end.normalize()
-    elif isinstance(end, str):
-        end = pd.Timestamp(end)
-    else: # int / float / pd.Timestamp
-        end = pd.Timestamp(end, unit='s')
+
+
+def iter_download_day(symbols, start=None, end=None, show_actions=False, show_adjclose=True,
+                      speed=0, retry=0, timeout=(3.05,5), verbose=False, cache_dir=None, client=None,
+                      compact=False, checkpoint_dir=None):
+    '''
+    download daily data for many symbols (adjusted for split),
+    yield each symbol as soon as its download is done (in completion order)
+
+    (inputs same as download_day)
+
+    -> generator of (symbol, df of ohlcv)
+    '''
+
+    # process inputs
+    symbols, _ = _process_symbols(symbols)
+
+    # start & end time (planned once per checkpoint, same plan on resume)
+    journal = None
+    if checkpoint_dir is None:
+        start, end = _day_bounds(start, end)
+    else:
+        journal = _Journal(checkpoint_dir, 'day', [symbols, start, end, show_actions, show_adjclose,
+                                                   cache_dir, compact], relative=(start is None) or (end is None))
+        start, end = journal.plan(lambda: _day_bounds(start, end))
     
 
     # download config
     speed = float(max(speed, 0.0)) # [0.0, inf) # [sec per request]
     retry = int(max(retry, 0)) # [0, inf) # [num of retry]
-    timeout = ( tuple( float(max(t, 0.0)) for t in timeout )
-                   if isinstance(timeout, tuple)
-                   else float(max(timeout, 0.0)) ) # [0.0, inf) # [sec to request timeout]
+    timeout = _process_timeout(timeout)
+    if cache_dir is not None:
+        _check_parquet()
 
 
     # print msg config
@@ -154,83 +213,91 @@ def download_day(symbols, start=None, end=None, show_actions=False, show_adjclos
 
 
     # main program
-    with requests.Session() as sess:
-        with ThreadPoolExecutor() as executor:
+    url_base = 'https://query1.finance.yahoo.com/v8/finance/chart/'
+    pacer = _make_pacer(speed) # per-call speed control (shared host limit applied as well)
+    with _use_client(client) as client:
+        sess, executor = client.sess, client.executor
+
+        def submit(symbol):
+            # speed control
+            _wait_for_slot(url_base + symbol, pacer)
+
+            # request download & extract data
+            if cache_dir is None:
+                return executor.submit(_download_day_unit, symbol,
+                                       start.timestamp(), end.timestamp(),
+                                       show_actions, show_adjclose, sess, timeout, compact)
+            return executor.submit(_download_day_cached, symbol,
+                                   start.timestamp(), end.timestamp(),
+                                   show_actions, show_adjclose, sess, timeout, cache_dir, compact)
+
+        n_done = 0
+        pending = symbols
+        finished = False
+        try:
+            # symbols done by previous runs of checkpoint (data read back from disk)
+            if journal is not None:
+                done = set(journal.done)
+                print('Checkpoint: {} symbols done before'.format(len(done)))
+                pending = [symbol for symbol in symbols if symbol not in done]
+                for symbol in symbols:
+                    if symbol in done:
+                        n_done += 1
+                        yield symbol, journal.load(symbol)
+
+            # yield downloaded ohlcv (failed symbols skipped)
+            for symbol, ohlcv in _iter_jobs(executor, pending, submit, retry, verbose, print,
+                                            metrics=client.metrics):
+                if ohlcv is not None:
+                    if journal is not None:
+                        journal.save(symbol, ohlcv)
+                    n_done += 1
+                    yield symbol, ohlcv
+            finished = True
+
+        # run finished (failed symbols included, after all retries): nothing left to resume
+        # interrupted (crash / Ctrl-C / generator closed): kept for a rerun
+        finally:
+            if journal is not None:
+                journal.close(remove=finished)
+                
+    print('Total {} datasets have been downloaded'.format(n_done))
+    
 
-            # initialize outer retry loop
-            ohlcvs = {} # dict to accumulate extracted ohlcv
-            i_outer_loop = 0
         
-            # outer loop to retry download & process 
-            while symbols and (i_outer_loop <= retry):
 
-                # initialize inner loops
-                total = len(symbols)
-                print('Loop {} , total {} to download'.format(i_outer_loop, total) )
-                pool = {} # container for threads
-                t0 = time.perf_counter()
 
-                
-                # inner download loop
-                for i, symbol in enumerate(symbols):
-                    
-                    # speed control
-                    wait = max(0.0, speed*i - (time.perf_counter()-t0) )
-                    time.sleep(wait)
-                    
-                    # request download & extract data
-                    pool[symbol] = executor.submit(_download_day_unit, symbol,
-                                                   start.timestamp(), end.timestamp(),
-                                                   show_actions, show_adjclose, sess, timeout)
-
-                    # show progress bar
-                    if verbose:
-                        _progress_status(i, total, prepend='  Requests Sent: ')
-                    else:
-                        _progress_bar(i, total)
-
-
-                # list to store symbols of failed download
-                failed_symbols = []
-
-                # inner loop to check & store data
-                for symbol, job in pool.items():
-
-                    # try getting downloaded contents
-                    try:
-                        ohlcvs[symbol] = job.result()
-
-                    # if download failed
-                    except Exception:
-                        failed_symbols.append(symbol) # insert symbol if failed
-
-                        
-                # print symbols of failed download
-                if failed_symbols:
-                    print('    Failed :', end=' ')
-                    for symbol in failed_symbols:
-                        print(symbol, end=' ')
-                    print()
-                
-                # speed control before next outer retry loop
-                if i_outer_loop < retry:
-                    i += 1
-                    wait = max(0.0, speed*i - (time.perf_counter()-t0) )
-                    time.sleep(wait)
-
-                # update for next outer iteration
-                i_outer_loop += 1
-                symbols = failed_symbols
-                
-    print('Total {} datasets have been downloaded'.format(len(ohlcvs)))
+def _day_bounds(start, end):
+    '''
+    process start & end of daily download
+
+    start : start date (str) / starting utc timestamp (int) / None (from 1900-01-01)
+    end : end date (str) / ending utc timestamp (int) / None (up to today)
+
+    -> (start, end) [utc pd.Timestamp without tz]
+    '''
+
+    # start time
+    if start is None: 
+        start = pd.Timestamp('1900-01-01')
+    elif isinstance(start, str):
+        start = pd.Timestamp(start)
+    else: # int / float / pd.Timestamp
+        start = pd.Timestamp(start, unit='s')
+
+
+    # end time
+    if end is None: 
+        end = pd.Timestamp.now(tz='utc').tz_convert(None) + pd.Timedelta('1d')
+        end = end.normalize()
+    elif isinstance(end, str):
+        end = pd.Timestamp(end)
+    else: # int / float / pd.Timestamp
+        end = pd.Timestamp(end, unit='s')
+
+    return start, end
 
-    if single_symbol:
-        return ohlcvs[single_symbol]
-    
-    return ohlcvs # dict of df
-    
 
-        
 
 
 
@@ -244,7 +311,7 @@ sess = requests.Session()
 timeout=(3.05,5)
 '''
 
-def _download_day_unit(symbol, start, end, show_actions, show_adjclose, sess, timeout):
+def _download_day_unit(symbol, start, end, show_actions, show_adjclose, sess, timeout, compact=False):
     '''
     download daily data for single symbol in one request
     to get ohlcv [prices (open, high low, close) & volume have already been adjusted for split]
@@ -256,12 +323,22 @@ def _download_day_unit(symbol, start, end, show_actions, show_adjclose, sess, ti
     show_adjclose : show adjusted closing price ?
     sess : requests.Session for persisting download
     timeout : sec to request timeout [specify sec / (sec: connect timeout, sec: response timeout)]
+    compact : compact memory ? (float32 prices, integer volume, sparse events)
 
     -> df of ohlcv [index: utc datetime idx]
     '''
 
-    # request config
-    params = {'interval': '1d',
+    # request download
+    url, params, headers = _day_request(symbol, start, end, show_actions)
+    resp = sess.get(url, params=params, headers=headers, timeout=timeout)
+
+    return _parse_day(_loads(resp.content), show_actions, show_adjclose, compact)
+
+
+
+def _day_request(symbol, start, end, show_actions, interval='1d'):
+    '''request config of daily (or longer, e.g. 1wk) data -> (url, params, headers)'''
+    params = {'interval': interval,
               'period1': int(start),
               'period2': int(end),
               }
@@ -270,59 +347,73 @@ def _download_day_unit(symbol, start, end, show_actions, show_adjclose, sess, ti
     headers = {'user-agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 \
                                 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'}
     url = 'https://query1.finance.yahoo.com/v8/finance/chart/{}'.format(symbol)
+    return url, params, headers
 
-    # request download
-    resp = sess.get(url, params=params, headers=headers, timeout=timeout)
+
+
+def _parse_day(content, show_actions, show_adjclose, compact=False):
+    '''
+    extract daily ohlcv from decoded chart response (shared by sync & async downloads)
+
+    content : decoded json of chart response (dict)
+    show_actions : show stock splits & dividends ?
+    show_adjclose : show adjusted closing price ?
+    compact : compact memory ? (float32 prices, integer volume, sparse events)
+
+    -> df of ohlcv [index: utc datetime idx]
+    '''
 
     # extract data from response as dict
-    data = resp.json()['chart']['result'][0]
-    datetime_idx = pd.to_datetime(data['timestamp'], unit='s').normalize()
+    data = content['chart']['result'][0]
+    datetime_idx = pd.to_datetime(np.array(data['timestamp'], dtype=np.int64), unit='s').normalize()
     datetime_idx.name = 'datetime'
-    ohlcv = data['indicators']['quote'][0] # {'open': [...], 'high': [...], ...}
+    quote = data['indicators']['quote'][0] # {'open': [...], 'high': [...], ...}
+    n = len(datetime_idx)
 
     # variables included
     var_names = ['open', 'high', 'low', 'close', 'volume']
+    columns = [_float_array(quote.get(name), n) for name in var_names]
 
     # process adjclose
     if show_adjclose:
         var_names.append('adjclose')
         
         if 'adjclose' in data['indicators']:
-            ohlcv.update(data['indicators']['adjclose'][0])
+            columns.append(_float_array(data['indicators']['adjclose'][0].get('adjclose'), n))
         else:
-            ohlcv['adjclose'] = ohlcv['close']
+            columns.append(columns[3]) # close
+
+    # drop rows with duplicated index (sometimes occur if last date is today)
+    values = np.column_stack(columns)
+    duplicated = datetime_idx.duplicated()
+    if duplicated.any():
+        datetime_idx = datetime_idx[~duplicated]
+        values = values[~duplicated]
 
     # process dividend & split
     if show_actions:
         var_names.extend(['dividend', 'split'])
+        events = data.get('events', {})
 
         # if dividend available
-        if ('events' in data) and ('dividends' in data['events']):
-            div = data['events']['dividends']
-            div = pd.DataFrame(div.values()).set_index('date')
-            div.index = pd.to_datetime(div.index, unit='s').normalize()
-            ohlcv['dividend'] = div['amount']
+        if 'dividends' in events:
+            dividend = _event_array(events['dividends'], datetime_idx, normalize=True,
+                                    value=lambda event: event['amount'])
         else:
-            ohlcv['dividend'] = np.nan
+            dividend = np.full(len(datetime_idx), np.nan)
 
         # if split available
-        if ('events' in data) and ('splits' in data['events']):
-            split = data['events']['splits']
-            split = pd.DataFrame(split.values()).set_index('date')
-            split.index = pd.to_datetime(split.index, unit='s').normalize()
-            ohlcv['split'] = split['numerator'] / split['denominator']
+        if 'splits' in events:
+            split = _event_array(events['splits'], datetime_idx, normalize=True,
+                                 value=lambda event: event['numerator'] / event['denominator'])
         else:
-            ohlcv['split'] = np.nan
+            split = np.full(len(datetime_idx), np.nan)
 
-    # assemble data into df
-    ohlcv = pd.DataFrame(ohlcv, index=datetime_idx, columns=var_names, dtype=np.float64)
+        values = np.column_stack([values, dividend, split])
 
-    # drop rows with duplicated index (sometimes occur if last date is today)
-    duplicated = ohlcv.index.duplicated()
-    if duplicated.any():
-        ohlcv = duplicated.loc[~duplicated]
-        
-    return ohlcv
+    # assemble data into df
+    ohlcv = pd.DataFrame(values, index=datetime_idx, columns=var_names)
+    return _compact_ohlcv(ohlcv) if compact else ohlcv
 
 
 
@@ -388,6 +479,70 @@ if False:
 
 
 
+def _download_day_cached(symbol, start, end, show_actions, show_adjclose, sess, timeout, cache_dir,
+                         compact=False):
+    '''
+    download daily data for single symbol through local cache
+    (full history is cached, only bars since last cached date are downloaded & merged)
+
+    symbol : stock (ticker) symbol (str)
+    start : starting utc timestamp (int)
+    end : ending utc timestamp (int)
+    show_actions : show stock splits & dividends ?
+    show_adjclose : show adjusted closing price ?
+    sess : requests.Session for persisting download
+    timeout : sec to request timeout [specify sec / (sec: connect timeout, sec: response timeout)]
+    cache_dir : dir of local cache
+    compact : compact memory ? (cache kept in float64, only returned df compacted)
+
+    -> df of ohlcv [index: utc datetime idx]
+    '''
+
+    path = _day_cache_path(cache_dir, symbol, show_actions, show_adjclose)
+    cached = _read_parquet(path)
+    ohlcv = None
+
+    # top up from last cached date (last bar is downloaded again, maybe incomplete before)
+    if (cached is not None) and (not cached.empty):
+        last = cached.index[-1]
+        if last.timestamp() >= end:
+            ohlcv = cached
+        else:
+            # events are always requested to detect new split / dividend
+            new = _download_day_unit(symbol, last.timestamp(), end, True, show_adjclose,
+                                     sess, timeout)
+            # (last cached date included: an event reported on it after it was cached)
+            columns = ['split', 'dividend'] if show_adjclose else ['split']
+            events = new.loc[new.index >= last, columns]
+            known = [column for column in columns if column in cached.columns] # cached with actions
+            if known and (last in events.index): # event on last date already cached: not new
+                events = events.copy()
+                events.loc[last, known] = events.loc[last, known].mask(
+                                              events.loc[last, known] == cached.loc[last, known])
+
+            # old prices (split) or old adjclose (dividend) changed: whole history to be downloaded
+            if events.isna().all(axis=None):
+                ohlcv = pd.concat([cached.loc[cached.index < last], new[cached.columns]], axis=0)
+
+    # whole history
+    if ohlcv is None:
+        ohlcv = _download_day_unit(symbol, pd.Timestamp('1900-01-01').timestamp(), end,
+                                   show_actions, show_adjclose, sess, timeout)
+
+    if ohlcv is not cached:
+        _write_parquet(path, ohlcv)
+    ohlcv.index = ohlcv.index.astype(pd.to_datetime([], unit='s').dtype) # same as downloaded
+
+    # requested date range only
+    ohlcv = ohlcv.loc[(ohlcv.index >= pd.Timestamp(start, unit='s'))
+                      & (ohlcv.index < pd.Timestamp(end, unit='s'))]
+    return _compact_ohlcv(ohlcv) if compact else ohlcv
+
+
+
+
+
+
 ### ------- Other Functions ------- ###
 
 ### recover original ohlc, vol, div from spliting
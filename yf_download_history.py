@@ -0,0 +1,279 @@
+import numpy as np
+import pandas as pd
+import builtins
+
+try:
+    from ._rate_limit import _make_pacer, _wait_for_slot
+    from ._http import _use_client
+    from ._engine import _iter_jobs
+    from ._inputs import _process_symbols, _process_timeout
+    from ._decode import _loads
+    from .yf_download_day import _day_bounds, _day_request, _parse_day
+    from .yf_download_minute import (_earliest_minute, _minute_bounds, _minute_calendars, _trading_windows,
+                                     _concat_windows, _minute_request, _parse_minute)
+    from .yf_panel import _build_panel
+except ImportError:
+    from _rate_limit import _make_pacer, _wait_for_slot
+    from _http import _use_client
+    from _engine import _iter_jobs
+    from _inputs import _process_symbols, _process_timeout
+    from _decode import _loads
+    from yf_download_day import _day_bounds, _day_request, _parse_day
+    from yf_download_minute import (_earliest_minute, _minute_bounds, _minute_calendars, _trading_windows,
+                                    _concat_windows, _minute_request, _parse_minute)
+    from yf_panel import _build_panel
+
+
+
+
+
+#-------------------------Description-------------------------#
+# bars of any interval of the chart api, each interval within its own yf limits
+# (max lookback of data kept & max span per request), in as few requests as possible
+
+if False:
+    import yf_tools as yf
+
+    ohlcvs = yf.download_history(symbols, interval='5m') # last 60 days of 5-minute bars
+    ohlcvs = yf.download_history(symbols, interval='1h', start='2024-01-01', show_prepost=True)
+    ohlcvs = yf.download_history(symbols, interval='1wk', show_actions=True)
+
+    # Inputs
+    # interval : 1m, 2m, 5m, 15m, 30m, 60m, 90m, 1h (intraday) / 1d, 5d, 1wk, 1mo, 3mo
+    # start, end, speed, retry, timeout, verbose, output, client, compact : as download_day / download_minute
+    # show_prepost : show pre & post market data ? (intraday only)
+    # show_actions : show stock splits & dividends ? (intraday: splits only)
+    # show_adjclose : show adjusted closing price ? (daily or longer only)
+
+    # Output
+    # dict of ohlcvs (df) / Panel
+    #   intraday : as download_minute (index in exchange time, not adjusted for split)
+    #   daily or longer : as download_day (index of dates, adjusted for split)
+
+    # interval : (max lookback, max span per request)
+    #   1m : ~30 days (bisected once per day), 7 days
+    #   2m, 5m, 15m, 30m, 90m : 60 days, 60 days
+    #   60m, 1h : 730 days, 730 days
+    #   1d, 5d, 1wk, 1mo, 3mo : no limit, no limit (one request per symbol)
+    # intraday windows packed over trading dates of exchange of each symbol (closed-only windows skipped)
+
+
+    # yield each symbol as soon as all its windows are done (in completion order)
+    for symbol, ohlcv in yf.iter_download_history(symbols, interval='15m'):
+        ohlcv.to_csv(symbol + '.csv')
+
+
+
+
+
+#-------------------------Definition-------------------------#
+# interval -> (max lookback of data kept by yf, max span per request) [None: no limit]
+_INTERVAL_LIMITS = {'1m': ('30D', '7D'),
+                    '2m': ('60D', '60D'),
+                    '5m': ('60D', '60D'),
+                    '15m': ('60D', '60D'),
+                    '30m': ('60D', '60D'),
+                    '60m': ('730D', '730D'),
+                    '90m': ('60D', '60D'),
+                    '1h': ('730D', '730D'),
+                    '1d': (None, None),
+                    '5d': (None, None),
+                    '1wk': (None, None),
+                    '1mo': (None, None),
+                    '3mo': (None, None),
+                    }
+
+
+
+def download_history(symbols, interval='1d', start=None, end=None, show_prepost=False, show_actions=False,
+                     show_adjclose=True, speed=0, retry=0, timeout=(3.05,5), verbose=False, output='dict',
+                     client=None, compact=False):
+    '''
+    download bars of any interval for many symbols
+    (intraday: not adjusted for split as download_minute, daily or longer: adjusted as download_day)
+
+    symbols : list of symbols (list of str)
+    interval : 1m, 2m, 5m, 15m, 30m, 60m, 90m, 1h / 1d, 5d, 1wk, 1mo, 3mo
+    start : start utc date (str) / utc timestamp (int) (None: earliest kept by yf for interval)
+    end : end utc date (str) / utc timestamp (int) (None: now)
+    show_prepost : show pre & post market data ? (intraday only)
+    show_actions : show stock splits & dividends ? (intraday: splits only)
+    show_adjclose : show adjusted closing price ? (daily or longer only)
+    speed : sec per requested download (on top of the shared limit set by set_rate_limit)
+    retry : num of download retry if download fails
+    timeout : sec to request timeout [specify: sec / (sec: connect timeout, sec: response timeout)]
+    verbose : show detailed download info ?
+    output : 'dict' (dict of df) / 'panel' (Panel, aligned 3D array of time x symbol x field)
+    client : YFClient to reuse its connections & worker threads (None: new ones for this call only)
+    compact : compact memory ? (same as download_day / download_minute) (panel: float32)
+
+    -> dict of ohlcvs (df) / Panel
+    '''
+
+    symbols, single_symbol = _process_symbols(symbols)
+
+    # aligned panel, built from arrays as results arrive
+    if output == 'panel':
+        return _build_panel(iter_download_history(symbols, interval, start, end, show_prepost, show_actions,
+                                                  show_adjclose, speed, retry, timeout, verbose, client,
+                                                  compact),
+                            symbols, np.float32 if compact else np.float64)
+
+    # collect all results (same order as symbols)
+    ohlcvs = dict(iter_download_history(symbols, interval, start, end, show_prepost, show_actions,
+                                        show_adjclose, speed, retry, timeout, verbose, client, compact))
+    ohlcvs = {symbol: ohlcvs[symbol] for symbol in symbols if symbol in ohlcvs}
+
+    if single_symbol:
+        return ohlcvs[single_symbol]
+
+    return ohlcvs # dict of df
+
+
+
+def iter_download_history(symbols, interval='1d', start=None, end=None, show_prepost=False,
+                          show_actions=False, show_adjclose=True, speed=0, retry=0, timeout=(3.05,5),
+                          verbose=False, client=None, compact=False):
+    '''
+    download bars of any interval for many symbols,
+    yield each symbol as soon as all its windows are done (in completion order)
+
+    (inputs same as download_history)
+
+    -> generator of (symbol, df of ohlcv)
+    '''
+
+    # process inputs
+    symbols, _ = _process_symbols(symbols)
+    if interval not in _INTERVAL_LIMITS:
+        raise ValueError('interval must be one of {}'.format(', '.join(_INTERVAL_LIMITS)))
+
+    # download config
+    speed = float(max(speed, 0.0)) # [0.0, inf) # [sec per request]
+    retry = int(max(retry, 0)) # [0, inf) # [num of retry]
+    timeout = _process_timeout(timeout)
+
+
+    # print msg config
+    if verbose:
+        print = builtins.print
+    else:
+        def print(*args, **kwargs):
+            pass
+
+
+    # main program
+    url_base = 'https://query1.finance.yahoo.com/v8/finance/chart/'
+    pacer = _make_pacer(speed) # per-call speed control (shared host limit applied as well)
+    with _use_client(client) as client:
+        sess, executor = client.sess, client.executor
+
+        # start & end time, windows of each symbol (within lookback & span limits of interval)
+        start, end, windows = _plan_history(symbols, interval, start, end, sess, timeout)
+
+        print('Download {} bars'.format(interval))
+        print('Download start at : {} (in UTC time)'.format(str(start)))
+        print('Download end at : {} (in UTC time)'.format(str(end)))
+        print('Divided into {} parts'.format(sum(len(w) for w in windows.values())))
+        print('Download speed : {:.3f} sec/request'.format(round(speed, 2)))
+        print()
+
+        def submit(symbol_idx):
+            symbol, j = symbol_idx
+
+            # speed control
+            _wait_for_slot(url_base + symbol, pacer)
+
+            # request download & extract data
+            start_j, end_j = windows[symbol][j]
+            return executor.submit(_download_history_unit, symbol, interval,
+                                   start_j.timestamp(), end_j.timestamp(),
+                                   show_prepost, show_actions, show_adjclose, sess, timeout, compact)
+
+        def format_failed(symbols_idx):
+            failed_print = {}
+            for symbol, j in symbols_idx:
+                failed_print.setdefault(symbol, []).append(str(j))
+            return ' '.join(symbol + '[{}]'.format(','.join(indices))
+                                for symbol, indices in failed_print.items())
+
+        symbols_idx = [(symbol, j)
+                       for symbol in symbols
+                       for j in range(len(windows[symbol]))]
+        chunks = {symbol: {} for symbol in symbols} # {symbol: {window idx: df}}
+        n_pending = {symbol: len(windows[symbol]) for symbol in symbols} # windows not done yet
+        n_done = 0
+
+        # yield each symbol once all its windows are done (failed windows skipped)
+        for (symbol, j), ohlcv in _iter_jobs(executor, symbols_idx, submit, retry,
+                                             verbose, print, format_failed, metrics=client.metrics):
+            if ohlcv is not None:
+                chunks[symbol][j] = ohlcv
+            n_pending[symbol] -= 1
+
+            if n_pending[symbol] == 0:
+                symbol_chunks = chunks.pop(symbol)
+                if symbol_chunks:
+                    n_done += 1
+                    yield symbol, _concat_windows([symbol_chunks[j] for j in sorted(symbol_chunks)])
+
+
+    print('Total {} datasets have been downloaded'.format(n_done))
+
+
+
+def _plan_history(symbols, interval, start, end, sess, timeout):
+    '''
+    plan download of interval: start & end time, windows of each symbol
+
+    (inputs same as iter_download_history, after processing)
+
+    -> (start, end, {symbol: list of (start, end)}) [utc pd.Timestamp without tz]
+    '''
+    lookback, span = _INTERVAL_LIMITS[interval]
+
+    # daily or longer: whole range in one request
+    if lookback is None:
+        start, end = _day_bounds(start, end)
+        return start, end, {symbol: [(start, end)] for symbol in symbols}
+
+    # intraday: start no earlier than data kept by yf (1m: lookback bisected once per day & memoized)
+    if interval == '1m':
+        earliest = _earliest_minute(sess, timeout)
+    else:
+        now = pd.Timestamp.today(tz='utc').tz_convert(None)
+        earliest = (now - pd.Timedelta(lookback) + pd.Timedelta('1h')).ceil('min') # margin for yf's clock
+    from_earliest = start is None
+    start, end = _minute_bounds(start, end, clamp=False)
+    start = earliest if from_earliest else max(start, earliest)
+
+    # windows of at most span, packed over trading dates of exchange of each symbol
+    calendars = _minute_calendars(symbols, sess, timeout)
+    return start, end, {symbol: _trading_windows(start, end, calendars[symbol], span) for symbol in symbols}
+
+
+
+def _download_history_unit(symbol, interval, start, end, show_prepost, show_actions, show_adjclose,
+                           sess, timeout, compact=False):
+    '''
+    download bars of interval for single symbol in one request
+
+    symbol : stock (ticker) symbol (str)
+    interval : bar interval (key of _INTERVAL_LIMITS)
+    start : starting utc timestamp (int)
+    end : ending utc timestamp (int)
+    (others same as download_history)
+
+    -> df of ohlcv [intraday: as _parse_minute, daily or longer: as _parse_day]
+    '''
+
+    # intraday: raw prices (split recovered), index in exchange time
+    if _INTERVAL_LIMITS[interval][0] is not None:
+        url, params, headers = _minute_request(symbol, start, end, show_prepost, interval)
+        resp = sess.get(url, params=params, headers=headers, timeout=timeout)
+        return _parse_minute(_loads(resp.content), show_actions, compact)
+
+    # daily or longer: adjusted for split, index of dates
+    url, params, headers = _day_request(symbol, start, end, show_actions, interval)
+    resp = sess.get(url, params=params, headers=headers, timeout=timeout)
+    return _parse_day(_loads(resp.content), show_actions, show_adjclose, compact)
@@ -4,13 +4,26 @@ import pandas as pd
 import time
 import re
 import json
-from concurrent.futures import ThreadPoolExecutor
+import contextlib
+import multiprocessing
+from requests.utils import requote_uri
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
 import builtins
 
 try:
     from ._progress import _progress_status, _progress_bar
+    from ._rate_limit import _make_pacer, _wait_for_slot
+    from ._http import _use_client
+    from ._engine import _iter_jobs, _then
+    from ._decode import _loads
+    from ._quote_cache import _get_quote_cache
 except ImportError:
     from _progress import _progress_status, _progress_bar
+    from _rate_limit import _make_pacer, _wait_for_slot
+    from _http import _use_client
+    from _engine import _iter_jobs, _then
+    from _decode import _loads
+    from _quote_cache import _get_quote_cache
 
 
 
@@ -25,11 +38,12 @@ if False:
     
     # download instantenous info from API for many symbols (super fast)
     #   from 'https://query1.finance.yahoo.com/v7/finance/quote?symbols=tsm,tsla'
-    info_df = download_info(symbols, max_url_len=8000, speed=0, retry=1, timeout=(3.05,5))
+    info_df = download_info(symbols, max_url_len=8000, max_symbols=1000, speed=0, retry=1, timeout=(3.05,5))
 
     # Inputs
     # url : url of filtered yf screener
     # count : num of symbols per page
+    # max_symbols : max num of symbols per request
     # speed : sec per requested download
     # retry : num of download retry (to maximize downloaded content)
     # timeout : sec to request timeout [specify sec / specify (sec: connect timeout, sec: response timeout)]
@@ -39,28 +53,25 @@ if False:
 
     # Main logic flow:
     # (1) cal remaining url len to append symbols
-    # (2) cal lens required for each symbol (+1 for ',')
-    # (3) Loop to initialize symbol groups for multiple requests
-    #   (3-1) count symbols for each group (-1 to exclude final ',')
-    #   (3-2) assign symbols into a group
-    #   (3-3) update remaining ungrouped symbols
-    # (4) create requests.Session for persisting connection
-    # (5) create ThreadPoolExecutor for multi-thread downloads
-    # (6) initilaize (i) container to accumulate extracted data (ii) outer loop index
-    # (7) Outer loop to retry download & process
-    #   (7-1) Inner loop for multi-thread downloads
-    #     (7-1-1) speed control
-    #     (7-1-2) sumbit download task
-    #   (7-2) initialize new symbol groups of failed download for outer retry loop
-    #   (7-3) Inner loop for processing downloads
-    #     (7-3-1) try getting downloaded contents (0 content considered success)
-    #     (7-3-2) accumulate extracted info data
-    #     (7-3-e1) if download failed: insert symbol group in container (7-2)
-    #   (7-4) speed control before next outer retry loop
-    #   (7-5) update outer loop index
-    #   (7-6) continue outer retry loop only if there remains symbol group in container (7-2)
+    # (2) drop duplicated symbols (same order)
+    # (3) single pass to initialize symbol groups for multiple requests
+    #   (3-1) cal url-encoded len required for symbol (+1 for ',')
+    #   (3-2) close current group if symbol exceeds url len / symbol num limit
+    #   (3-3) assign symbol into current group
+    # (4) use requests.Session of client for persisting connection (temporary client if not given)
+    # (5) use ThreadPoolExecutor of client for multi-thread downloads
+    # (6) submit download task of each symbol group (with speed control)
+    # (7) process downloads in completion order (0 content considered success)
+    #   (7-1) if download failed: re-enqueue both halves of symbol group after a jittered exponential backoff
+    #   (7-2) give up single symbol once its attempts (retry + 1) are used up
+    #   (7-3) accumulate extracted info data (same order as symbol groups)
     # (8) return: df of stock info data
 
+    # shared short-ttl cache (set_quote_cache): calls of any thread within ttl reuse info,
+    # symbols being requested by another call are waited for instead of requested again
+    set_quote_cache(0.5)
+    info_df = download_info(symbols)
+
 
     
     
@@ -73,11 +84,18 @@ if False:
     # speed : sec per requested download
     # retry : num of download retry (to maximize downloaded content)
     # timeout : sec to request timeout [specify: sec / (sec: connect timeout, sec: response timeout)]
+    # processes : num of processes to parse html, as soon as each is downloaded (0: in download threads)
+    #             [worth it for thousands of symbols only: pool spawned per call & each page store pickled]
 
     # Output
     # pd.DataFrame of detailed info data
 
 
+    # yield each symbol as soon as downloaded (in completion order)
+    for symbol, info in iter_download_details(symbols, speed=0.25):
+        print(symbol, info.get('sector'))
+
+
 
 
 
@@ -93,16 +111,19 @@ retry=1
 timeout=(3.05,5)
 '''
 
-def download_info(symbols, max_url_len=8000, speed=0, retry=1, timeout=(3.05,5)):
+def download_info(symbols, max_url_len=8000, max_symbols=1000, speed=0, retry=1, timeout=(3.05,5),
+                  client=None):
     '''
     download instantenous basic info for many symbols (super fast)
     from 'https://query1.finance.yahoo.com/v7/finance/quote?symbols=tsm,tsla'
 
     symbols : list of symbols (list of str)
     max_url_len : url length limit
-    speed : sec per requested download
-    retry : num of download retry if download fails
+    max_symbols : max num of symbols per request
+    speed : sec per requested download (on top of the shared limit set by set_rate_limit)
+    retry : num of download retry if download fails [failed group bisected on each retry, to recover good symbols]
     timeout : sec to request timeout [specify: sec / (sec: connect timeout, sec: response timeout)]
+    client : YFClient to reuse its connections & worker threads (None: new ones for this call only)
 
     -> df of info data
     '''
@@ -111,6 +132,7 @@ def download_info(symbols, max_url_len=8000, speed=0, retry=1, timeout=(3.05,5))
     if isinstance(symbols, str):
         symbols = re.split(r'[\s,|;]+', symbols.strip('\n\t ,|;')) # list of symbols (str)
     max_url_len = int(max(max_url_len, 1)) # [1, inf)
+    max_symbols = int(max(max_symbols, 1)) # [1, inf)
     speed = float(max(speed, 0.0)) # [0.0, inf) # [sec per request]
     retry = int(max(retry, 0)) # [0, inf) # [num of retry]
     timeout = ( tuple( float(max(t, 0.0)) for t in timeout )
@@ -118,97 +140,162 @@ def download_info(symbols, max_url_len=8000, speed=0, retry=1, timeout=(3.05,5))
                    else float(max(timeout, 0.0)) ) # [0.0, inf) # [sec to request timeout]
                
 
-    # initialize
-    url_base = 'https://query1.finance.yahoo.com/v7/finance/quote?symbols='
-    headers = {'user-agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 \
-                                (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'}
-    remain_url_len = max_url_len - len(url_base)
-    
+    # only symbols missing / stale in shared cache requested (if set_quote_cache)
+    # (claimed symbols released whatever happens, so other calls waiting for them never hang)
+    cache = _get_quote_cache()
+    fresh, waiting, claimed = {}, {}, {}
+    try:
+        if cache is not None:
+            fresh, waiting, claimed = cache.claim(list(dict.fromkeys(symbols)))
+            print('  {} info cached, {} being downloaded by other calls'.format(len(fresh), len(waiting)))
+            deadline = time.monotonic() + _timeout_budget(timeout, retry) # wait for other calls till then
+
+        # symbol groups for multiple requests (within url length & symbol num limit, no duplicates)
+        sym_grps = _plan_info_groups(symbols if cache is None else list(claimed), max_url_len, max_symbols)
+
+
+        pacer = _make_pacer(speed) # per-call speed control (shared host limit applied as well)
+        with _use_client(client) as client:
+            sess, executor = client.sess, client.executor
+
+            def submit(sym_grp):
+
+                # speed control
+                url, headers = _info_request(sym_grp)
+                _wait_for_slot(url, pacer)
+
+                # request download
+                print('  Download {} info'.format(len(sym_grp)) )
+                return executor.submit(_download_info_unit, url, headers, sess, timeout)
+
+            def format_failed(sym_grps):
+                return ' '.join('[{}]'.format(','.join(sym_grp[:5]) + (',...' if sym_grp[5:] else ''))
+                                    for sym_grp in sym_grps)
+
+            downloaded = {} # {symbol group: list of dicts}
+
+            def download(sym_grps):
+                # failed groups bisected on retry (each split uses up an attempt: at most retry levels deep,
+                # no request storm while yf throttles / is down)
+                # (0 content considered success)
+                for sym_grp, list_of_dicts in _iter_jobs(executor, sym_grps, submit, retry,
+                                                         True, print, format_failed, split=_bisect,
+                                                         metrics=client.metrics):
+                    if list_of_dicts is not None:
+                        downloaded[sym_grp] = list_of_dicts
+                        print('    {} info downloaded'.format(len(list_of_dicts)))
+                        if cache is not None:
+                            cache.put(sym_grp, list_of_dicts) # other calls waiting get it at once
 
-    # len required for each symbol (include ',')
-    sym_lens = np.array([len(sym) + 1 for sym in symbols]) 
+            download(sym_grps)
 
+            # info downloaded by other calls (still not done by the deadline: requested by this call)
+            if waiting:
+                late = []
+                for sym, future in waiting.items():
+                    try:
+                        future.result(timeout=max(deadline - time.monotonic(), 0.0))
+                    except FutureTimeoutError:
+                        late.append(sym)
+                if late:
+                    print('  {} info not downloaded by other calls in time'.format(len(late)))
+                    download(_plan_info_groups(late, max_url_len, max_symbols))
+    finally:
+        if cache is not None:
+            cache.release(claimed) # failed symbols: not cached, other calls waiting get None
+
+    # accumulate data (same order as symbols, groups are consecutive slices of symbols)
+    if cache is None:
+        position = {sym: i for i, sym in enumerate(dict.fromkeys(symbols))}
+        data = [info for sym_grp in sorted(downloaded, key=lambda sym_grp: position[sym_grp[0]])
+                         for info in downloaded[sym_grp]]
+
+    # merge downloaded, cached & info downloaded by other calls (same order as symbols)
+    else:
+        infos = {info['symbol'].upper(): info for list_of_dicts in downloaded.values()
+                                                  for info in list_of_dicts}
+        infos.update((sym.upper(), info) for sym, info in fresh.items() if info is not None)
+        infos.update((sym.upper(), future.result()) for sym, future in waiting.items()
+                         if future.done() and (sym.upper() not in infos))
+        data = [infos[key] for key in dict.fromkeys(sym.upper() for sym in symbols)
+                    if infos.get(key) is not None]
 
-    # loop to prepare symbol groups for multiple requests
-    sym_grps = []
-    while symbols:
-        
-        # count symbols for each group (-1 to exclude ',')
-        count = ( (sym_lens.cumsum() - 1) <= remain_url_len).sum() 
-        count = max(count, 1) # at least one
 
-        # assign symbols into group
-        sym_grps.append( tuple(symbols[:count]) )
+    # count total downloaded info
+    print('Total {} info have been downloaded'.format(len(data)))
+            
+    return pd.DataFrame(data).set_index('symbol')
+            
 
-        # update remaining ungrouped symbols
-        symbols = symbols[count:]
-        sym_lens = sym_lens[count:]
 
 
-    with requests.Session() as sess:
-        with ThreadPoolExecutor() as executor:
+def _plan_info_groups(symbols, max_url_len, max_symbols=None):
+    '''
+    split symbols into groups in one pass (duplicates dropped, same order),
+    each requested in one url within max_url_len & with at most max_symbols
 
-            # initialize outer retry loop
-            data = [] # list to accumulate extracted data
-            i_outer_loop = 0
+    symbols : list of symbols (list of str)
+    max_url_len : url length limit (symbols counted as url-encoded, e.g. '^' -> '%5E')
+    max_symbols : max num of symbols per request (None: no limit)
 
-            # outer loop to retry download & process
-            while sym_grps and (i_outer_loop <= retry):
+    -> list of tuples of symbols
+    '''
+    url_base, _ = _info_request(())
+    remain_url_len = max_url_len - len(url_base)
+    max_symbols = max_symbols or float('inf')
 
-                # initialize inner loops
-                print('Loop {} , total {} info to download'.format(i_outer_loop,
-                                            sum(len(sym_grp) for sym_grp in sym_grps) ) )
-                pool = {} # container for threads
-                t0 = time.perf_counter()
-                
-                # inner download loop
-                for i_wait, sym_grp in enumerate(sym_grps):
+    sym_grps = []
+    sym_grp, grp_len = [], -1 # -1 to exclude 1st ','
+    for sym in dict.fromkeys(symbols):
 
-                    # speed control
-                    wait = max(0.0, speed*i_wait - (time.perf_counter()-t0) )
-                    time.sleep(wait)
+        # len required for symbol (include ',')
+        sym_len = len(requote_uri(sym)) + 1
 
-                    # request download
-                    url = url_base + ','.join(sym_grp)
-                    pool[sym_grp] = executor.submit(sess.get, url, headers=headers)
-                    print('  Download {} info'.format(len(sym_grp)) )
+        # close current group if symbol not fitting (at least one symbol in each group)
+        if sym_grp and ((grp_len + sym_len > remain_url_len) or (len(sym_grp) >= max_symbols)):
+            sym_grps.append(tuple(sym_grp))
+            sym_grp, grp_len = [], -1
 
+        # assign symbol into group
+        sym_grp.append(sym)
+        grp_len += sym_len
 
-                # list to store symbol groups of failed download
-                failed_sym_grps = []
+    if sym_grp:
+        sym_grps.append(tuple(sym_grp))
 
-                # inner loop to process downloaded contents
-                for sym_grp, job in pool.items():
+    return sym_grps
 
-                    # try getting downloaded contents (0 content considered success)
-                    try:
-                        list_of_dicts = job.result().json()['quoteResponse']['result']
-                        data.extend( list_of_dicts ) # accumulate data
-                        print('    {} info downloaded'.format(len(list_of_dicts)))
 
-                    # if download failed
-                    except Exception:
-                        failed_sym_grps.append(sym_grp) # insert symbol group if failed
-                        print('    [Err] No info data for [{}] !!!'.format(
-                                    ','.join(sym_grp[:5]) + (',...' if sym_grp[5:] else '') ) )
 
+def _timeout_budget(timeout, retry):
+    '''sec a download_info call may take at most (every attempt timed out, longest backoff of _iter_jobs)'''
+    per_request = sum(timeout) if isinstance(timeout, tuple) else timeout
+    return (retry + 1) * per_request + sum(min(30.0, 0.5 * 2 ** attempt) for attempt in range(retry))
 
-                # speed control before next outer retry loop
-                if i_outer_loop < retry:
-                    i_wait += 1
-                    wait = max(0.0, speed*i_wait - (time.perf_counter()-t0) )
-                    time.sleep(wait)
 
-                # update for next outer iteration
-                i_outer_loop += 1
-                sym_grps = failed_sym_grps
 
+def _bisect(sym_grp):
+    '''failed symbol group -> its 2 halves (None if single symbol)'''
+    if len(sym_grp) < 2:
+        return None
+    half = len(sym_grp) // 2
+    return [sym_grp[:half], sym_grp[half:]]
 
-    # count total downloaded info
-    print('Total {} info have been downloaded'.format(len(data)))
-            
-    return pd.DataFrame(data).set_index('symbol')
-            
+
+
+def _info_request(sym_grp):
+    '''request config of info of a symbol group -> (url, headers)'''
+    headers = {'user-agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 \
+                                (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'}
+    url = 'https://query1.finance.yahoo.com/v7/finance/quote?symbols=' + ','.join(sym_grp)
+    return url, headers
+
+
+
+def _download_info_unit(url, headers, sess, timeout):
+    '''download info of a symbol group in one request -> list of dicts of info'''
+    resp = sess.get(url, headers=headers, timeout=timeout)
+    return resp.json()['quoteResponse']['result']
 
 
 
@@ -221,19 +308,44 @@ retry = 1
 timeout=(3.05,5)
 '''
 
-def download_details(symbols, speed=0.25, retry=0, timeout=(3.05,5), verbose=False):
+def download_details(symbols, speed=0.25, retry=0, timeout=(3.05,5), verbose=False, client=None,
+                     processes=0):
     '''
     download detailed info for many symbols (quite slow)
     from 'https://finance.yahoo.com/quote/tsm'
 
     symbols : list of symbols (list of str)
-    speed : sec per requested download
+    speed : sec per requested download (on top of the shared limit set by set_rate_limit)
     retry : num of download retry (to maximize downloaded content)
     timeout : sec to request timeout [specify: sec / (sec: connect timeout, sec: response timeout)]
+    client : YFClient to reuse its connections & worker threads (None: new ones for this call only)
+    processes : num of processes to parse html (0: parsed in download threads, None: num of cpus)
+                [opt-in for large downloads: processes spawned per call]
     
     -> df of detailed info data
     '''
 
+    # collect all results (same order as symbols)
+    if isinstance(symbols, str): 
+        symbols = re.split(r'[\s,|;]+', symbols.strip('\n\t ,|;'))
+    data = dict(iter_download_details(symbols, speed, retry, timeout, verbose, client, processes))
+    data = [data[symbol] for symbol in symbols if symbol in data]
+    
+    return pd.DataFrame(data).set_index('symbol')
+
+
+
+def iter_download_details(symbols, speed=0.25, retry=0, timeout=(3.05,5), verbose=False,
+                          client=None, processes=0):
+    '''
+    download detailed info for many symbols (quite slow),
+    yield each symbol as soon as its download is done (in completion order)
+
+    (inputs same as download_details)
+
+    -> generator of (symbol, dict of detailed info)
+    '''
+
     # process inputs
     if isinstance(symbols, str): 
         symbols = re.split(r'[\s,|;]+', symbols.strip('\n\t ,|;'))
@@ -254,106 +366,82 @@ def download_details(symbols, speed=0.25, retry=0, timeout=(3.05,5), verbose=Fal
 
     # initialize
     url_base = 'https://finance.yahoo.com/quote/'
-    headers = {'user-agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 \
-                                (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'}
     print('Start Download Detailed Info')
     print('Download speed : {} sec/download'.format(round(speed, 2)))
     print()
 
-    
-    with requests.Session() as sess:
-        with ThreadPoolExecutor() as executor:
-
-            # initialize outer retry loop
-            data = [] # list to accumulate extracted data
-            i_outer_loop = 0
-
-
-            # outer loop to retry download & process
-            while symbols and (i_outer_loop <= retry):
-
-                # initialize inner loops
-                total = len(symbols)
-                print('Loop {} , total {} detailed info to download'.format(i_outer_loop, total) )
-                pool = {} # container for threads
-                t0 = time.perf_counter()
+    pacer = _make_pacer(speed) # per-call speed control (shared host limit applied as well)
+    # parse pool of spawned processes (not forked: download threads of client may be running)
+    parse_pool = (ProcessPoolExecutor(processes, mp_context=multiprocessing.get_context('spawn'))
+                      if processes != 0 else contextlib.nullcontext())
+    with _use_client(client) as client, parse_pool as parse_pool:
+        sess, executor = client.sess, client.executor
 
+        def submit(symbol):
+            # speed control
+            _wait_for_slot(url_base + symbol, pacer)
 
-                # inner download loop
-                for i, symbol in enumerate(symbols):
+            # request download html in a thread, then parse it in a process as soon as downloaded
+            job = executor.submit(_download_details_unit, symbol, sess, timeout)
+            return _then(job, parse_pool or executor, _parse_details)
 
-                    # speed control
-                    wait = max(0.0, speed*i - (time.perf_counter()-t0) )
-                    time.sleep(wait)
+        # yield scraped info (failed symbols skipped)
+        n_done = 0
+        for symbol, info in _iter_jobs(executor, symbols, submit, retry, verbose, print,
+                                        metrics=client.metrics):
+            if info is not None:
+                n_done += 1
+                yield symbol, info
 
-                    # request download html
-                    url = url_base + symbol
-                    pool[symbol] = executor.submit(sess.get, url, headers=headers)
 
-                    # show progress status
-                    if verbose:
-                        _progress_status(i, total, prepend='  Requests Sent: ')
-                    else:
-                        _progress_bar(i, total)
-
-                    
-                # list to store symbols of failed download
-                failed_symbols = []
+    # count total downloaded info
+    print('Total {} detailed info have been downloaded'.format(n_done))
 
-                
-                # inner loop to scrap downloaded htmls
-                for symbol, job in pool.items():
 
-                    # try getting downloaded contents (0 content considered success)
-                    try:
-                        html = job.result().text
-                        data.append(_process_details(html))
-
-                    # if download failed
-                    except Exception:
-                        failed_symbols.append(symbol) # insert symbol if failed
 
+def _download_details_unit(symbol, sess, timeout):
+    '''download html of symbol & cut out its data store (json str) [light, in download thread]'''
+    headers = {'user-agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 \
+                                (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'}
+    url = 'https://finance.yahoo.com/quote/' + symbol
+    html = sess.get(url, headers=headers, timeout=timeout).text
+    return _details_store(html)
 
-                # print symbols of failed download
-                if failed_symbols:
-                    print('    Failed :', end=' ')
-                    for symbol in failed_symbols:
-                        print(symbol, end=' ')
-                    print()
 
-                # speed control before next outer retry loop
-                if i_outer_loop < retry:
-                    i += 1
-                    wait = max(0.0, speed*i - (time.perf_counter()-t0) )
-                    time.sleep(wait)
 
-                # update for next outer iteration
-                i_outer_loop += 1
-                symbols = failed_symbols
+def _details_store(html):
+    '''cut json of 'root.App.main = {...};' out of html (str), without splitting whole html'''
+    start = html.index('root.App.main =') + len('root.App.main =')
+    end = html.find('(this)', start)
+    end = len(html) if end < 0 else end
+    semicolon = html.find(';\n}', start, end)
+    end = end if semicolon < 0 else semicolon
+    return html[start:end].strip()
 
 
-    # count total downloaded info
-    print('Total {} detailed info have been downloaded'.format(len(data)))
-    
-    return pd.DataFrame(data).set_index('symbol')
 
-                        
-def _process_details(html):
-    '''helper function to transform html (str) into a dict'''
-    data = html.split('root.App.main =')[1].split('(this)')[0].split(';\n}')[0].strip()
-    data = json.loads(data)['context']['dispatcher']['stores']['QuoteSummaryStore']
-    data = json.dumps(data).replace('{}', 'null')
-    data = re.sub(r'\{[\'|\"]raw[\'|\"]:(.*?),(.*?)\}', r'\1', data)
-    data = json.loads(data)
+def _parse_details(store):
+    '''
+    json of data store (str) -> dict of detailed info [heavy, in process pool]
+    decoded once, then walked once: 2nd-level scalars picked, {'raw': x, 'fmt': ..} -> x
+    '''
+    data = _loads(store)['context']['dispatcher']['stores']['QuoteSummaryStore']
 
     data_dict = {}
     for item in data.values():
         if isinstance(item, dict): 
             for k, v in item.items():
+                if isinstance(v, dict) and ('raw' in v):
+                    v = v['raw']
                 if (not isinstance(v, (dict,list))) and (v is not None):
                     data_dict[k] = v
     return data_dict
 
+                        
+def _process_details(html):
+    '''helper function to transform html (str) into a dict'''
+    return _parse_details(_details_store(html))
+
 
 
 
@@ -4,13 +4,37 @@ import pandas as pd
 import time
 import re
 import os
-from concurrent.futures import ThreadPoolExecutor
 import builtins
+import threading
 
 try:
     from ._progress import _progress_status, _progress_bar
+    from ._rate_limit import _make_pacer, _wait_for_slot
+    from ._http import _use_client
+    from ._cache import (_check_parquet, _minute_archive_dir, _read_archive_tz, _write_archive_tz,
+                         _archived_dates, _read_minute_archive, _write_minute_archive,
+                         _read_minute_lookback, _write_minute_lookback)
+    from ._engine import _iter_jobs
+    from ._inputs import _process_symbols, _process_timeout
+    from ._decode import _loads, _float_array, _event_array
+    from ._compact import _compact_ohlcv
+    from ._checkpoint import _Journal
+    from ._calendar import _calendar_symbol, _trading_calendar
+    from .yf_panel import _build_panel
 except ImportError:
     from _progress import _progress_status, _progress_bar
+    from _rate_limit import _make_pacer, _wait_for_slot
+    from _http import _use_client
+    from _cache import (_check_parquet, _minute_archive_dir, _read_archive_tz, _write_archive_tz,
+                        _archived_dates, _read_minute_archive, _write_minute_archive,
+                        _read_minute_lookback, _write_minute_lookback)
+    from _engine import _iter_jobs
+    from _inputs import _process_symbols, _process_timeout
+    from _decode import _loads, _float_array, _event_array
+    from _compact import _compact_ohlcv
+    from _checkpoint import _Journal
+    from _calendar import _calendar_symbol, _trading_calendar
+    from yf_panel import _build_panel
 
 
 
@@ -45,12 +69,35 @@ if False:
                              retry=1,
                              timeout=(3.05,5),
                              verbose=True,
+                             archive_dir=None, # e.g. 'yf_archive' to keep minute data on disk
                              )
 
+    # archive_dir : dir of local minute archive (one file per symbol & trading date)
+    #   only trading dates not archived yet are downloaded (in as few 7-day windows as possible),
+    #   so data older than yf's 30-day limit can still be read back from the archive
+
+    # checkpoint_dir : dir of checkpoint journal (finished windows & their data kept on disk)
+    #   after a crash / Ctrl-C, rerun with the same arguments to download only the windows left
+    ohlcvs = download_minute(symbols, speed=1.0, checkpoint_dir='yf_checkpoint')
+
 
     # combine into a single df
     ohlcvs_df = pd.concat(ohlcvs, axis=1)
 
+    # or get aligned panel directly (time x symbol x field), e.g. all closes
+    panel = download_minute(symbols, output='panel')
+    closes = panel['close']
+
+    # compact memory: float32 prices, integer volume, sparse split, index in UTC
+    # (exchange timezone in ohlcv.attrs['tz'], localized only when needed)
+    ohlcvs = download_minute(symbols, compact=True)
+    tsm = localize(ohlcvs['TSM']) # index in exchange time
+
+
+    # yield each symbol as soon as downloaded (in completion order, same inputs as above)
+    for symbol, ohlcv in iter_download_minute(symbols, show_prepost=True, speed=0.1):
+        ohlcv.to_csv(symbol + '.csv')
+
 
 
 
@@ -68,7 +115,8 @@ timeout=(3.05,5)
 '''
 
 def download_minute(symbols, start=None, end=None, show_prepost=False, show_split=False,
-                    speed=0, retry=0, timeout=(3.05,5), verbose=False):
+                    speed=0, retry=0, timeout=(3.05,5), verbose=False, archive_dir=None,
+                    output='dict', client=None, compact=False, checkpoint_dir=None):
 
     '''
     download minute data for many symbols (data is raw, not adjusted for split)
@@ -78,69 +126,68 @@ def download_minute(symbols, start=None, end=None, show_prepost=False, show_spli
     end : end date (str) / ending utc timestamp (int)
     show_prepost : show pre & post market data ?
     show_split : show stock splits ?
-    speed : sec per requested download
+    speed : sec per requested download (on top of the shared limit set by set_rate_limit)
     retry : num of download retry if download fails
     timeout : sec to request timeout [specify: sec / (sec: connect timeout, sec: response timeout)]
-
-    -> dict of ohlcvs (df)
+    archive_dir : dir of local minute archive (None: no archive) [only missing dates downloaded]
+    output : 'dict' (dict of df) / 'panel' (Panel, aligned 3D array of time x symbol x field, in UTC)
+    client : YFClient to reuse its connections & worker threads (None: new ones for this call only)
+    compact : compact memory ? [float32 prices, integer volume (0 if missing), sparse split,
+              index in UTC (exchange timezone in df.attrs['tz'], see localize)] (panel: float32)
+    checkpoint_dir : dir of checkpoint journal (None: no checkpoint) [rerun with same arguments after
+                     a crash resumes the windows left, checkpoint removed once the run finishes]
+
+    -> dict of ohlcvs (df) / Panel
     '''
+
+    symbols, single_symbol = _process_symbols(symbols)
+
+    # aligned panel, built from arrays as results arrive
+    if output == 'panel':
+        return _build_panel(iter_download_minute(symbols, start, end, show_prepost, show_split,
+                                                 speed, retry, timeout, verbose, archive_dir, client, compact,
+                                                 checkpoint_dir),
+                            symbols, np.float32 if compact else np.float64)
+
+    # collect all results (same order as symbols)
+    ohlcvs = dict(iter_download_minute(symbols, start, end, show_prepost, show_split,
+                                       speed, retry, timeout, verbose, archive_dir, client, compact,
+                                       checkpoint_dir))
+    ohlcvs = {symbol: ohlcvs[symbol] for symbol in symbols if symbol in ohlcvs}
+                
+    if single_symbol:
+        return ohlcvs[single_symbol]
     
-    with requests.Session() as sess:
-        
-        # process inputs
-        
-        # symbol list
-        single_symbol = None
-        if isinstance(symbols, str):
-            symbols = re.split(r'[\s,|;]+', symbols.strip('\n\t ,|;'))
-            if len(symbols) == 1:
-                single_symbol = symbols[0]
-        symbols = [symbol.upper() for symbol in symbols]
-
-
-        # start time
-        now = pd.Timestamp.today(tz='utc').tz_convert(None)
-        lower_bound = now.normalize() - pd.Timedelta('32d')
-        
-        if start is None:
-            start = lower_bound
-        elif isinstance(start, str):
-            start = pd.Timestamp(start)
-        else: # int / float / pd.Timestamp
-            start = pd.Timestamp(start, unit='s')
-        start = max(start, lower_bound)
+    return ohlcvs # dict of df
 
-        # search for valid start time
-        keep_going = True 
-        while keep_going:
-            try:
-                _download_minute_unit(symbol='^GSPC',
-                                      start=start.timestamp(),
-                                      end=(start + pd.offsets.BDay()).timestamp(),
-                                      show_prepost=False,
-                                      show_split=False,
-                                      sess=sess,
-                                      timeout=timeout)
-                keep_going = False
-            except Exception:
-                start = start + pd.offsets.BDay()
 
 
-        # end time
-        if end is None:
-            end = now # current time
-        elif isinstance(end, str):
-            end = pd.Timestamp(end)
-        else: # int / float / pd.Timestamp
-            end = pd.Timestamp(end, unit='s')
-            
+def iter_download_minute(symbols, start=None, end=None, show_prepost=False, show_split=False,
+                         speed=0, retry=0, timeout=(3.05,5), verbose=False, archive_dir=None,
+                         client=None, compact=False, checkpoint_dir=None):
+    '''
+    download minute data for many symbols (data is raw, not adjusted for split),
+    yield each symbol as soon as all its windows are done (in completion order)
+
+    (inputs same as download_minute)
+
+    -> generator of (symbol, df of ohlcv)
+    '''
+
+    url_base = 'https://query1.finance.yahoo.com/v8/finance/chart/'
+    
+    with _use_client(client) as client:
+        sess, executor = client.sess, client.executor
         
+        # process inputs
+        symbols, _ = _process_symbols(symbols)
+
         # download config
         speed = float(max(speed, 0.0)) # [0.0, inf) # [sec per request]
         retry = int(max(retry, 0)) # [0, inf) # [num of retry]
-        timeout = ( tuple( float(max(t, 0.0)) for t in timeout )
-                       if isinstance(timeout, tuple)
-                       else float(max(timeout, 0.0)) ) # [0.0, inf) # [sec to request timeout]
+        timeout = _process_timeout(timeout)
+        if archive_dir is not None:
+            _check_parquet()
 
 
         # print msg config
@@ -150,109 +197,466 @@ def download_minute(symbols, start=None, end=None, show_prepost=False, show_spli
             def print(*args, **kwargs):
                 pass
 
+        pacer = _make_pacer(speed) # per-call speed control (shared host limit applied as well)
+
+
+        # start & end time, windows of each symbol (planned once per checkpoint, same plan on resume)
+        journal = None
+        if checkpoint_dir is None:
+            read_start, start, end, windows = _plan_minute(symbols, start, end, show_prepost,
+                                                           sess, timeout, archive_dir)
+        else:
+            journal = _Journal(checkpoint_dir, 'minute', [symbols, start, end, show_prepost, show_split,
+                                                          archive_dir, compact],
+                               relative=(start is None) or (end is None))
+            read_start, start, end, windows = journal.plan(
+                lambda: _plan_minute(symbols, start, end, show_prepost, sess, timeout, archive_dir))
 
-        # segregate (start, end)
-        starts = list(pd.date_range(start, end, freq='7d', closed='left'))
-        ends = starts[1:]
-        ends.append(end)
-        
         print('Download start at : {} (in UTC time)'.format(str(start)))
         print('Download end at : {} (in UTC time)'.format(str(end)))
-        print('Divided into {} parts:'.format(len(starts)))
-        for j, (start, end) in enumerate(zip(starts, ends)):
-            print('  {} : {} ~ {}'.format(j, str(start)[:10], str(end)[:10]))
+        if symbols:
+            print('Divided into {} parts (trading dates only{}), e.g. {}:'.format(
+                      sum(len(w) for w in windows.values()),
+                      ', archived dates skipped' if archive_dir is not None else '', symbols[0]))
+            for j, (start_j, end_j) in enumerate(windows[symbols[0]]):
+                print('  {} : {} ~ {}'.format(j, str(start_j)[:16], str(end_j)[:16]))
         print('Download speed : {:.3f} sec/request'.format(round(speed, 2)))
         print()
 
 
+        def merge(symbol, chunks):
+            '''dict of {window idx: df} -> df of symbol (merged with archive) / None if no data'''
+            if archive_dir is not None:
+                ohlcv = _archive_minute(_minute_archive_dir(archive_dir, symbol, show_prepost),
+                                        windows[symbol], chunks, read_start, end, show_split)
+                return _compact_ohlcv(ohlcv) if compact and (ohlcv is not None) else ohlcv
+            if chunks:
+                return _concat_windows([chunks[j] for j in sorted(chunks)])
+            return None
+
+
         # main program
-        with ThreadPoolExecutor() as executor:
+        def submit(symbol_idx):
+            symbol, j = symbol_idx
+
+            # speed control
+            _wait_for_slot(url_base + symbol, pacer)
+
+            # request download & extract data
+            start_j, end_j = windows[symbol][j]
+            return executor.submit(_download_minute_unit, symbol,
+                                   start_j.timestamp(), end_j.timestamp(),
+                                   show_prepost, show_split or (archive_dir is not None),
+                                   sess, timeout, compact and (archive_dir is None))
+
+        def format_failed(symbols_idx):
+            failed_print = {}
+            for symbol, j in symbols_idx:
+                failed_print.setdefault(symbol, []).append(str(j))
+            return ' '.join(symbol + '[{}]'.format(','.join(indices))
+                                for symbol, indices in failed_print.items())
+
+        chunks = {symbol: {} for symbol in symbols} # {symbol: {window idx: df}}
+
+        finished = False
+        try:
+            # windows done by previous runs of checkpoint (data read back from disk)
+            if journal is not None:
+                for symbol, j in journal.done:
+                    chunks[symbol][j] = journal.load([symbol, j])
+                print('Checkpoint: {} parts done before'.format(sum(len(c) for c in chunks.values())))
 
-            # initialize outer retry loop
             symbols_idx = [(symbol, j)
                            for symbol in symbols
-                           for j in range(len(starts))]
-            ohlcvs = {} # dict of list to accumulate extracted ohlcv
-            i_outer_loop = 0
+                           for j in range(len(windows[symbol]))
+                           if j not in chunks[symbol]]
+            n_pending = {symbol: len(windows[symbol]) - len(chunks[symbol])
+                             for symbol in symbols} # windows not done yet
+            n_done = 0
+
+            # symbols fully archived / done before (nothing to download)
+            for symbol in symbols:
+                if n_pending[symbol] == 0:
+                    ohlcv = merge(symbol, chunks.pop(symbol))
+                    if ohlcv is not None:
+                        n_done += 1
+                        yield symbol, ohlcv
+
+            # yield each symbol once all its windows are done (failed windows skipped)
+            for (symbol, j), ohlcv in _iter_jobs(executor, symbols_idx, submit, retry,
+                                                 verbose, print, format_failed, metrics=client.metrics):
+                if ohlcv is not None:
+                    chunks[symbol][j] = ohlcv
+                    if journal is not None:
+                        journal.save([symbol, j], ohlcv)
+                n_pending[symbol] -= 1
+
+                if n_pending[symbol] == 0:
+                    ohlcv = merge(symbol, chunks.pop(symbol))
+                    if ohlcv is not None:
+                        n_done += 1
+                        yield symbol, ohlcv
+            finished = True
+
+        # run finished (failed windows included, after all retries): nothing left to resume
+        # interrupted (crash / Ctrl-C / generator closed): kept for a rerun
+        finally:
+            if journal is not None:
+                journal.close(remove=finished)
             
 
-            # outer loop to retry download & process 
-            while symbols_idx and (i_outer_loop <= retry):
-
-                # initialize inner loops
-                total = len(symbols_idx)
-                print('Loop {} , total {} to download'.format(i_outer_loop, total) )
-                pool = {} # container for threads
-                t0 = time.perf_counter()
-
-
-                # inner download loop
-                for i, (symbol, j) in enumerate(symbols_idx):
-                    
-                    # speed control
-                    wait = max(0.0, speed*i - (time.perf_counter()-t0) )
-                    time.sleep(wait)
-                    
-                    # request download & extract data
-                    pool[(symbol, j)] = executor.submit(_download_minute_unit, symbol,
-                                               starts[j].timestamp(), ends[j].timestamp(),
-                                               show_prepost, show_split, sess, timeout)
-
-                    # show progress bar
-                    if verbose:
-                        _progress_status(i, total, prepend='  Requests Sent: ')
-                    else:
-                        _progress_bar(i, total)
-
-
-                # list to store symbols of failed download
-                failed_symbols_idx = []
-                failed_print = {}
+    print('Total {} datasets have been downloaded'.format(n_done))
                 
 
-                # inner loop to check & store data
-                for (symbol, j), job in pool.items():
-
-                    # try getting downloaded contents
-                    try:
-                        ohlcv = job.result()
-                        ohlcvs.setdefault(symbol, []).append(ohlcv)
-
-                    # if download failed
-                    except Exception:
-                        failed_symbols_idx.append((symbol, j)) # insert (symbol,idx) if failed
-                        failed_print.setdefault(symbol, []).append(str(j))
-
-
-                # print symbols with indices of failed download
-                if failed_print:
-                    print('    Failed :', end=' ')
-                    for symbol, indices in failed_print.items():
-                        print(symbol+'[{}]'.format(','.join(indices)), end=' ')
-                    print()
-
-                # speed control before next outer retry loop
-                if i_outer_loop < retry:
-                    i += 1
-                    wait = max(0.0, speed*i - (time.perf_counter()-t0) )
-                    time.sleep(wait)
-                    
-                # update for next outer iteration
-                i_outer_loop += 1
-                symbols_idx = failed_symbols_idx
-                
 
-    # concatenate list of dfs
-    ohlcvs = {symbol: pd.concat(ohlcv_list, axis=0).sort_index()
-                  for symbol, ohlcv_list
-                  in ohlcvs.items()}
-    print('Total {} datasets have been downloaded'.format(len(ohlcvs)))
-                
-    if single_symbol:
-        return ohlcvs[single_symbol]
+
+
+def _plan_minute(symbols, start, end, show_prepost, sess, timeout, archive_dir):
+    '''
+    plan minute download: start & end time, windows of each symbol
+
+    (inputs same as iter_download_minute, after processing)
+
+    -> (read_start, start, end, {symbol: list of (start, end)}) [utc pd.Timestamp without tz]
+    '''
+
+    # start & end time
+    read_start, _ = _minute_bounds(start, end, clamp=False) # archive can go beyond yf limit
+    start, end = _minute_bounds(start, end)
+
+    # earliest start time with minute data on yf (lookback found once per day & memoized)
+    start = max(start, _earliest_minute(sess, timeout, archive_dir))
+
+    # windows to download for each symbol: trading dates of its exchange only
+    # (& only dates not archived yet if archive used)
+    calendars = _minute_calendars(symbols, sess, timeout)
+    if archive_dir is None:
+        windows = {symbol: _trading_windows(start, end, calendars[symbol]) for symbol in symbols}
+    else:
+        windows = {symbol: _plan_archive_windows(_minute_archive_dir(archive_dir, symbol, show_prepost),
+                                                 start, end, calendars[symbol])
+                       for symbol in symbols}
+
+    return read_start, start, end, windows
+
+
+
+def _minute_calendars(symbols, sess=None, timeout=(3.05,5)):
+    '''
+    trading calendar of exchange of each symbol (one fetch per exchange per day)
+
+    -> {symbol: _TradingCalendar / None (no calendar: every date treated as open)}
+    '''
+    calendar_symbols = {symbol: _calendar_symbol(symbol) for symbol in symbols}
+    calendars = {calendar_symbol: _trading_calendar(calendar_symbol, sess, timeout)
+                     for calendar_symbol in set(calendar_symbols.values()) if calendar_symbol is not None}
+    return {symbol: calendars.get(calendar_symbol) for symbol, calendar_symbol in calendar_symbols.items()}
+
+
+
+def _minute_bounds(start, end, clamp=True):
+    '''
+    process start & end of minute download (yf keeps about 30 days of minute data)
+
+    start : start date (str) / starting utc timestamp (int) / None
+    end : end date (str) / ending utc timestamp (int) / None
+    clamp : start no earlier than the minute data kept by yf ?
+
+    -> (start, end) [utc pd.Timestamp without tz]
+    '''
+
+    # start time
+    now = pd.Timestamp.today(tz='utc').tz_convert(None)
+    lower_bound = now.normalize() - pd.Timedelta('32d')
     
-    return ohlcvs # dict of df
-                
+    if start is None:
+        start = lower_bound
+    elif isinstance(start, str):
+        start = pd.Timestamp(start)
+    else: # int / float / pd.Timestamp
+        start = pd.Timestamp(start, unit='s')
+    if clamp:
+        start = max(start, lower_bound)
+
+    # end time
+    if end is None:
+        end = now # current time
+    elif isinstance(end, str):
+        end = pd.Timestamp(end)
+    else: # int / float / pd.Timestamp
+        end = pd.Timestamp(end, unit='s')
+
+    return start, end
+
+
+
+_lookback_memo = {} # {utc date 'YYYY-MM-DD': sec of minute data kept by yf}
+_lookback_lock = threading.Lock()
+
+# error of yf if start too old, e.g. '... The requested range must be within the last 30 days.'
+_TOO_OLD = re.compile(r'within the last \d+ days|only available for (the )?last \d+ days')
+
+
+
+def _earliest_minute(sess=None, timeout=(3.05,5), archive_dir=None):
+    '''
+    earliest start time with minute data available on yf (yf keeps a rolling ~30 days)
+    lookback bisected once per day, memoized in-process (and in archive_dir if given)
+
+    sess : requests.Session for persisting download (None: new session)
+    timeout : sec to request timeout [specify sec / (sec: connect timeout, sec: response timeout)]
+    archive_dir : dir of local minute archive (None: in-process memo only)
+
+    -> utc pd.Timestamp without tz
+    '''
+    now = pd.Timestamp.today(tz='utc').tz_convert(None)
+    today = now.strftime('%Y-%m-%d')
+
+    # one bisection at a time (concurrent callers wait for its result)
+    with _lookback_lock:
+        lookback = _lookback_memo.get(today)
+        if (lookback is None) and (archive_dir is not None):
+            lookback = _read_minute_lookback(archive_dir, today)
+
+        if lookback is None:
+            try:
+                if sess is None:
+                    with requests.Session() as sess:
+                        lookback = _bisect_lookback(now, sess, timeout)
+                else:
+                    lookback = _bisect_lookback(now, sess, timeout)
+            except Exception:
+                # yf unreachable / throttled / unexpected response: conservative guess, not memoized
+                return now.normalize() - pd.Timedelta('29d')
+            if archive_dir is not None:
+                _write_minute_lookback(archive_dir, today, lookback)
+
+        _lookback_memo[today] = lookback
+
+    return (now - pd.Timedelta(seconds=lookback)).ceil('min')
+
+
+
+def _bisect_lookback(now, sess, timeout, lo='28d', hi='32d', precision='1h'):
+    '''
+    bisect sec of minute data kept by yf, between lo (assumed kept) & hi (assumed not kept)
+
+    -> sec (int) [longest lookback found to be kept, within precision]
+    '''
+    lo, hi = pd.Timedelta(lo), pd.Timedelta(hi)
+    if _minute_kept(now - hi, sess, timeout):
+        return int(hi.total_seconds())
+
+    while hi - lo > pd.Timedelta(precision):
+        mid = lo + (hi - lo) / 2
+        if _minute_kept(now - mid, sess, timeout):
+            lo = mid
+        else:
+            hi = mid
+
+    return int(lo.total_seconds())
+
+
+
+def _minute_kept(start, sess, timeout):
+    '''
+    is minute data starting at start (utc) still kept by yf ?
+    (yf responds error if too old, empty result if no trading, e.g. holidays)
+    raise on any other response (e.g. 429, 5xx, other errors), so no wrong lookback is memoized
+    '''
+    url, params, headers = _minute_request('^GSPC', start.timestamp(),
+                                           (start + pd.Timedelta('1D')).timestamp(), False)
+    _wait_for_slot(url)
+    resp = sess.get(url, params=params, headers=headers, timeout=timeout)
+    if resp.status_code not in (200, 422): # 422: range not available
+        raise Exception('lookback probe failed: HTTP {}'.format(resp.status_code))
+
+    error = _loads(resp.content)['chart']['error']
+    if error is None:
+        return True
+    if _TOO_OLD.search(str(error.get('description', ''))):
+        return False
+    raise Exception('lookback probe failed: {}'.format(error))
+
+
+
+def _minute_windows(start, end, span='7D'):
+    '''segregate (start, end) into windows of span (max span per request, 1m: 7 days) -> (starts, ends)'''
+    starts = list(pd.date_range(start, end, freq=span, inclusive='left'))
+    ends = starts[1:]
+    ends.append(end)
+    return starts, ends
+
+
+
+def _trading_windows(start, end, calendar=None, span='7D'):
+    '''
+    plan download windows (<= span each) packing as many trading dates as possible,
+    windows of closed dates only (weekends, holidays) skipped
+
+    start : start of download [utc pd.Timestamp without tz]
+    end : end of download [utc pd.Timestamp without tz]
+    calendar : _TradingCalendar of exchange (None: plain windows of span)
+    span : max span per request (1m: 7 days)
+
+    -> list of (start, end) [utc pd.Timestamp without tz]
+    '''
+    if calendar is None:
+        starts, ends = _minute_windows(start, end, span)
+        return list(zip(starts, ends))
+
+    dates = [date for date in _local_dates(start, end, calendar.tz) if calendar.is_open(date)]
+    return _pack_windows(dates, calendar.tz, start, end, span)
+
+
+
+def _pack_windows(dates, tz, start, end, span='7D'):
+    '''
+    pack local dates into windows of at most span (max span per request, 1m: 7 days)
+
+    dates : sorted local dates to cover (local midnights without tz)
+    tz : exchange timezone
+    start : start of download [utc pd.Timestamp without tz]
+    end : end of download [utc pd.Timestamp without tz]
+    span : max span per request
+
+    -> list of (start, end) [utc pd.Timestamp without tz]
+    '''
+    span = pd.Timedelta(span)
+    windows = []
+    for date in dates:
+        # local midnights -> utc, span measured in utc (a dst fall-back makes 7 local days 7 days + 1 hour)
+        date_start, date_end = _local_to_utc(date, tz), _local_to_utc(date + pd.Timedelta('1D'), tz)
+        if windows and (date_end - windows[-1][0] <= span):
+            windows[-1][1] = date_end
+        else:
+            windows.append([date_start, date_end])
+
+    # clipped into (start, end)
+    return [(max(s, start), min(e, end)) for s, e in windows]
+
+
+
+def _concat_windows(ohlcv_list):
+    '''
+    concatenate ohlcvs of windows in window order (disjoint & ascending: no re-sort needed)
+
+    -> df of ohlcv
+    '''
+    ohlcv = pd.concat(ohlcv_list, axis=0)
+    if not ohlcv.index.is_monotonic_increasing: # O(n) check, sorted only if windows overlapped
+        ohlcv = ohlcv.sort_index()
+    return ohlcv
+
+
+
+def _plan_archive_windows(symbol_dir, start, end, calendar=None):
+    '''
+    plan download windows (<= 7 days each) to cover the trading dates not archived yet
+
+    symbol_dir : dir of archived minute ohlcv of symbol
+    start : start of download [utc pd.Timestamp without tz]
+    end : end of download [utc pd.Timestamp without tz]
+    calendar : _TradingCalendar of exchange (None: every date treated as open)
+
+    -> list of (start, end) [utc pd.Timestamp without tz]
+    '''
+
+    # exchange timezone unknown before 1st download: windows of trading dates
+    tz = _read_archive_tz(symbol_dir)
+    if tz is None:
+        return _trading_windows(start, end, calendar)
+
+    # local trading dates in range, excluding those archived
+    # (1st date skipped if partly before start, it can never be fully downloaded & archived)
+    archived = _archived_dates(symbol_dir)
+    dates = _local_dates(start, end, tz)
+    missing = [date for date in dates
+                   if (date.strftime('%Y-%m-%d') not in archived)
+                   and (_local_to_utc(date, tz) >= start)
+                   and ((calendar is None) or calendar.is_open(date))]
+
+    return _pack_windows(missing, tz, start, end)
+
+
+
+def _archive_minute(symbol_dir, windows, chunks, start, end, show_split):
+    '''
+    archive downloaded minute ohlcv of symbol & merge with archived data
+
+    symbol_dir : dir of archived minute ohlcv of symbol
+    windows : list of (start, end) downloaded [utc pd.Timestamp without tz]
+    chunks : dict of {window idx: df} (failed windows excluded)
+    start : start of requested range (can be earlier than yf limit) [utc pd.Timestamp without tz]
+    end : end of requested range [utc pd.Timestamp without tz]
+    show_split : show stock splits ?
+
+    -> df of ohlcv in requested range / None if no data
+    '''
+    now = pd.Timestamp.today(tz='utc').tz_convert(None)
+    ohlcv_list = [] # list of df
+    written = set() # dates archived this time
+
+    # merge consecutive downloaded windows, archive local dates fully covered & already passed
+    idx = sorted(chunks)
+    while idx:
+        j = idx.pop(0)
+        covered = [chunks[j]]
+        start_j, end_j = windows[j]
+        while idx and (windows[idx[0]][0] == end_j):
+            j = idx.pop(0)
+            covered.append(chunks[j])
+            end_j = windows[j][1]
+        ohlcv = pd.concat(covered, axis=0)
+        ohlcv_list.append(ohlcv)
+
+        tz = str(ohlcv.index.tz)
+        end_j = min(end_j, now)
+        dates = [date.strftime('%Y-%m-%d') for date in _local_dates(start_j, end_j, tz)
+                     if (_local_to_utc(date, tz) >= start_j)
+                     and (_local_to_utc(date + pd.Timedelta('1D'), tz) <= end_j)]
+        if dates:
+            _write_minute_archive(symbol_dir, ohlcv, dates)
+            _write_archive_tz(symbol_dir, tz)
+            written.update(dates)
+
+    # read archived dates in requested range (not downloaded this time)
+    tz = _read_archive_tz(symbol_dir)
+    if tz is not None:
+        dates = {date.strftime('%Y-%m-%d') for date in _local_dates(start, end, tz)}
+        dates = sorted(_archived_dates(symbol_dir).intersection(dates) - written)
+        archived = _read_minute_archive(symbol_dir, dates)
+        if archived is not None:
+            ohlcv_list.insert(0, archived.tz_convert(tz))
+
+    if not ohlcv_list:
+        return None
+
+    # downloaded data preferred for dates both archived & downloaded
+    ohlcv = pd.concat(ohlcv_list, axis=0)
+    ohlcv = ohlcv.loc[~ohlcv.index.duplicated(keep='last')].sort_index()
+    ohlcv = ohlcv.loc[(ohlcv.index >= start.tz_localize('utc'))
+                      & (ohlcv.index < end.tz_localize('utc'))]
+    if not show_split:
+        ohlcv = ohlcv.drop(columns='split')
+    ohlcv.index = ohlcv.index.astype( # same as downloaded
+                      pd.to_datetime([], unit='s').tz_localize('utc').tz_convert(ohlcv.index.tz).dtype)
+    return ohlcv
+
+
+
+def _local_dates(start, end, tz):
+    '''exchange local dates overlapping (start, end) -> DatetimeIndex of local midnights (no tz)'''
+    start_local = start.tz_localize('utc').tz_convert(tz).tz_localize(None)
+    end_local = end.tz_localize('utc').tz_convert(tz).tz_localize(None)
+    return pd.date_range(start_local.normalize(), end_local, freq='D', inclusive='left')
+
+
+
+def _local_to_utc(t, tz):
+    '''exchange local time (no tz) -> utc time (no tz)'''
+    t = t.tz_localize(tz, ambiguous=False, nonexistent='shift_forward')
+    return t.tz_convert('utc').tz_convert(None)
 
 
 
@@ -269,7 +673,7 @@ sess=requests.Session()
 timeout=(3.05,5)
 '''
 
-def _download_minute_unit(symbol, start, end, show_prepost, show_split, sess, timeout):
+def _download_minute_unit(symbol, start, end, show_prepost, show_split, sess, timeout, compact=False):
     '''
     download minute data for single symbol in one request
     (ohlcv is original, not adjusted for split)
@@ -281,12 +685,22 @@ def _download_minute_unit(symbol, start, end, show_prepost, show_split, sess, ti
     show_split : show stock splits ?
     sess : requests.Session for persisting download
     timeout : sec to request timeout [specify sec / (sec: connect timeout, sec: response timeout)]
+    compact : compact memory ? (float32 prices, integer volume, sparse split, index in UTC)
 
-    -> df of ohlcv [index: localized datetime idx]
+    -> df of ohlcv [index: localized datetime idx / utc datetime idx if compact]
     '''
 
-    # request config
-    params = {'interval': '1m',
+    # request download
+    url, params, headers = _minute_request(symbol, start, end, show_prepost)
+    resp = sess.get(url, params=params, headers=headers, timeout=timeout)
+
+    return _parse_minute(_loads(resp.content), show_split, compact)
+
+
+
+def _minute_request(symbol, start, end, show_prepost, interval='1m'):
+    '''request config of minute (intraday) data -> (url, params, headers)'''
+    params = {'interval': interval,
               'period1': int(start), # start
               'period2': int(end), # end, but not included
               'includePrePost': show_prepost,
@@ -295,58 +709,99 @@ def _download_minute_unit(symbol, start, end, show_prepost, show_split, sess, ti
     headers = {'user-agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 \
                                 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'}
     url = 'https://query1.finance.yahoo.com/v8/finance/chart/{}'.format(symbol)
+    return url, params, headers
+
 
-    # request download
-    resp = sess.get(url, params=params, headers=headers, timeout=timeout)
+
+def _parse_minute(content, show_split, compact=False):
+    '''
+    extract minute ohlcv from decoded chart response (shared by sync & async downloads)
+    (ohlcv is original, not adjusted for split)
+
+    content : decoded json of chart response (dict)
+    show_split : show stock splits ?
+    compact : compact memory ? (float32 prices, integer volume, sparse split, index in UTC)
+
+    -> df of ohlcv [index: localized datetime idx / utc datetime idx if compact]
+    '''
 
     # extract data from response as dict
-    data = resp.json()['chart']['result'][0]
-    datetime_idx = pd.to_datetime(data['timestamp'], unit='s') # in UTC
+    data = content['chart']['result'][0]
+    datetime_idx = pd.to_datetime(np.array(data['timestamp'], dtype=np.int64), unit='s') # in UTC
     datetime_idx.name = 'datetime'
-    ohlcv = data['indicators']['quote'][0] # {'open': [...], 'high': [...], ...}
+    quote = data['indicators']['quote'][0] # {'open': [...], 'high': [...], ...}
+    n = len(datetime_idx)
 
     # variables included
     var_names = ['open', 'high', 'low', 'close', 'volume']
+    values = np.column_stack([_float_array(quote.get(name), n) for name in var_names])
+
+    # drop rows with duplicated index
+    duplicated = datetime_idx.duplicated()
+    if duplicated.any():
+        datetime_idx = datetime_idx[~duplicated]
+        values = values[~duplicated]
     
     # if split available
+    tz = data['meta']['exchangeTimezoneName']
     is_split = ('events' in data) and ('splits' in data['events'])
     if is_split:
-        split = data['events']['splits']
-        split = pd.DataFrame(split.values()).set_index('date')
-        split.index = pd.to_datetime(split.index, unit='s')
-        split = split['numerator'] / split['denominator'] # used to recover ohlc later [series]
+        split_events = data['events']['splits']
+
+        # recover ohlc due to split (in a single multiply)
+        values[:, :4] *= _split_factor(datetime_idx, split_events, tz)[:, None]
+        # !!! volume is not adjusted in raw data, thus no need to recover !!!
 
     # include split in result
     if show_split:
         var_names.append('split')
         if is_split:
-            ohlcv['split'] = split
+            split_array = _event_array(split_events, datetime_idx, normalize=False,
+                                       value=lambda event: event['numerator'] / event['denominator'])
         else:
-            ohlcv['split'] = np.nan
+            split_array = np.full(len(datetime_idx), np.nan)
+        values = np.column_stack([values, split_array])
 
-    # dict of ohlcv -> df of ohlcv (to be returned)
-    ohlcv = pd.DataFrame(ohlcv, index=datetime_idx, columns=var_names, dtype=np.float64)
+    # arrays of ohlcv -> df of ohlcv (to be returned)
+    ohlcv = pd.DataFrame(values, index=datetime_idx, columns=var_names)
+    if compact:
+        return _compact_ohlcv(ohlcv, tz) # localized lazily (see localize)
 
     # convert datetime idx to local time
-    tz = data['meta']['exchangeTimezoneName']
     ohlcv.index = ohlcv.index.tz_localize(tz='utc').tz_convert(tz=tz) 
-
-    # recover ohlc due to split
-    if is_split:
-        for datetime, ratio in split.items():
-            date = (datetime - pd.Timedelta('1d')).strftime('%Y-%m-%d')
-            ohlcv.loc[:date, ['open', 'high', 'low', 'close']] *= ratio
-        # !!! volume is not adjusted in raw data, thus no need to recover !!!
-
-    # drop rows with duplicated index
-    duplicated = ohlcv.index.duplicated()
-    if duplicated.any():
-        ohlcv = duplicated.loc[~duplicated]
         
     return ohlcv
 
 
 
+def _split_factor(datetime_idx, split_events, tz):
+    '''
+    multiplying factor to recover original ohlc before splits
+    (rows before the local midnight of each split's date multiplied by its ratio)
+
+    datetime_idx : DatetimeIndex of rows (utc, no tz)
+    split_events : dict of splits (each with 'date', 'numerator', 'denominator')
+    tz : exchange timezone
+
+    -> float64 array (1.0 if no split after that row)
+    '''
+    events = sorted(split_events.values(), key=lambda event: event['date'])
+    ratios = np.array([event['numerator'] / event['denominator'] for event in events], dtype=np.float64)
+
+    # boundary of each split: local midnight of the split's (utc) date, in utc
+    dates = pd.to_datetime(np.array([event['date'] for event in events], dtype=np.int64),
+                           unit='s').normalize()
+    boundaries = dates.tz_localize(tz, ambiguous=False, nonexistent='shift_forward').tz_convert(None)
+
+    # cumulative ratio of all splits after each boundary (1.0 after the last one)
+    cum_ratios = np.append(np.cumprod(ratios[::-1])[::-1], 1.0)
+
+    # num of boundaries passed by each row -> factor
+    passed = boundaries.searchsorted(datetime_idx, side='right')
+    return cum_ratios[passed]
+
+
+
 
 
 
@@ -419,3 +874,31 @@ if False:
 
 
 
+
+
+
+
+    # benchmark: split recovery, label-sliced loop (before) vs _split_factor (now)
+    import timeit
+    n, tz = 7 * 960, 'America/New_York' # 7 days of pre + regular + post market minutes
+    datetime_idx = pd.date_range('2022-04-18 08:00', periods=n, freq='min')
+    split_events = {str(t): {'date': t, 'numerator': r, 'denominator': 1}
+                        for t, r in [(1650445200, 2), (1650531600, 3), (1650618000, 10)]}
+    values = np.random.rand(n, 5)
+
+    def recover_loop():
+        ohlcv = pd.DataFrame(values, index=datetime_idx.tz_localize('utc').tz_convert(tz),
+                             columns=['open', 'high', 'low', 'close', 'volume'])
+        for event in split_events.values():
+            date = (pd.Timestamp(event['date'], unit='s') - pd.Timedelta('1d')).strftime('%Y-%m-%d')
+            ohlcv.loc[:date, ['open', 'high', 'low', 'close']] *= event['numerator'] / event['denominator']
+        return ohlcv
+
+    def recover_vectorized():
+        recovered = values.copy()
+        recovered[:, :4] *= _split_factor(datetime_idx, split_events, tz)[:, None]
+        return pd.DataFrame(recovered, index=datetime_idx.tz_localize('utc').tz_convert(tz),
+                            columns=['open', 'high', 'low', 'close', 'volume'])
+
+    print('loop       : {:.3f} ms'.format(timeit.timeit(recover_loop, number=100) * 10))
+    print('vectorized : {:.3f} ms'.format(timeit.timeit(recover_vectorized, number=100) * 10))
@@ -3,7 +3,16 @@ import numpy as np
 import pandas as pd
 import re
 import time
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import Future
+
+try:
+    from ._rate_limit import _make_pacer, _wait_for_slot
+    from ._http import _use_client
+    from ._engine import _iter_jobs
+except ImportError:
+    from _rate_limit import _make_pacer, _wait_for_slot
+    from _http import _use_client
+    from _engine import _iter_jobs
 
 
 
@@ -54,20 +63,24 @@ if False:
 
     # Outputs
     # list of symbols [list of str]
+
+
+    # yield symbols of each page as soon as downloaded (in completion order, pages may overlap)
+    for offset, symbols in iter_download_symbols(url, count=250, speed=0.25):
+        print(offset, symbols)
     
     # Main logic flow:
-    # (1) create requests.Session for persisting connection
+    # (1) use requests.Session of client for persisting connection (temporary client if not given)
     # (2) 1st request to get estimated num of symbols 
-    # (3) create ThreadPoolExecutor for multi-thread downloads
-    # (4) Outer loop for overall download retry
-    #   (4-1) Inner loop for multi-thread downloads
-    #     (4-1-1) speed control
-    #     (4-1-2) sumbit download task
-    #   (4-2) Inner loop for processing downloads
-    #     (4-2-1) try getting downloaded contents
-    #     (4-2-2) accumulate download symbols to list
-    #   (4-3) speed control before next outer retry loop
-    # (5) retrun: reduced unique symbol list, sorted by download order
+    # (3) use ThreadPoolExecutor of client for multi-thread downloads
+    # (4) submit download task of each page (with speed control)
+    #   (4-1) skip pages past the last page (a page shorter than count is the last one)
+    # (5) process downloads in completion order
+    #   (5-1) if download failed / no content: re-enqueue page after a jittered exponential backoff
+    #   (5-2) give up page once its attempts (retry + 1) are used up
+    #   (5-3) yield symbols of page as soon as downloaded (iter_download_symbols)
+    # (6) accumulate download symbols to list (same order as pages)
+    # (7) retrun: unique symbol list (duplicates dropped in one pass), sorted by download order
     
 
 
@@ -85,19 +98,42 @@ retry=1
 timeout=(3.05,5)
 '''
 
-def download_symbols(url, count=250, speed=0.25, retry=0, timeout=(3.05,5)):
+def download_symbols(url, count=250, speed=0.25, retry=0, timeout=(3.05,5), client=None):
     '''
     download a list of symbols from yahoo finance screener
     e.g. url='https://finance.yahoo.com/screener/unsaved/e7585fa5-86fc-40da-9202-b7ebeb3d7512' (will expire in few days)
 
     url : url of filtered yf screener
     count : num of symbols per page
-    speed : sec per requested download
+    speed : sec per requested download (on top of the shared limit set by set_rate_limit)
     retry : num of download retry (to maximize downloaded content)
     timeout : sec to request timeout [specify: sec / (sec: connect timeout, sec: response timeout)]
+    client : YFClient to reuse its connections & worker threads (None: new ones for this call only)
     
     -> list of symbols
     '''
+
+    # collect all pages, accumulate symbols (same order as pages)
+    pages = dict(iter_download_symbols(url, count, speed, retry, timeout, client))
+    symbols = [symbol for offset in sorted(pages) for symbol in pages[offset]]
+
+    # final process: drop duplicates in one pass, same order as downloaded
+    syms_unique = list(dict.fromkeys(symbols))
+    print('Total {} unique symbols are downloaded\n'.format(len(syms_unique)))
+    
+    return syms_unique
+
+
+
+def iter_download_symbols(url, count=250, speed=0.25, retry=0, timeout=(3.05,5), client=None):
+    '''
+    download symbols from yahoo finance screener,
+    yield each page as soon as its download is done (in completion order)
+
+    (inputs same as download_symbols)
+
+    -> generator of (offset, list of symbols on page) [pages may overlap]
+    '''
     
     # process inputs
     count = int(np.clip(count, 1, 250)) # [1, 250] # [num of symbols per page]
@@ -111,85 +147,91 @@ def download_symbols(url, count=250, speed=0.25, retry=0, timeout=(3.05,5)):
     # initialize
     regex = re.compile(r'">([-^=.A-Z0-9]+)</a><div class="')
     #regex = re.compile(r'/quote/([-.A-Z0-9]+)\?p=\1')
-    symbols = []
     headers = {'user-agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 \
                                 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'}
 
 
-    with requests.Session() as sess:
+    pacer = _make_pacer(speed) # per-call speed control (shared host limit applied as well)
+    with _use_client(client) as client:
+        sess, executor = client.sess, client.executor
         
         # 1st download to extract symbol num
+        _wait_for_slot(url, pacer)
         html = sess.get(url, headers=headers, timeout=timeout).text
         regex_estimate = re.compile(r' of ([0-9]+) results') # extract symbol num
         estimated = int(regex_estimate.search(html).group(1))
         print('Estimated {} symbols will be downloaded'.format(estimated))
+
+        # ends of results confirmed (a page empty again on retry ends results, pages after it not requested)
+        ends = [estimated]
+        empties = set() # offsets of pages found empty once (raised & retried to confirm)
         
-        
-        with ThreadPoolExecutor() as executor:
 
-            # initialize outer retry loop
-            offsets = list(range(0, estimated, count))
-            
-            # outer loop to retry download & process contents
-            for i_outer_loop in range(retry + 1):
-
-                # initialize inner loops
-                print('Loop {}'.format(i_outer_loop))
-                pool = {} # container for threads
-                t0 = time.perf_counter()
-
-                # inner loop to download
-                for i_wait, offset in enumerate(offsets):
-
-                    # speed control
-                    wait = max(0.0, speed*i_wait - (time.perf_counter()-t0) )
-                    time.sleep(wait) 
-
-                    # request download
-                    params = {'offset': offset, 'count': count}
-                    pool[offset] = executor.submit(sess.get, url, params=params,
-                                                   headers=headers, timeout=timeout)
-                    print('  Download {} ~ {} symbols'.format(offset+1,
-                                                                 min(offset+count, estimated) ))
-                    
-                # inner loop to process downloaded contents
-                for offset, job in pool.items():
-
-                    # try getting downloaded contents
-                    try:
-                        matches = regex.findall(job.result().text)
-                        if not matches:
-                            raise Exception
-                        symbols.extend(matches) # accumulate symbols
-                        
-                    # if download failed / no content  
-                    except Exception:
-                        print('    [Err] Failed at {} ~ {} symbols'.format(offset+1,
-                                                     min(offset+count, estimated) ))
-                        
-                # speed control before next outer retry loop
-                if i_outer_loop < retry:
-                    i_wait += 1
-                    wait = max(0.0, speed*i_wait - (time.perf_counter()-t0) )
-                    time.sleep(wait)
-
-
-    # final process
-    syms_unique = list(set(symbols))
-    print('Total {} unique symbols are downloaded (Estimated {} symbols)\n'.format(
-                            len(syms_unique), estimated) ) # maybe more than estimated
-    
-    return sorted(syms_unique, key=symbols.index) # same order as downloaded
+        def submit(offset):
 
+            # past the confirmed last page: nothing to download
+            if offset >= min(ends):
+                job = Future()
+                job.set_result([])
+                return job
 
+            # speed control
+            _wait_for_slot(url, pacer)
 
+            # request download
+            print('  Download {} ~ {} symbols'.format(offset+1, min(offset+count, estimated) ))
+            return executor.submit(_download_symbols_unit, url, offset, count,
+                                   regex, headers, sess, timeout, ends, empties)
+
+        def format_failed(offsets):
+            return ' '.join('{} ~ {}'.format(offset+1, min(offset+count, estimated))
+                                for offset in offsets)
+
+        # only failed pages (error / no content / short before the last page) retried, each on its own
+        for offset, matches in _iter_jobs(executor, range(0, estimated, count), submit, retry,
+                                          True, print, format_failed, metrics=client.metrics):
+            if matches:
+                yield offset, matches
+
+        # results ended more than a page before estimated: pages after the end reported as failed
+        end = min(ends)
+        if end < estimated:
+            print('Results end at {} (estimated {})'.format(end, estimated))
+            if end < estimated - count:
+                print('    Failed :', format_failed([offset for offset in range(0, estimated, count)
+                                                         if offset > end]))
+
+
+
+def _download_symbols_unit(url, offset, count, regex, headers, sess, timeout, ends, empties):
+    '''
+    download a page of symbols from yf screener -> list of symbols
+    (raise if error, empty page not confirmed yet, or page short before the last page,
+     e.g. a row missed / fewer rows served, so the page is retried)
+
+    ends : list of confirmed ends of results (offset of a page empty again on retry appended)
+    empties : set of offsets of pages found empty once
+    '''
+    params = {'offset': offset, 'count': count}
+    resp = sess.get(url, params=params, headers=headers, timeout=timeout)
+    if resp.status_code != 200:
+        raise Exception('HTTP {} at {} ~ {}'.format(resp.status_code, offset+1, offset+count))
+
+    matches = regex.findall(resp.text)
+    if not matches:
+        if offset in empties: # empty again on retry: end of results confirmed
+            ends.append(offset) # list.append is thread-safe
+            return []
+        empties.add(offset)
+        raise Exception('no symbols at {} ~ {}'.format(offset+1, offset+count))
+
+    # short page before the last one (estimated / confirmed): retried
+    if (len(matches) < count) and (offset + count < min(ends)):
+        raise Exception('{} symbols only at {} ~ {}'.format(len(matches), offset+1, offset+count))
+    return matches
 
 
 
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from webdriver_manager.chrome import ChromeDriverManager
-import time
 
 
 
@@ -203,6 +245,11 @@ def get_symbols_download_url(us_or_hk, retry=1, timeout=5):
     
     -> url of filtered yf screener
     '''
+    # selenium & webdriver_manager only needed here (imported on use, optional otherwise)
+    from selenium import webdriver
+    from selenium.webdriver.chrome.options import Options
+    from webdriver_manager.chrome import ChromeDriverManager
+
     us_or_hk = str.lower(us_or_hk)
     url = None
     
@@ -0,0 +1,226 @@
+import time
+import collections
+import pandas as pd
+
+try:
+    from ._http import _Connection
+    from ._rate_limit import _wait_for_slot
+    from ._inputs import _process_symbols, _process_timeout
+    from .yf_download_info import _plan_info_groups, _info_request, _download_info_unit
+except ImportError:
+    from _http import _Connection
+    from _rate_limit import _wait_for_slot
+    from _inputs import _process_symbols, _process_timeout
+    from yf_download_info import _plan_info_groups, _info_request, _download_info_unit
+
+
+
+
+
+#-------------------------Description-------------------------#
+# live info (quote) poller for a large universe of symbols, instead of download_info in a loop
+# symbol groups planned once (regrouped by exchange after 1st tick), batched quote requests
+# fired on a fixed cadence over kept-alive connections, groups of closed exchanges skipped,
+# only changed rows built into a df each tick
+
+if False:
+    import yf_tools as yf
+
+    with yf.InfoPoller(symbols, interval=5, history=100) as poller:
+
+        # df of changed rows each tick (index: symbol)
+        for changed in poller.run():
+            print(changed[['regularMarketPrice', 'regularMarketTime']])
+
+        # or one tick at a time
+        changed = poller.poll()
+
+        # ring buffer of recent ticks: deque of (utc pd.Timestamp, df of changed rows)
+        poller.history
+
+        # df of latest info of all symbols (built on demand)
+        info_df = poller.latest()
+
+    # Inputs
+    # symbols : list of symbols (list of str)
+    # interval : sec between ticks (fixed cadence, ticks missed while busy are skipped)
+    # max_url_len : url length limit
+    # max_symbols : max num of symbols per request
+    # history : num of recent ticks kept
+    # recheck : sec between re-checks of a closed exchange (none on its local weekend)
+    # timeout : sec to request timeout
+    # client : YFClient to reuse (None: own connections, released by close())
+
+
+
+
+
+#-------------------------Definition-------------------------#
+
+_CLOSED_STATES = ('CLOSED', 'PREPRE', 'POSTPOST') # marketState of closed exchange
+
+
+
+class InfoPoller:
+    '''
+    poll info (quote) of many symbols on a fixed cadence, return changed rows per tick
+
+    symbols : list of symbols (list of str)
+    interval : sec between ticks
+    max_url_len : url length limit
+    max_symbols : max num of symbols per request
+    history : num of recent ticks kept (ring buffer of changed rows)
+    recheck : sec between re-checks of a closed exchange (none on its local weekend)
+    timeout : sec to request timeout [specify: sec / (sec: connect timeout, sec: response timeout)]
+    client : YFClient to reuse its connections & worker threads (None: own ones, released by close())
+    '''
+
+    def __init__(self, symbols, interval=5, max_url_len=8000, max_symbols=1000, history=100, recheck=60,
+                 timeout=(3.05,5), client=None):
+
+        # process inputs
+        symbols, _ = _process_symbols(symbols)
+        self.symbols = list(dict.fromkeys(symbols)) # unique, same order
+        self.interval = float(max(interval, 0.0)) # [0.0, inf) # [sec per tick]
+        self.max_url_len = int(max(max_url_len, 1)) # [1, inf)
+        self.max_symbols = int(max(max_symbols, 1)) # [1, inf)
+        self.recheck = float(max(recheck, 0.0)) # [0.0, inf) # [sec per re-check]
+        self.timeout = _process_timeout(timeout)
+        self.history = collections.deque(maxlen=int(max(history, 1))) # (utc pd.Timestamp, df)
+
+        self._own_client = client is None
+        self.client = _Connection() if client is None else client
+
+        # plan once (regrouped by exchange after 1st tick)
+        self._groups = _plan_info_groups(self.symbols, self.max_url_len, self.max_symbols) # list of tuples
+        self._grouped_by_exchange = False
+        self._latest = {} # {symbol: dict of info}
+        self._closed = {} # {group: (exchange timezone, time of last check)} of closed groups
+
+
+    def poll(self):
+        '''one tick: download info of groups with exchange open -> df of changed rows'''
+        now = time.time()
+        groups = [sym_grp for sym_grp in self._groups if self._is_due(sym_grp, now)]
+
+        # fire all requests of the tick
+        jobs = []
+        for sym_grp in groups:
+            url, headers = _info_request(sym_grp)
+            _wait_for_slot(url)
+            jobs.append(self.client.executor.submit(_download_info_unit, url, headers,
+                                                    self.client.sess, self.timeout))
+
+        # keep changed rows only (failed groups polled again next tick)
+        changed = []
+        for sym_grp, job in zip(groups, jobs):
+            try:
+                list_of_dicts = job.result()
+            except Exception:
+                continue
+
+            for info in list_of_dicts:
+                if self._latest.get(info.get('symbol')) != info:
+                    self._latest[info.get('symbol')] = info
+                    changed.append(info)
+            self._update_closed(sym_grp, list_of_dicts, now)
+
+        if not self._grouped_by_exchange:
+            self._regroup_by_exchange()
+
+        changed = _info_df(changed)
+        self.history.append((pd.Timestamp(now, unit='s', tz='utc'), changed))
+        return changed
+
+
+    def run(self, n_ticks=None):
+        '''
+        poll on a fixed cadence (ticks missed while busy are skipped)
+
+        n_ticks : num of ticks (None: forever)
+
+        -> generator of df of changed rows
+        '''
+        next_t = time.perf_counter()
+        i_tick = 0
+        while (n_ticks is None) or (i_tick < n_ticks):
+            yield self.poll()
+            i_tick += 1
+
+            # sleep until next tick on the cadence
+            next_t += self.interval
+            now = time.perf_counter()
+            if (next_t < now) and (self.interval > 0):
+                next_t += ((now - next_t) // self.interval + 1) * self.interval
+            time.sleep(max(next_t - now, 0.0))
+
+
+    def latest(self):
+        '''df of latest info of all symbols (index: symbol)'''
+        return _info_df([self._latest[symbol] for symbol in self.symbols if symbol in self._latest])
+
+
+    def close(self):
+        '''release own connections & worker threads'''
+        if self._own_client:
+            self.client.close()
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+    def _is_due(self, sym_grp, now):
+        '''poll group in this tick ? (closed exchange: re-checked every recheck sec, except local weekend)'''
+        if sym_grp not in self._closed:
+            return True
+
+        tz, t_checked = self._closed[sym_grp]
+        if (tz is not None) and (pd.Timestamp(now, unit='s', tz='utc').tz_convert(tz).weekday() >= 5):
+            return False
+        return (now - t_checked) >= self.recheck
+
+
+    def _update_closed(self, sym_grp, list_of_dicts, now):
+        '''mark group closed if no symbol of it is trading (incl. no info at all)'''
+        states = [info.get('marketState') for info in list_of_dicts]
+        if all(state in _CLOSED_STATES for state in states):
+            tz = next((info['exchangeTimezoneName'] for info in list_of_dicts
+                           if 'exchangeTimezoneName' in info), None)
+            self._closed[sym_grp] = (tz, now)
+        else:
+            self._closed.pop(sym_grp, None)
+
+
+    def _regroup_by_exchange(self):
+        '''regroup symbols by exchange (so a closed exchange skips whole groups), once info is known'''
+        if not self._latest:
+            return
+
+        by_exchange = {} # {exchange: list of symbols} (None: no info, e.g. invalid symbols)
+        for symbol in self.symbols:
+            exchange = self._latest.get(symbol, {}).get('exchange')
+            by_exchange.setdefault(exchange, []).append(symbol)
+
+        # groups found closed right away from latest info
+        now = time.time()
+        self._groups, self._closed = [], {}
+        for exchange, symbols in by_exchange.items():
+            for sym_grp in _plan_info_groups(symbols, self.max_url_len, self.max_symbols):
+                self._groups.append(sym_grp)
+                self._update_closed(sym_grp, [self._latest[symbol] for symbol in sym_grp
+                                                  if symbol in self._latest], now)
+
+        self._grouped_by_exchange = True
+
+
+
+def _info_df(list_of_dicts):
+    '''list of dicts of info -> df of info (index: symbol)'''
+    if not list_of_dicts:
+        return pd.DataFrame(index=pd.Index([], name='symbol'))
+    return pd.DataFrame(list_of_dicts).set_index('symbol')
@@ -0,0 +1,124 @@
+import numpy as np
+import pandas as pd
+
+
+
+
+
+#-------------------------Description-------------------------#
+# aligned multi-symbol panel: one 3D float array (time x symbol x field)
+# instead of dict of dfs + pd.concat(ohlcvs, axis=1)
+
+if False:
+    import yf_tools as yf
+
+    panel = yf.download_day(symbols, output='panel')
+    panel = yf.download_minute(symbols, output='panel') # index in UTC (symbols of different timezones)
+
+    panel.values # np.ndarray [time x symbol x field]
+    panel.index # DatetimeIndex (union of all symbols' datetimes)
+    panel.symbols # Index of symbols
+    panel.fields # Index of fields, e.g. ['open', 'high', 'low', 'close', 'volume', 'adjclose']
+
+    # df [time x symbol] of a field, e.g. all closes
+    closes = panel['close']
+
+    # df [symbol x field] at a datetime, e.g. all symbols on a date
+    snapshot = panel.xs('2021-05-07')
+
+    # df [time x field] of a symbol (same as download_day output, with nan rows)
+    aapl = panel.symbol('AAPL')
+
+
+
+
+
+#-------------------------Definition-------------------------#
+
+class Panel:
+    '''
+    aligned multi-symbol data (time x symbol x field)
+
+    values : 3D float array [time x symbol x field] (nan if no data)
+    index : DatetimeIndex of time axis
+    symbols : Index of symbol axis
+    fields : Index of field axis
+    '''
+
+    def __init__(self, values, index, symbols, fields):
+        self.values = values
+        self.index = pd.DatetimeIndex(index, name='datetime')
+        self.symbols = pd.Index(symbols, name='symbol')
+        self.fields = pd.Index(fields, name='field')
+
+
+    @property
+    def shape(self):
+        return self.values.shape
+
+
+    def __getitem__(self, field):
+        '''df [time x symbol] of a field (view of values)'''
+        f = self.fields.get_loc(field)
+        return pd.DataFrame(self.values[:, :, f], index=self.index, columns=self.symbols, copy=False)
+
+
+    def xs(self, datetime):
+        '''df [symbol x field] at a datetime'''
+        datetime = pd.Timestamp(datetime)
+        if (self.index.tz is not None) and (datetime.tz is None):
+            datetime = datetime.tz_localize('utc')
+        t = self.index.get_loc(datetime)
+        return pd.DataFrame(self.values[t], index=self.symbols, columns=self.fields, copy=False)
+
+
+    def symbol(self, symbol):
+        '''df [time x field] of a symbol'''
+        s = self.symbols.get_loc(symbol)
+        return pd.DataFrame(self.values[:, s, :], index=self.index, columns=self.fields, copy=False)
+
+
+    def __repr__(self):
+        return '<Panel: {} datetimes x {} symbols x {} fields [{}]>'.format(
+                    *self.shape, ', '.join(self.fields))
+
+
+
+def _build_panel(results, symbols, dtype=np.float64):
+    '''
+    build Panel from downloaded results, keeping only compact arrays while downloading
+
+    results : iterable of (symbol, df of ohlcv) [e.g. iter_download_day]
+    symbols : list of symbols (order of symbol axis)
+    dtype : dtype of values (e.g. np.float32 for compact memory)
+
+    -> Panel
+    '''
+
+    # keep (utc datetimes, values) of each symbol as arrays as results arrive
+    arrays = {}
+    fields, tz = None, None
+    for symbol, ohlcv in results:
+        if fields is None:
+            fields = list(ohlcv.columns)
+            tz = ohlcv.index.tz
+        times = ohlcv.index.values.astype('datetime64[ns]') # utc if tz-aware
+        arrays[symbol] = (times, ohlcv[fields].to_numpy(dtype=dtype, na_value=np.nan))
+
+    symbols = [symbol for symbol in dict.fromkeys(symbols) if symbol in arrays] # duplicates: once
+    if not symbols:
+        return Panel(np.empty((0, 0, 0)), pd.DatetimeIndex([]), [], [])
+
+    # union of datetimes -> preallocated panel
+    index = np.unique(np.concatenate([arrays[symbol][0] for symbol in symbols]))
+    values = np.full((len(index), len(symbols), len(fields)), np.nan, dtype=dtype)
+
+    # fill in each symbol (arrays released once filled)
+    for s, symbol in enumerate(symbols):
+        times, ohlcv = arrays.pop(symbol)
+        values[index.searchsorted(times), s, :] = ohlcv
+
+    index = pd.DatetimeIndex(index)
+    if tz is not None:
+        index = index.tz_localize('utc')
+    return Panel(values, index, symbols, fields)
@@ -0,0 +1,246 @@
+import numpy as np
+import pandas as pd
+
+try:
+    from .yf_panel import Panel
+    from ._compact import _compact_ohlcv
+except ImportError:
+    from yf_panel import Panel
+    from _compact import _compact_ohlcv
+
+
+
+
+
+#-------------------------Description-------------------------#
+# coarser bars from downloaded minute bars, without downloading again
+# bins on exchange local time (never shifted by utc offset / dst), all symbols aggregated at once
+# (open: first, high: max, low: min, close: last, volume: sum, others e.g. split: last; nan skipped)
+
+if False:
+    import yf_tools as yf
+
+    ohlcvs = yf.download_minute(symbols)
+    ohlcvs_5m = yf.resample(ohlcvs, '5min')
+    ohlcvs_1h = yf.resample(ohlcvs, '1h', offset='30min') # 09:30, 10:30, ... (as yf's 1h bars)
+    tsm_15m = yf.resample(ohlcvs['TSM'], '15min') # single df
+
+    # panel (index in UTC): bins on local time of tz
+    panel = yf.download_minute(symbols, output='panel')
+    panel_15m = yf.resample(panel, '15min', tz='America/New_York')
+
+    # Inputs
+    # ohlcvs : df of ohlcv / dict of df (e.g. download_minute output, compact or not) / Panel
+    # freq : bar length, e.g. '5min', '15min', '1h' (any pd.Timedelta string)
+    # offset : shift of bins from local midnight, e.g. '30min' for hourly bars starting at 09:30
+    # tz : exchange timezone of bins (None: timezone of each df / compact df.attrs['tz'] / panel index)
+
+    # Output
+    # same type as ohlcvs: bars labelled by their local start time (bins without rows not created,
+    # volume nan if no data in bin), compact df stays compact
+
+
+
+
+#-------------------------Definition-------------------------#
+_AGGREGATIONS = {'open': 'first', 'high': 'max', 'low': 'min', 'close': 'last', 'volume': 'sum'} # others: last
+
+
+
+def resample(ohlcvs, freq, offset='0min', tz=None):
+    '''
+    resample ohlcv bars into coarser bars on exchange local time (vectorized over all symbols)
+
+    ohlcvs : df of ohlcv / dict of df / Panel
+    freq : bar length (pd.Timedelta str, e.g. '5min', '1h')
+    offset : shift of bins from local midnight (e.g. '30min')
+    tz : exchange timezone of bins (None: from each df / panel index)
+
+    -> df of ohlcv / dict of df / Panel (same type as ohlcvs)
+    '''
+    freq_ns = pd.Timedelta(freq).value
+    if freq_ns <= 0:
+        raise ValueError('freq must be positive, e.g. 5min')
+    offset_ns = pd.Timedelta(offset).value % freq_ns
+
+    if isinstance(ohlcvs, Panel):
+        return _resample_panel(ohlcvs, freq_ns, offset_ns, tz)
+    if isinstance(ohlcvs, dict):
+        return _resample_dict(ohlcvs, freq_ns, offset_ns, tz)
+    return _resample_dict({None: ohlcvs}, freq_ns, offset_ns, tz)[None]
+
+
+
+def _resample_dict(ohlcvs, freq_ns, offset_ns, tz):
+    '''dict of df -> dict of resampled df (all symbols stacked into one array, reduced at once)'''
+    symbols = list(ohlcvs)
+    if sum(len(ohlcv) for ohlcv in ohlcvs.values()) == 0:
+        return {symbol: ohlcv.copy() for symbol, ohlcv in ohlcvs.items()}
+
+    # rows of all symbols stacked (grouped by timezone, each converted to local time once)
+    tzs = {symbol: _local_tz(ohlcvs[symbol], tz) for symbol in symbols}
+    symbols.sort(key=lambda symbol: str(tzs[symbol]))
+    lengths = np.array([len(ohlcvs[symbol]) for symbol in symbols])
+    bounds = np.concatenate([[0], np.cumsum(lengths)])
+    fields = list(dict.fromkeys(name for symbol in symbols for name in ohlcvs[symbol].columns))
+
+    utc_ns = np.empty(bounds[-1], dtype=np.int64)
+    local_ns = np.empty(bounds[-1], dtype=np.int64)
+    values = np.full((bounds[-1], len(fields)), np.nan)
+    for s, symbol in enumerate(symbols):
+        ohlcv = ohlcvs[symbol]
+        a, b = bounds[s], bounds[s+1]
+        utc_ns[a:b] = _utc_ns(ohlcv.index)
+        cols = [fields.index(name) for name in ohlcv.columns]
+        values[a:b, cols] = ohlcv.to_numpy(dtype=np.float64, na_value=np.nan)
+
+    s = 0
+    while s < len(symbols): # symbols of same timezone: one conversion
+        e = s + 1
+        while (e < len(symbols)) and (str(tzs[symbols[e]]) == str(tzs[symbols[s]])):
+            e += 1
+        local_ns[bounds[s]:bounds[e]] = _to_local_ns(utc_ns[bounds[s]:bounds[e]], tzs[symbols[s]])
+        s = e
+
+    # bins of (symbol, local bin) -> reduced rows
+    groups = np.repeat(np.arange(len(symbols)), lengths)
+    starts, bins_ns = _bin_starts(local_ns, freq_ns, offset_ns, groups)
+    reduced = _reduce_bins(values, starts, [_AGGREGATIONS.get(name, 'last') for name in fields])
+    bins_utc = utc_ns[starts] - (local_ns[starts] - bins_ns) # bin start in utc (no dst ambiguity)
+
+    # split back per symbol (same order & columns as input)
+    bin_bounds = np.searchsorted(starts, bounds)
+    resampled = {}
+    for s, symbol in enumerate(symbols):
+        ohlcv = ohlcvs[symbol]
+        a, b = bin_bounds[s], bin_bounds[s+1]
+        cols = [fields.index(name) for name in ohlcv.columns]
+        index = _bin_index(bins_utc[a:b], ohlcv.index, tzs[symbol])
+        df = pd.DataFrame(reduced[a:b][:, cols], index=index, columns=ohlcv.columns)
+        resampled[symbol] = _compact_ohlcv(df) if _is_compact(ohlcv) else df
+    return {symbol: resampled[symbol] for symbol in ohlcvs}
+
+
+
+def _resample_panel(panel, freq_ns, offset_ns, tz):
+    '''Panel -> resampled Panel (time axis reduced for all symbols & fields at once)'''
+    n_t, n_s, n_f = panel.shape
+    if n_t == 0:
+        return panel
+
+    tz = None if panel.index.tz is None else (tz if tz is not None else panel.index.tz) # tz-naive: as is
+    utc_ns = _utc_ns(panel.index)
+    local_ns = _to_local_ns(utc_ns, tz)
+    starts, bins_ns = _bin_starts(local_ns, freq_ns, offset_ns)
+
+    # [time x (symbol, field)] reduced along time
+    hows = [_AGGREGATIONS.get(name, 'last') for name in panel.fields] * n_s
+    reduced = _reduce_bins(panel.values.reshape(n_t, n_s * n_f), starts, hows)
+    reduced = reduced.reshape(len(starts), n_s, n_f).astype(panel.values.dtype, copy=False)
+
+    bins_utc = utc_ns[starts] - (local_ns[starts] - bins_ns)
+    index = _bin_index(bins_utc, panel.index, panel.index.tz)
+    return Panel(reduced, index, panel.symbols, panel.fields)
+
+
+
+def _bin_starts(local_ns, freq_ns, offset_ns, groups=None):
+    '''
+    first row of each bin (rows sorted by time within each group)
+
+    local_ns : int64 array of local time (ns)
+    groups : int array of group (symbol) of each row (None: one group)
+
+    -> (int array of first row of each bin, int64 array of local bin start (ns) of each bin)
+    '''
+    bins = (local_ns - offset_ns) // freq_ns * freq_ns + offset_ns
+    change = bins[1:] != bins[:-1]
+    if groups is not None:
+        change |= groups[1:] != groups[:-1]
+    starts = np.flatnonzero(np.concatenate([[True], change]))
+    return starts, bins[starts]
+
+
+
+def _reduce_bins(values, starts, hows):
+    '''
+    aggregate rows of each bin, nan skipped (nan if no value in bin)
+
+    values : 2D float array [rows x columns]
+    starts : first row of each bin (ascending, starting at 0)
+    hows : aggregation of each column ('first' / 'max' / 'min' / 'last' / 'sum')
+
+    -> 2D float64 array [bins x columns]
+    '''
+    values = np.asarray(values, dtype=np.float64)
+    n = len(values)
+    hows = np.asarray(hows)
+    reduced = np.empty((len(starts), values.shape[1]))
+    rows = np.arange(n)[:, None]
+
+    for how in np.unique(hows):
+        cols = np.flatnonzero(hows == how)
+        v = values[:, cols]
+        valid = ~np.isnan(v)
+
+        if how == 'max':
+            r = np.fmax.reduceat(v, starts, axis=0)
+        elif how == 'min':
+            r = np.fmin.reduceat(v, starts, axis=0)
+        elif how == 'sum':
+            r = np.add.reduceat(np.where(valid, v, 0.0), starts, axis=0)
+            r[np.add.reduceat(valid.astype(np.int64), starts, axis=0) == 0] = np.nan
+        elif how == 'first':
+            pos = np.minimum.reduceat(np.where(valid, rows, n), starts, axis=0) # n if none valid
+            r = np.take_along_axis(v, np.minimum(pos, n - 1), axis=0)
+            r[pos == n] = np.nan
+        else: # last
+            pos = np.maximum.reduceat(np.where(valid, rows, -1), starts, axis=0) # -1 if none valid
+            r = np.take_along_axis(v, np.maximum(pos, 0), axis=0)
+            r[pos < 0] = np.nan
+        reduced[:, cols] = r
+
+    return reduced
+
+
+
+def _local_tz(ohlcv, tz=None):
+    '''exchange timezone of bins of df (compact: df.attrs['tz'], None if tz-naive: index as is)'''
+    if ohlcv.index.tz is None:
+        return None
+    if tz is not None:
+        return tz
+    if _is_compact(ohlcv):
+        return ohlcv.attrs['tz']
+    return ohlcv.index.tz
+
+
+
+def _is_compact(ohlcv):
+    '''is df compact (utc index with exchange timezone in attrs) ?'''
+    return (ohlcv.attrs.get('tz') is not None) and (ohlcv.index.tz is not None) \
+               and (str(ohlcv.index.tz) == 'UTC')
+
+
+
+def _utc_ns(index):
+    '''DatetimeIndex -> int64 array of ns (utc if tz-aware, else as is)'''
+    return index.values.astype('datetime64[ns]').view(np.int64) # .values of tz-aware index: utc
+
+
+
+def _to_local_ns(utc_ns, tz):
+    '''int64 array of utc ns -> int64 array of local wall-clock ns of tz (as is if tz None)'''
+    if tz is None:
+        return utc_ns
+    local = pd.DatetimeIndex(utc_ns.view('datetime64[ns]')).tz_localize('UTC').tz_convert(tz).tz_localize(None)
+    return local.values.astype('datetime64[ns]').view(np.int64)
+
+
+
+def _bin_index(bins_utc, like, tz):
+    '''int64 array of bin starts (utc ns) -> DatetimeIndex in tz (tz-naive as is), same unit as like'''
+    index = pd.DatetimeIndex(bins_utc.view('datetime64[ns]'), name=like.name)
+    if tz is not None:
+        index = index.tz_localize('UTC').tz_convert(tz)
+    return index.as_unit(like.unit)
@@ -0,0 +1,226 @@
+import numpy as np
+import builtins
+
+try:
+    from ._rate_limit import _make_pacer, _wait_for_slot
+    from ._http import _use_client
+    from ._engine import _iter_jobs
+    from ._inputs import _process_timeout
+    from ._decode import _loads
+except ImportError:
+    from _rate_limit import _make_pacer, _wait_for_slot
+    from _http import _use_client
+    from _engine import _iter_jobs
+    from _inputs import _process_timeout
+    from _decode import _loads
+
+
+
+
+
+#-------------------------Description-------------------------#
+# browser-free yf screener: filters posted to the screener json api, results paged in parallel
+# (instead of get_symbols_download_url + download_symbols, which need chrome & selenium)
+
+if False:
+    import yf_tools as yf
+
+    # same filters as get_symbols_download_url('US') / ('HK')
+    query = yf.get_screener_query('US') # region us, exchanges NasdaqGS, NasdaqCM, NYSE, NasdaqGM
+    symbols = yf.download_screener(query)
+
+    # any filters: values of a field OR-ed, fields AND-ed
+    query = yf.screener_query(region=['us', 'ca'], exchange=['NMS', 'NYQ'],
+                              sector='Technology',
+                              intradaymarketcap=(2e9, None)) # (low, high) range, None: unbounded
+    symbols = yf.download_screener(query, count=250, speed=0, retry=1)
+
+    # yield symbols of each page as soon as downloaded (in completion order)
+    for offset, symbols in yf.iter_download_screener(query):
+        print(offset, symbols)
+
+    # Inputs
+    # query : screener query (dict) [from screener_query / get_screener_query]
+    # count : num of symbols per page (max 250)
+    # quote_type : 'EQUITY' / 'ETF' / 'MUTUALFUND' / ...
+    # speed, retry, timeout, client : same as download_symbols
+
+    # Output
+    # list of symbols [list of str]
+
+
+
+
+
+#-------------------------Definition-------------------------#
+
+# exchange codes of yf screener
+# NasdaqGS: 'NMS', NasdaqCM: 'NCM', NasdaqGM: 'NGM', NYSE: 'NYQ', NYSEArca: 'PCX', HKSE: 'HKG'
+_SCREENER_PRESETS = {'us': {'region': 'us', 'exchange': ['NMS', 'NCM', 'NYQ', 'NGM']},
+                     'hk': {'region': 'hk'},
+                     }
+
+
+
+def screener_query(region=None, exchange=None, **filters):
+    '''
+    build query of yf screener (fields AND-ed, values of a field OR-ed)
+
+    region : region code(s) (str / list of str), e.g. 'us' / ['us', 'hk']
+    exchange : exchange code(s) (str / list of str), e.g. ['NMS', 'NYQ']
+    filters : other fields, each as value(s) (equal to any) / (low, high) tuple (None: unbounded)
+              e.g. sector='Technology', intradaymarketcap=(2e9, None)
+
+    -> query (dict)
+    '''
+    filters = dict(region=region, exchange=exchange, **filters)
+    operands = [_screener_operand(field, value)
+                    for field, value in filters.items() if value is not None]
+    return {'operator': 'AND', 'operands': operands}
+
+
+
+def get_screener_query(us_or_hk):
+    '''
+    query of the same filters as get_symbols_download_url
+
+    us_or_hk: 'US' or 'HK'
+
+    -> query (dict)
+    '''
+    return screener_query(**_SCREENER_PRESETS[str.lower(us_or_hk)])
+
+
+
+def _screener_operand(field, value):
+    '''one filter -> operand of query'''
+
+    # range (low, high)
+    if isinstance(value, tuple):
+        low, high = value
+        if low is None:
+            return {'operator': 'LT', 'operands': [field, high]}
+        if high is None:
+            return {'operator': 'GT', 'operands': [field, low]}
+        return {'operator': 'BTWN', 'operands': [field, low, high]}
+
+    # equal to any of values
+    values = [value] if isinstance(value, str) or np.isscalar(value) else list(value)
+    return {'operator': 'OR',
+            'operands': [{'operator': 'EQ', 'operands': [field, v]} for v in values]}
+
+
+
+def download_screener(query, count=250, quote_type='EQUITY', speed=0, retry=0, timeout=(3.05,5),
+                      verbose=False, client=None):
+    '''
+    download symbols matching a query from yf screener (json api, no browser)
+
+    query : screener query (dict) [from screener_query / get_screener_query]
+    count : num of symbols per page
+    quote_type : 'EQUITY' / 'ETF' / 'MUTUALFUND' / ...
+    speed : sec per requested download (on top of the shared limit set by set_rate_limit)
+    retry : num of download retry (to maximize downloaded content)
+    timeout : sec to request timeout [specify: sec / (sec: connect timeout, sec: response timeout)]
+    verbose : show detailed download info ?
+    client : YFClient to reuse its connections & worker threads (None: new ones for this call only)
+
+    -> list of symbols
+    '''
+
+    # collect all pages, accumulate symbols (same order as pages), drop duplicates in one pass
+    pages = dict(iter_download_screener(query, count, quote_type, speed, retry, timeout,
+                                        verbose, client))
+    symbols = [symbol for offset in sorted(pages) for symbol in pages[offset]]
+    return list(dict.fromkeys(symbols))
+
+
+
+def iter_download_screener(query, count=250, quote_type='EQUITY', speed=0, retry=0,
+                           timeout=(3.05,5), verbose=False, client=None):
+    '''
+    download symbols matching a query from yf screener,
+    yield each page as soon as its download is done (in completion order)
+
+    (inputs same as download_screener)
+
+    -> generator of (offset, list of symbols on page) [pages may overlap]
+    '''
+
+    # process inputs
+    count = int(np.clip(count, 1, 250)) # [1, 250] # [num of symbols per page]
+    speed = float(max(speed, 0.0)) # [0.0, inf) # [sec per request]
+    retry = int(max(retry, 0)) # [0, inf) # [num of retry]
+    timeout = _process_timeout(timeout)
+
+
+    # print msg config
+    if verbose:
+        print = builtins.print
+    else:
+        def print(*args, **kwargs):
+            pass
+
+
+    pacer = _make_pacer(speed) # per-call speed control (shared host limit applied as well)
+    with _use_client(client) as client:
+        sess, executor = client.sess, client.executor
+
+        def submit(offset):
+
+            # speed control
+            url, _, _ = _screener_request(query, offset, count, quote_type)
+            _wait_for_slot(url, pacer)
+
+            # request download
+            return executor.submit(_download_screener_unit, query, offset, count, quote_type,
+                                   sess, timeout)
+
+        # 1st page, with total num of symbols
+        total, symbols = None, None
+        for _, result in _iter_jobs(executor, [0], submit, retry, verbose, print,
+                                   metrics=client.metrics):
+            if result is not None:
+                total, symbols = result
+        if total is None:
+            return
+        print('Total {} symbols to download'.format(total))
+        yield 0, symbols
+
+        # remaining pages (failed / empty pages retried, each on its own)
+        for offset, result in _iter_jobs(executor, range(count, total, count), submit, retry,
+                                         verbose, print, metrics=client.metrics):
+            if result is not None:
+                yield offset, result[1]
+
+
+
+def _download_screener_unit(query, offset, count, quote_type, sess, timeout):
+    '''download a page of yf screener -> (total num of symbols, list of symbols) (raise if no content)'''
+    url, body, headers = _screener_request(query, offset, count, quote_type)
+    resp = sess.post(url, json=body, headers=headers, timeout=timeout)
+    content = _loads(resp.content)['finance']
+    if content.get('error'):
+        raise Exception(content['error'])
+
+    result = content['result'][0]
+    symbols = [quote['symbol'] for quote in result['quotes']]
+    if (not symbols) and (offset < result['total']):
+        raise Exception('no symbols at {} ~ {}'.format(offset+1, offset+count))
+    return result['total'], symbols
+
+
+
+def _screener_request(query, offset, count, quote_type):
+    '''request config of a page of yf screener -> (url, json body, headers)'''
+    body = {'offset': int(offset),
+            'size': int(count),
+            'sortField': 'intradaymarketcap',
+            'sortType': 'DESC',
+            'quoteType': quote_type,
+            'query': query,
+            }
+    headers = {'user-agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 \
+                                (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'}
+    url = 'https://query1.finance.yahoo.com/v1/finance/screener'
+    return url, body, headers